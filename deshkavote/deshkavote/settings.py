@@ -209,6 +209,90 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Asia/Kolkata'
 
+# Vote ingestion
+# 'direct' writes each ballot inside the cast_vote request.
+# 'buffered' acknowledges ballots from a Redis buffer and bulk-inserts them in micro-batches.
+VOTE_INGESTION_MODE = 'direct'
+VOTE_BUFFER_BATCH_SIZE = 200  # Flush as soon as this many ballots are waiting
+VOTE_BUFFER_MAX_WAIT = 2  # ...or this many seconds after the first one arrived
+VOTE_BUFFER_MAX_ATTEMPTS = 3  # Failed flushes before a ballot is moved to the dead-letter list
+
+# Consensus processing
+# 'per_vote' enqueues one consensus task per ballot.
+# 'batched' lets one task claim pending ballots and finalize them together.
+CONSENSUS_MODE = 'per_vote'
+CONSENSUS_BATCH_SIZE = 200
+CONSENSUS_BATCH_MAX_WAIT = 2  # Seconds a new ballot waits for its batch
+CONSENSUS_ROUND_LATENCY = 2  # Simulated node round trip (seconds); a batch's rounds run concurrently
+CONSENSUS_NODE_TIMEOUT = 5  # Seconds to wait for each node before counting it as failed
+CONSENSUS_RETRY_DELAY = 10  # Seconds before another round for votes that missed quorum
+CONSENSUS_MAX_RETRIES = 5
+
+# Active-election eligibility index: dropped whenever an Election is saved or deleted,
+# and rebuilt at least this often (seconds) in case an invalidation was missed
+ELIGIBILITY_INDEX_TTL = 300
+
+# Idempotency-Key replay window for mutating JSON APIs (seconds)
+IDEMPOTENCY_KEY_TTL = 86400
+
+# Audit logging
+# 'sync' chains every audit entry inside the request that caused it.
+# 'buffered' queues non-durable entries in Redis and bulk-inserts them in batches.
+AUDIT_LOG_MODE = 'sync'
+AUDIT_DURABLE_LOG_TYPES = ('vote_cast', 'security_event')  # Always written synchronously
+AUDIT_BUFFER_BATCH_SIZE = 500
+AUDIT_BUFFER_MAX_WAIT = 1  # Seconds a queued event waits for its batch
+AUDIT_BUFFER_MAX_PENDING = 10000  # Backlog beyond which events are written synchronously again
+
+# Exports
+EXPORT_CHUNK_SIZE = 2000  # Rows fetched per database round trip while streaming
+EXPORT_JOB_DEDUP_TTL = 600  # Identical background export requests within this window share one job
+EXPORT_PROGRESS_ROWS = 10000  # Rows between progress updates to the admin dashboard
+EXCEL_WIDTH_SAMPLE_ROWS = 1000  # Rows used to estimate Excel column widths
+
+# OTP
+# 'redis' keeps OTPs in an expiring Redis hash (the table is used if Redis is unavailable).
+# 'database' keeps them in the OTPVerification table.
+OTP_STORE = 'database'
+OTP_TTL = 600  # Seconds an OTP stays valid
+OTP_MAX_ATTEMPTS = 3
+OTP_AUDIT_TRAIL = False  # With the Redis store, also record issued/used OTPs (without the code) in the table
+
+# OTP email delivery
+# 'sync' sends the email inside the login request.
+# 'queued' hands it to a Celery task that sends batches over a pooled SMTP connection.
+OTP_EMAIL_MODE = 'sync'
+OTP_EMAIL_BATCH_SIZE = 50
+OTP_SMTP_IDLE_TIMEOUT = 60  # Seconds a worker keeps its SMTP connection open between batches
+OTP_SMTP_FAILURE_THRESHOLD = 5  # Consecutive failed batches before the circuit breaker opens
+OTP_SMTP_COOLDOWN = 60  # Seconds the breaker stays open before a probe batch is tried
+
+# Login lockout: failures and locks live in expiring Redis keys (the CustomUser columns are
+# only written when Redis is unavailable)
+LOGIN_MAX_FAILED_ATTEMPTS = 5
+LOGIN_LOCKOUT_SECONDS = 900  # Window for counting failures, and how long a lock lasts
+PASSWORD_HASH_WORKERS = None  # Password hashes verified in parallel; None = one per CPU core
+PASSWORD_HASH_QUEUE_TIMEOUT = 5  # Seconds a login waits for a hashing slot before getting a 503
+
+# Election-day waiting room in front of login_user/send_otp (state kept in Redis)
+WAITING_ROOM_ENABLED = False
+WAITING_ROOM_ADMIT_RATE = 50  # Clients admitted per second once the burst is used up
+WAITING_ROOM_BURST = 100  # Clients admitted at once without queueing
+WAITING_ROOM_PASS_TTL = 900  # Seconds an admitted client has to finish signing in
+WAITING_ROOM_ABANDON_SECONDS = 30  # Queued clients not heard from for this long lose their place
+WAITING_ROOM_PUSH_INTERVAL = 2  # Seconds between position updates on the websocket
+
+# Rate limiting: Redis token buckets checked before the view runs.
+# endpoint -> {scope: (burst, refill per minute)}; scopes are 'ip' (client address),
+# 'voter' (voter ID / mobile in the request, or the session cookie) and 'endpoint' (all clients).
+RATE_LIMITS = {
+    'login_user': {'ip': (20, 10), 'voter': (5, 2), 'endpoint': (1000, 6000)},
+    'verify_otp': {'ip': (20, 10), 'voter': (5, 2)},
+    'send_otp': {'ip': (10, 5), 'voter': (3, 1)},
+    'register_voter': {'ip': (5, 2), 'endpoint': (200, 1200)},
+    'cast_vote': {'ip': (60, 60), 'voter': (5, 5), 'endpoint': (5000, 60000)},
+}
+
 # Caching Configuration - UPDATED TO USE REDIS AS PRIMARY
 CACHES = {
     'default': {
@@ -221,6 +305,7 @@ CACHES = {
         'TIMEOUT': 300,  # 5 minutes default
     }
 }
+REDIS_KEY_PREFIX = 'deshkavote'  # For data kept directly in Redis (voting.redis_utils.redis_key)
 
 # Session configuration to use Redis cache
 SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
@@ -243,6 +328,12 @@ if 'test' in sys.argv:
     MIGRATION_MODULES = {
         'voting': None,
     }
+    # A Redis database and key prefix of their own, so test runs never touch a
+    # developer's cache, sessions, queues or channel groups
+    CACHES['default']['LOCATION'] = 'redis://127.0.0.1:6379/15'
+    CACHES['default']['KEY_PREFIX'] = 'deshkavote_test'
+    REDIS_KEY_PREFIX = 'deshkavote_test'
+    CHANNEL_LAYERS['default']['CONFIG']['hosts'] = ['redis://127.0.0.1:6379/15']
     DATABASES['default'] = {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': ':memory:',
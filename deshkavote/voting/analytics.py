@@ -0,0 +1,152 @@
+import logging
+from datetime import timezone
+
+from django.conf import settings
+from django.db.models.functions import ExtractYear, TruncHour
+from django.utils.crypto import salted_hmac
+
+from .models import Election, Vote, Voter
+
+# Try to import optional dependencies
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+logger = logging.getLogger(__name__)
+
+
+class ColumnarExport:
+    """Typed, columnar snapshots of votes and voter demographics for offline analysis.
+
+    Two datasets are available:
+
+    - votes: election_id, candidate_id, hour, status. Votes are never linked
+      to voters, and only the hour a vote was cast in is exported (rows are
+      not in casting order), so the export cannot be joined back to the
+      timestamped vote_cast audit entries to reveal how anyone voted.
+    - voter_demographics: state, district, city, gender, birth_year and
+      approval_status. Names, contact details, addresses and ID numbers are
+      never exported; with pii='hash' a voter_key column (an HMAC of the voter
+      id keyed by SECRET_KEY) lets analysts join exports without identifying
+      anyone.
+
+    Rows are read with values_list().iterator() - a server-side cursor on
+    PostgreSQL - and written EXPORT_CHUNK_SIZE rows at a time as record
+    batches, to Parquet (zstd) or to an uncompressed Arrow IPC file. The
+    latter can be memory-mapped with pyarrow.memory_map() and read into
+    pandas/NumPy without copying the numeric columns.
+    """
+
+    DATASETS = ('votes', 'voter_demographics')
+    FORMATS = ('parquet', 'arrow')
+    HASH_SALT = 'voting.analytics.voter_key'
+
+    @staticmethod
+    def is_available():
+        return pa is not None
+
+    @staticmethod
+    def chunk_size():
+        return getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+    @staticmethod
+    def field_types():
+        return {
+            'election_id': pa.string(),
+            'candidate_id': pa.string(),
+            'hour': pa.timestamp('s', tz='UTC'),
+            'status': pa.string(),
+            'voter_key': pa.string(),
+            'state': pa.string(),
+            'district': pa.string(),
+            'city': pa.string(),
+            'gender': pa.string(),
+            'birth_year': pa.int16(),
+            'approval_status': pa.string(),
+        }
+
+    @classmethod
+    def voter_key(cls, voter_id):
+        return salted_hmac(cls.HASH_SALT, voter_id).hexdigest()
+
+    @classmethod
+    def source(cls, dataset, params=None):
+        """(columns, rows, total) for a dataset.
+
+        params may hold 'election' (votes of that election, or voters in its
+        region) and, for voter_demographics, 'pii' ('exclude' or 'hash').
+        """
+        params = params or {}
+        election = Election.objects.get(id=params['election']) if params.get('election') else None
+
+        if dataset == 'votes':
+            # Hour buckets, ordered by ballot choice rather than time
+            votes = Vote.objects.annotate(hour=TruncHour('timestamp', tzinfo=timezone.utc)).order_by(
+                'election_id', 'candidate_id', 'hour'
+            )
+            if election is not None:
+                votes = votes.filter(election=election)
+            columns = ['election_id', 'candidate_id', 'hour', 'status']
+            return columns, votes.values_list(*columns).iterator(chunk_size=cls.chunk_size()), votes.count()
+
+        if dataset == 'voter_demographics':
+            from .exports import voters_for_election
+
+            voters = Voter.objects.all()
+            if election is not None:
+                voters = voters_for_election(election, ['approved'])
+            voters = voters.annotate(birth_year=ExtractYear('date_of_birth')).order_by('id')
+
+            columns = ['state', 'district', 'city', 'gender', 'birth_year', 'approval_status']
+            total = voters.count()
+            if params.get('pii', 'exclude') == 'exclude':
+                return columns, voters.values_list(*columns).iterator(chunk_size=cls.chunk_size()), total
+
+            rows = voters.values_list('voter_id', *columns).iterator(chunk_size=cls.chunk_size())
+            hashed = ((cls.voter_key(voter_id), *row) for voter_id, *row in rows)
+            return ['voter_key'] + columns, hashed, total
+
+        raise ValueError(f"Unknown analytics dataset {dataset}")
+
+    @classmethod
+    def record_batch(cls, schema, rows):
+        arrays = []
+        for field, values in zip(schema, zip(*rows)):
+            if pa.types.is_string(field.type):
+                values = [None if value is None else str(value) for value in values]
+            arrays.append(pa.array(values, type=field.type))
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    @classmethod
+    def write(cls, path, columns, rows, file_format='parquet', chunk_size=None):
+        """Write rows to a Parquet or Arrow IPC file, one record batch per chunk; returns the row count"""
+        if pa is None:
+            raise ImportError('pyarrow is required for Parquet/Arrow exports')
+
+        field_types = cls.field_types()
+        schema = pa.schema([(column, field_types[column]) for column in columns])
+        chunk_size = chunk_size or cls.chunk_size()
+
+        if file_format == 'parquet':
+            writer = pq.ParquetWriter(path, schema, compression='zstd')
+        else:
+            writer = pa.ipc.new_file(path, schema)
+
+        row_count = 0
+        batch = []
+        try:
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= chunk_size:
+                    writer.write_batch(cls.record_batch(schema, batch))
+                    row_count += len(batch)
+                    batch = []
+            if batch:
+                writer.write_batch(cls.record_batch(schema, batch))
+                row_count += len(batch)
+        finally:
+            writer.close()
+
+        return row_count
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class VotingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'voting'
+
+    def ready(self):
+        # Connects the signals that drop the eligibility index when an Election changes
+        from . import eligibility  # noqa: F401
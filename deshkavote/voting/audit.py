@@ -0,0 +1,447 @@
+import json
+import logging
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import django
+from django.conf import settings
+from django.core.signing import Signer
+from django.db import IntegrityError, connections, transaction
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+
+from .models import AuditChainHead, AuditCheckpoint, AuditLog
+from .redis_utils import get_redis, redis_key
+
+logger = logging.getLogger(__name__)
+
+
+class AuditChain:
+    """Serialized appender for the audit hash chain.
+
+    The chain head (latest sequence number and hash) lives in the single
+    AuditChainHead row. An append locks that row, chains the new entries onto
+    it, inserts them with one bulk INSERT and moves the head - three statements
+    on one indexed row instead of an ORDER BY over the whole audit table. Because
+    every writer, in every worker process, takes the same row lock, sequence
+    numbers are gap-free and each entry's previous_hash is its predecessor's hash.
+    Writers inside a request's transaction append inside it, so an entry that
+    cannot be chained rolls back the action it records.
+    """
+
+    HEAD_ID = 1
+
+    @classmethod
+    def _lock_head(cls):
+        try:
+            return AuditChainHead.objects.select_for_update().get(pk=cls.HEAD_ID)
+        except AuditChainHead.DoesNotExist:
+            cls._create_head()
+            return AuditChainHead.objects.select_for_update().get(pk=cls.HEAD_ID)
+
+    @classmethod
+    def _create_head(cls):
+        """Start the head from the newest existing entry (one-off, normally done by the migration)"""
+        last_log = AuditLog.objects.filter(sequence__isnull=False).order_by('-sequence').first()
+        if last_log is None:
+            last_log = AuditLog.objects.order_by('-timestamp').first()
+        try:
+            with transaction.atomic():
+                AuditChainHead.objects.create(
+                    pk=cls.HEAD_ID,
+                    sequence=(last_log.sequence or 0) if last_log else 0,
+                    head_hash=last_log.hash_chain if last_log else ''
+                )
+        except IntegrityError:
+            pass  # Another writer created it first
+
+    @staticmethod
+    def prepare(entries):
+        """Unsaved AuditLog rows for entries (dicts of AuditLog field values: log_type,
+        user_id, election_id, details, ip_address, user_agent, and optionally the id
+        and timestamp the event was given when it was queued)"""
+        return [
+            AuditLog(
+                id=entry.get('id') or uuid.uuid4(),
+                log_type=entry['log_type'],
+                user_id=entry.get('user_id'),
+                election_id=entry.get('election_id'),
+                details=entry.get('details') or {},
+                ip_address=entry.get('ip_address'),
+                user_agent=entry.get('user_agent', ''),
+                timestamp=entry.get('timestamp')
+            )
+            for entry in entries
+        ]
+
+    @classmethod
+    def append(cls, entries):
+        """Chain and insert entries in order; returns the saved AuditLog rows"""
+        return cls.chain(cls.prepare(entries))
+
+    @classmethod
+    def chain(cls, logs):
+        """Chain prepared rows onto the locked head and insert them with one statement"""
+        if not logs:
+            return []
+
+        with transaction.atomic():
+            head = cls._lock_head()
+            timestamp = timezone.now()
+
+            for log_entry in logs:
+                head.sequence += 1
+                log_entry.timestamp = log_entry.timestamp or timestamp
+                log_entry.sequence = head.sequence
+                log_entry.previous_hash = head.head_hash
+                log_entry.hash_chain = log_entry.generate_hash()
+                head.head_hash = log_entry.hash_chain
+
+            AuditLog.objects.bulk_create(logs)
+            head.save(update_fields=['sequence', 'head_hash', 'updated_at'])
+
+        return logs
+
+
+class AuditWriter:
+    """Write-behind pipeline for audit events.
+
+    In 'buffered' mode, events are pushed onto a Redis list once the request's
+    transaction commits, and a flusher chains and bulk-inserts them in batches
+    through AuditChain. Entries are only trimmed from the list after their batch
+    commits, and each carries its final AuditLog id, so a crashed flush is
+    retried without duplicates.
+
+    Log types in AUDIT_DURABLE_LOG_TYPES (vote_cast, security_event) are never
+    deferred: they are chained inside the caller's transaction, so the action
+    and its entry commit or roll back together. The loss window for the rest is
+    bounded by AUDIT_BUFFER_MAX_PENDING - past that backlog, events are written
+    synchronously again, and events that cannot be written either way are kept
+    on a dead-letter list.
+    """
+
+    RELEASE_LOCK_SCRIPT = """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('DEL', KEYS[1])
+    end
+    return 0
+    """
+
+    QUEUE_KEY = redis_key('audit', 'queue')
+    DEAD_LETTER_KEY = redis_key('audit', 'dead_letter')
+    FLUSH_LOCK_KEY = redis_key('audit', 'flush_lock')
+    FLUSH_SCHEDULED_KEY = redis_key('audit', 'flush_scheduled')
+    FLUSH_LOCK_TTL = 60
+
+    @staticmethod
+    def is_enabled():
+        """Buffered audit logging is opt-in and requires Redis"""
+        mode = getattr(settings, 'AUDIT_LOG_MODE', 'sync')
+        return mode == 'buffered' and get_redis() is not None
+
+    @staticmethod
+    def batch_size():
+        return getattr(settings, 'AUDIT_BUFFER_BATCH_SIZE', 500)
+
+    @staticmethod
+    def max_wait():
+        return getattr(settings, 'AUDIT_BUFFER_MAX_WAIT', 1)
+
+    @staticmethod
+    def max_pending():
+        return getattr(settings, 'AUDIT_BUFFER_MAX_PENDING', 10000)
+
+    @staticmethod
+    def is_durable(log_type):
+        return log_type in getattr(settings, 'AUDIT_DURABLE_LOG_TYPES', ('vote_cast', 'security_event'))
+
+    @classmethod
+    def record(cls, entries):
+        """Log a list of audit entries; returns the AuditLog rows written right away.
+
+        Durable entries (and everything, when buffering is off) are chained
+        immediately, inside the caller's transaction; the rest are queued for
+        the flusher.
+        """
+        if not cls.is_enabled():
+            return AuditChain.append(entries)
+
+        durable = [entry for entry in entries if cls.is_durable(entry['log_type'])]
+        deferred = [entry for entry in entries if not cls.is_durable(entry['log_type'])]
+
+        if deferred:
+            cls.enqueue(deferred)
+        return AuditChain.append(durable)
+
+    @classmethod
+    def enqueue(cls, entries, schedule_flush=True):
+        """Queue entries once the current transaction commits (so rolled-back actions leave no trace)"""
+        timestamp = timezone.now().isoformat()
+        payloads = [
+            json.dumps({
+                **entry,
+                'id': str(uuid.uuid4()),
+                'user_id': entry.get('user_id'),
+                'election_id': str(entry['election_id']) if entry.get('election_id') else None,
+                'timestamp': timestamp
+            })
+            for entry in entries
+        ]
+        transaction.on_commit(lambda: cls._push(payloads, schedule_flush))
+
+    @classmethod
+    def _push(cls, payloads, schedule_flush=True):
+        r = get_redis()
+        try:
+            queue_length = r.llen(cls.QUEUE_KEY)
+            if queue_length < cls.max_pending():
+                queue_length = r.rpush(cls.QUEUE_KEY, *payloads)
+                if schedule_flush:
+                    cls.schedule_flush(queue_length)
+                return
+            logger.warning(f"Audit buffer holds {queue_length} events, writing synchronously")
+        except Exception as e:
+            logger.error(f"Audit buffer unavailable, writing synchronously: {e}")
+
+        try:
+            AuditChain.append([cls._decode(payload) for payload in payloads])
+        except Exception as e:
+            cls._dead_letter(payloads, e)
+
+    @classmethod
+    def _dead_letter(cls, payloads, error):
+        """Keep events that could not be written for a later replay, or at least in the log"""
+        try:
+            get_redis().rpush(cls.DEAD_LETTER_KEY, *payloads)
+            logger.error(f"Moved {len(payloads)} audit events to the dead-letter list: {error}")
+        except Exception:
+            logger.error(f"Lost {len(payloads)} audit events ({error}): {payloads}")
+
+    @classmethod
+    def dead_letter_count(cls):
+        r = get_redis()
+        return r.llen(cls.DEAD_LETTER_KEY) if r else 0
+
+    @classmethod
+    def schedule_flush(cls, queue_length):
+        """Flush now if a full batch is waiting, otherwise at most max_wait seconds from now"""
+        from .tasks import flush_audit_buffer
+
+        r = get_redis()
+        if queue_length >= cls.batch_size():
+            flush_audit_buffer.delay()
+        elif r.set(cls.FLUSH_SCHEDULED_KEY, 1, nx=True, ex=cls.max_wait() + 1):
+            flush_audit_buffer.apply_async(countdown=cls.max_wait())
+
+    @classmethod
+    def pending_count(cls):
+        r = get_redis()
+        return r.llen(cls.QUEUE_KEY) if r else 0
+
+    @staticmethod
+    def _decode(payload):
+        entry = json.loads(payload)
+        entry['timestamp'] = datetime.fromisoformat(entry['timestamp'])
+        return entry
+
+    @classmethod
+    def flush(cls, batch_size=None):
+        """Chain and insert up to batch_size queued events.
+
+        Returns the number of entries written, or None without doing anything if
+        another flusher holds the lock.
+        """
+        r = get_redis()
+        batch_size = batch_size or cls.batch_size()
+
+        lock_token = uuid.uuid4().hex
+        if not r.set(cls.FLUSH_LOCK_KEY, lock_token, nx=True, ex=cls.FLUSH_LOCK_TTL):
+            return None
+
+        try:
+            r.delete(cls.FLUSH_SCHEDULED_KEY)
+            payloads = r.lrange(cls.QUEUE_KEY, 0, batch_size - 1)
+            if not payloads:
+                return 0
+
+            entries = [cls._decode(payload) for payload in payloads]
+            # Already written by an earlier, interrupted flush
+            existing_ids = {
+                str(log_id) for log_id in
+                AuditLog.objects.filter(id__in=[entry['id'] for entry in entries]).values_list('id', flat=True)
+            }
+            logs = AuditChain.append([entry for entry in entries if entry['id'] not in existing_ids])
+
+            # Only drop the entries once they are safely committed
+            r.ltrim(cls.QUEUE_KEY, len(payloads), -1)
+        finally:
+            r.register_script(cls.RELEASE_LOCK_SCRIPT)(keys=[cls.FLUSH_LOCK_KEY], args=[lock_token])
+
+        return len(logs)
+
+
+def _init_verify_worker():
+    """Process pool initializer: make Django usable when workers are spawned rather than forked"""
+    django.setup()
+
+
+def verify_segment(first, last, chunk_size=2000):
+    """Recompute the hashes of entries first..last (by sequence).
+
+    Returns a dict with the segment's first previous_hash and last hash (so the
+    caller can stitch segments together), the number of rows checked and a list
+    of (sequence, problem) tuples.
+    """
+    rows = AuditLog.objects.filter(sequence__gte=first, sequence__lte=last).order_by('sequence').only(
+        'sequence', 'log_type', 'user_id', 'timestamp', 'details', 'hash_chain', 'previous_hash'
+    )
+
+    errors = []
+    expected = first
+    first_previous = None
+    previous_hash = None
+    checked = 0
+    for log in rows.iterator(chunk_size=chunk_size):
+        if log.sequence != expected:
+            errors.append((expected, f'entries {expected}..{log.sequence - 1} are missing'))
+            previous_hash = None  # Cannot check the link across the gap
+        if first_previous is None and log.sequence == first:
+            first_previous = log.previous_hash
+
+        if previous_hash is not None and log.previous_hash != previous_hash:
+            errors.append((log.sequence, 'previous_hash does not match the preceding entry'))
+        if log.generate_hash() != log.hash_chain:
+            errors.append((log.sequence, 'hash_chain does not match the entry contents'))
+
+        previous_hash = log.hash_chain
+        expected = log.sequence + 1
+        checked += 1
+
+    if expected <= last:
+        errors.append((expected, f'entries {expected}..{last} are missing'))
+
+    return {
+        'first': first,
+        'last': last,
+        'first_previous': first_previous,
+        'last_hash': previous_hash if expected > last else None,
+        'rows': checked,
+        'errors': errors,
+    }
+
+
+class AuditVerifier:
+    """Verifies the sequenced audit chain, optionally across worker processes.
+
+    The range since the last checkpoint is split into contiguous segments by
+    sequence number. Each segment is streamed with .iterator() in sequence
+    order and re-hashed independently; the segments are then stitched together
+    by comparing each segment's first previous_hash with the hash that ends the
+    segment before it. A successful run stores a signed AuditCheckpoint so the
+    next run only verifies entries appended since.
+    """
+
+    SIGNING_SALT = 'voting.audit.checkpoint'
+
+    @classmethod
+    def sign(cls, sequence, hash_chain):
+        return Signer(salt=cls.SIGNING_SALT).signature(f"{sequence}:{hash_chain}")
+
+    @classmethod
+    def is_valid_checkpoint(cls, checkpoint):
+        return constant_time_compare(checkpoint.signature, cls.sign(checkpoint.sequence, checkpoint.hash_chain))
+
+    @classmethod
+    def last_checkpoint(cls):
+        """Newest checkpoint with a valid signature that still matches its entry.
+
+        Returns (checkpoint or None, list of problems with newer checkpoints).
+        """
+        problems = []
+        for checkpoint in AuditCheckpoint.objects.all():
+            if not cls.is_valid_checkpoint(checkpoint):
+                problems.append((checkpoint.sequence, 'checkpoint signature is invalid'))
+                continue
+            stored_hash = AuditLog.objects.filter(sequence=checkpoint.sequence).values_list('hash_chain', flat=True).first()
+            if stored_hash != checkpoint.hash_chain:
+                problems.append((checkpoint.sequence, 'entry no longer matches its checkpoint'))
+                continue
+            return checkpoint, problems
+        return None, problems
+
+    @staticmethod
+    def split(first, last, segments):
+        """Contiguous (first, last) sequence ranges covering first..last"""
+        total = last - first + 1
+        if total <= 0:
+            return []
+        segments = max(1, min(segments, total))
+        size, remainder = divmod(total, segments)
+        ranges = []
+        start = first
+        for index in range(segments):
+            end = start + size - 1 + (1 if index < remainder else 0)
+            ranges.append((start, end))
+            start = end + 1
+        return ranges
+
+    @classmethod
+    def verify(cls, workers=1, segments=None, chunk_size=2000, full=False, checkpoint=True):
+        """Verify entries up to the current chain head.
+
+        Returns a dict with the range checked, rows, elapsed seconds, rows per
+        second, problems found and the checkpoint written (if any).
+        """
+        started = time.perf_counter()
+        head = AuditChainHead.objects.filter(pk=AuditChain.HEAD_ID).values_list('sequence', flat=True).first() or 0
+
+        errors = []
+        start_from, start_hash = 0, ''
+        if not full:
+            last_checkpoint, errors = cls.last_checkpoint()
+            if last_checkpoint is not None:
+                start_from, start_hash = last_checkpoint.sequence, last_checkpoint.hash_chain
+
+        ranges = cls.split(start_from + 1, head, segments or workers)
+        if workers > 1 and len(ranges) > 1:
+            # Forked workers must not share the parent's database connections
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_verify_worker) as pool:
+                results = list(pool.map(verify_segment, *zip(*ranges), [chunk_size] * len(ranges)))
+        else:
+            results = [verify_segment(first, last, chunk_size) for first, last in ranges]
+
+        previous_hash = start_hash
+        for result in results:
+            errors.extend(result['errors'])
+            # The first entry of a chain that predates sequencing links to a legacy row
+            if previous_hash is not None and result['first_previous'] is not None and result['first'] > 1:
+                if result['first_previous'] != previous_hash:
+                    errors.append((result['first'], 'previous_hash does not match the preceding entry'))
+            previous_hash = result['last_hash']
+
+        rows = sum(result['rows'] for result in results)
+        elapsed = time.perf_counter() - started
+        written = None
+        if checkpoint and not errors and results:
+            written, _ = AuditCheckpoint.objects.get_or_create(
+                sequence=results[-1]['last'],
+                defaults={
+                    'hash_chain': results[-1]['last_hash'],
+                    'signature': cls.sign(results[-1]['last'], results[-1]['last_hash']),
+                    'rows_verified': rows,
+                }
+            )
+
+        return {
+            'first': start_from + 1,
+            'last': head,
+            'rows': rows,
+            'legacy_rows': AuditLog.objects.filter(sequence__isnull=True).count(),
+            'elapsed': elapsed,
+            'rows_per_second': rows / elapsed if elapsed > 0 else 0,
+            'errors': sorted(errors),
+            'checkpoint': written,
+        }
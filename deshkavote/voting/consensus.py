@@ -0,0 +1,358 @@
+import asyncio
+import logging
+import math
+from collections import Counter, defaultdict, namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+from .models import ElectionNode, Vote, VoteConsensusLog
+from .tally import TallyStore
+
+logger = logging.getLogger(__name__)
+
+
+RoundResult = namedtuple('RoundResult', ['signatures', 'quorum'])
+
+
+class SimulatedNodeClient:
+    """Stand-in for the RPC to a remote election node.
+
+    `latency` may be a number of seconds or a callable taking the ElectionNode,
+    so tests can simulate fast, slow and unresponsive nodes. It defaults to
+    CONSENSUS_ROUND_LATENCY.
+    """
+
+    def __init__(self, latency=None):
+        self.latency = latency
+
+    def delay_for(self, node):
+        if callable(self.latency):
+            return self.latency(node)
+        if self.latency is not None:
+            return self.latency
+        return getattr(settings, 'CONSENSUS_ROUND_LATENCY', 2)
+
+    async def confirm(self, node, vote):
+        """Ask a node to verify a vote; returns the node's signature"""
+        await asyncio.sleep(self.delay_for(node))
+        return f"sig_{vote.vote_hash}_{node.node_id}"
+
+
+class ConsensusRound:
+    """Concurrent fan-out of one vote to every active node of its election.
+
+    All nodes are asked at once, each under its own timeout. The round ends as
+    soon as the quorum has confirmed (the remaining requests are cancelled) or
+    as soon as the quorum can no longer be reached.
+    """
+
+    @staticmethod
+    def node_timeout():
+        return getattr(settings, 'CONSENSUS_NODE_TIMEOUT', 5)
+
+    @staticmethod
+    def quorum(vote, node_count):
+        """Confirmations needed: required_confirmations, raised to the election's threshold share of nodes"""
+        threshold_share = math.ceil(node_count * vote.election.consensus_threshold / 100)
+        return max(vote.required_confirmations, threshold_share)
+
+    @classmethod
+    async def run(cls, vote, nodes, quorum, client, node_timeout=None):
+        """Returns a RoundResult with the {node_id: signature} collected before the round ended"""
+        node_timeout = cls.node_timeout() if node_timeout is None else node_timeout
+        signatures = {}
+        if len(nodes) < quorum:
+            return RoundResult(signatures, quorum)
+
+        pending = {
+            asyncio.ensure_future(asyncio.wait_for(client.confirm(node, vote), node_timeout)): node
+            for node in nodes
+        }
+        failed = 0
+        try:
+            while pending and len(signatures) < quorum:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for request in done:
+                    node = pending.pop(request)
+                    try:
+                        signatures[node.node_id] = request.result()
+                    except asyncio.TimeoutError:
+                        failed += 1
+                        logger.warning(f"Node {node.node_id} timed out confirming vote {vote.id}")
+                    except Exception as e:
+                        failed += 1
+                        logger.warning(f"Node {node.node_id} failed confirming vote {vote.id}: {e}")
+
+                if len(nodes) - failed < quorum:
+                    break
+        finally:
+            # Quorum reached (or unreachable): stop waiting for stragglers
+            for request in pending:
+                request.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        return RoundResult(signatures, quorum)
+
+    @classmethod
+    async def run_many(cls, votes, nodes_by_election, client, node_timeout=None):
+        """Run the rounds for a batch of votes concurrently; returns {vote_id: RoundResult}.
+
+        Votes must have their election loaded (select_related) - no queries run here.
+        """
+        rounds = []
+        for vote in votes:
+            nodes = nodes_by_election.get(vote.election_id, [])
+            rounds.append(cls.run(vote, nodes, cls.quorum(vote, len(nodes)), client, node_timeout))
+
+        results = await asyncio.gather(*rounds)
+        return {vote.id: result for vote, result in zip(votes, results)}
+
+
+class ConsensusBatcher:
+    """Micro-batched consensus for pending votes.
+
+    Instead of one Celery task per ballot, a worker claims up to N pending votes
+    (SELECT ... FOR UPDATE SKIP LOCKED), runs their consensus rounds concurrently,
+    writes every node confirmation with a single bulk_create and finalizes
+    the batch with one UPDATE ... WHERE id IN (...). Vote, election and admin
+    notifications for the batch are sent together.
+
+    A claim is recorded in Vote.consensus_claimed_at; claims older than
+    STALE_CLAIM (a crashed worker) are picked up again. Votes whose round missed
+    quorum get a retry after CONSENSUS_RETRY_DELAY seconds, up to
+    CONSENSUS_MAX_RETRIES times, after which they are left to the stale claim pickup.
+    """
+
+    SCHEDULED_KEY = 'consensus_batch_scheduled'
+    STALE_CLAIM = timedelta(minutes=5)
+
+    @staticmethod
+    def is_enabled():
+        return getattr(settings, 'CONSENSUS_MODE', 'per_vote') == 'batched'
+
+    @staticmethod
+    def batch_size():
+        return getattr(settings, 'CONSENSUS_BATCH_SIZE', 200)
+
+    @staticmethod
+    def max_wait():
+        return getattr(settings, 'CONSENSUS_BATCH_MAX_WAIT', 2)
+
+    @staticmethod
+    def retry_delay():
+        return getattr(settings, 'CONSENSUS_RETRY_DELAY', 10)
+
+    @staticmethod
+    def max_retries():
+        return getattr(settings, 'CONSENSUS_MAX_RETRIES', 5)
+
+    @classmethod
+    def start(cls, vote_ids):
+        """Hand newly written votes to consensus (one task per vote, or the next batch).
+
+        Enqueued once the caller's transaction commits, so a worker never looks
+        for a vote that is not visible yet.
+        """
+        vote_ids = [str(vote_id) for vote_id in vote_ids]
+
+        def enqueue():
+            if cls.is_enabled():
+                cls.schedule()
+                return
+
+            from .views import process_vote_consensus
+            for vote_id in vote_ids:
+                process_vote_consensus.delay(vote_id)
+
+        transaction.on_commit(enqueue)
+
+    @classmethod
+    def schedule(cls):
+        """Run a batch within max_wait seconds unless one is already scheduled"""
+        from .tasks import process_consensus_batch
+
+        if cache.add(cls.SCHEDULED_KEY, 1, timeout=cls.max_wait()):
+            process_consensus_batch.apply_async(countdown=cls.max_wait())
+
+    @classmethod
+    def claim(cls, batch_size=None, vote_ids=None):
+        """Claim up to batch_size unclaimed votes (optionally only among vote_ids)"""
+        batch_size = batch_size or cls.batch_size()
+        now = timezone.now()
+
+        claimable = Vote.objects.filter(
+            Q(status='pending') |
+            Q(status='consensus_pending', consensus_claimed_at__lt=now - cls.STALE_CLAIM)
+        )
+        if vote_ids is not None:
+            claimable = claimable.filter(id__in=vote_ids)
+
+        with transaction.atomic():
+            ids = list(
+                claimable.order_by('timestamp')
+                .select_for_update(skip_locked=True)
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if ids:
+                Vote.objects.filter(id__in=ids).update(status='consensus_pending', consensus_claimed_at=now)
+
+        return list(Vote.objects.filter(id__in=ids).select_related('election')) if ids else []
+
+    @staticmethod
+    def run_round(votes, client=None, node_timeout=None):
+        """Collect node confirmations for a batch; returns {vote_id: RoundResult}"""
+        client = client or SimulatedNodeClient()
+
+        nodes = defaultdict(list)
+        active_nodes = ElectionNode.objects.filter(
+            election_id__in={vote.election_id for vote in votes},
+            status='active'
+        ).order_by('id')
+        for node in active_nodes:
+            nodes[node.election_id].append(node)
+
+        for vote in votes:
+            vote.election  # Load outside the event loop; claimed votes already have it
+        rounds = async_to_sync(ConsensusRound.run_many)(votes, nodes, client, node_timeout)
+
+        # Retried votes already have some of their rows
+        VoteConsensusLog.objects.bulk_create([
+            VoteConsensusLog(
+                vote_id=vote_id,
+                node_id=node_id,
+                consensus_round=1,
+                status='confirmed',
+                signature=signature
+            )
+            for vote_id, result in rounds.items()
+            for node_id, signature in result.signatures.items()
+        ], ignore_conflicts=True)
+        return rounds
+
+    @staticmethod
+    def finalize(votes, rounds):
+        """Finalize every vote whose round reached quorum; returns those votes"""
+        ready = [vote for vote in votes if len(rounds[vote.id].signatures) >= rounds[vote.id].quorum]
+        if not ready:
+            return []
+
+        by_confirmations = defaultdict(list)
+        for vote in ready:
+            by_confirmations[len(rounds[vote.id].signatures)].append(vote.id)
+
+        with transaction.atomic():
+            finalized = 0
+            for confirmation_count, ids in by_confirmations.items():
+                finalized += Vote.objects.filter(id__in=ids, status='consensus_pending').update(
+                    status='finalized',
+                    confirmation_count=confirmation_count,
+                    consensus_claimed_at=None
+                )
+
+            elections = {vote.election_id: vote.election for vote in ready}
+            if finalized == len(ready):
+                per_candidate = Counter((vote.election_id, vote.candidate_id) for vote in ready)
+                for (election_id, candidate_id), count in per_candidate.items():
+                    TallyStore.increment(election_id, candidate_id, by=count)
+            else:
+                # Some votes were finalized by another worker meanwhile; recount instead of guessing
+                logger.warning(f"Finalized {finalized} of {len(ready)} claimed votes, rebuilding tallies")
+                transaction.on_commit(lambda: [TallyStore.rebuild(election_id) for election_id in elections])
+
+            completed = [election for election in elections.values() if election.status == 'completed']
+            if completed:
+                from .results import ElectionResultSnapshot
+                # Late finalizations after an election ended: refresh its stored results
+                transaction.on_commit(lambda: [ElectionResultSnapshot.compute(election) for election in completed])
+
+        return ready
+
+    @staticmethod
+    def notify(finalized):
+        """Push one batch of vote, election and admin updates through the channel layer"""
+        if not finalized:
+            return
+
+        cache.delete_many([f"vote_status_{vote.id}" for vote in finalized])
+
+        messages = [
+            (f"vote_{vote.id}", {
+                "type": "send_vote_update",
+                "data": {"status": "finalized", "message": "Your vote has been verified."}
+            })
+            for vote in finalized
+        ]
+        for election_id, count in Counter(vote.election_id for vote in finalized).items():
+            messages.append((f"election_{election_id}", {
+                "type": "send_election_update",
+                "data": {"type": "votes_finalized", "count": count}
+            }))
+        messages.append(("admin_dashboard", {
+            "type": "send_admin_update",
+            "data": {
+                "type": "votes_finalized",
+                "count": len(finalized),
+                "message": f"{len(finalized)} vote(s) verified"
+            }
+        }))
+
+        channel_layer = get_channel_layer()
+
+        async def send_all():
+            await asyncio.gather(*(channel_layer.group_send(group, message) for group, message in messages))
+
+        async_to_sync(send_all)()
+
+    @classmethod
+    def process(cls, batch_size=None, vote_ids=None, latency=None, notify=True, client=None, attempt=0):
+        """Claim, confirm and finalize one batch. Returns (claimed, finalized) counts.
+
+        `latency` configures the default simulated node client; pass `client` to
+        talk to nodes some other way. `attempt` counts the retries that led here.
+        """
+        votes = cls.claim(batch_size, vote_ids)
+        if not votes:
+            return 0, 0
+
+        rounds = cls.run_round(votes, client=client or SimulatedNodeClient(latency))
+        finalized = cls.finalize(votes, rounds)
+        if notify:
+            cls.notify(finalized)
+
+        finalized_ids = {vote.id for vote in finalized}
+        missed = [vote.id for vote in votes if vote.id not in finalized_ids]
+        if missed:
+            cls.schedule_retry(missed, attempt)
+
+        logger.info(f"Consensus batch: {len(votes)} claimed, {len(finalized)} finalized")
+        return len(votes), len(finalized)
+
+    @classmethod
+    def schedule_retry(cls, vote_ids, attempt=0):
+        """Run another round for votes that missed quorum after retry_delay seconds"""
+        if attempt >= cls.max_retries():
+            logger.warning(f"{len(vote_ids)} vote(s) still without quorum after {attempt} retries")
+            return
+
+        delay = cls.retry_delay()
+        # Let the claim lapse just as the retry runs, instead of after STALE_CLAIM
+        Vote.objects.filter(id__in=vote_ids, status='consensus_pending').update(
+            consensus_claimed_at=timezone.now() - cls.STALE_CLAIM + timedelta(seconds=delay)
+        )
+
+        if cls.is_enabled():
+            from .tasks import process_consensus_batch
+            process_consensus_batch.apply_async(kwargs={'attempt': attempt + 1}, countdown=delay)
+            return
+
+        from .views import process_vote_consensus
+        for vote_id in vote_ids:
+            process_vote_consensus.apply_async(args=(str(vote_id),), kwargs={'attempt': attempt + 1}, countdown=delay)
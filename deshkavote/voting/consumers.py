@@ -5,6 +5,7 @@ from channels.db import database_sync_to_async
 from django.contrib.auth.models import AnonymousUser
 from django.core.cache import cache
 from .models import Election, Vote, VoteConsensusLog, ElectionNode, Voter, CustomUser
+from .waiting_room import WaitingRoom
 import logging
 
 logger = logging.getLogger(__name__)
@@ -220,4 +221,46 @@ class AdminConsumer(AsyncWebsocketConsumer):
         await self.send(text_data=json.dumps({
             'type': 'admin_update',
             'data': event['data']
-        }))
\ No newline at end of file
+        }))
+
+class WaitingRoomConsumer(AsyncWebsocketConsumer):
+    """WebSocket consumer pushing a queued client's waiting room position until it is admitted"""
+
+    async def connect(self):
+        self.token = self.scope['url_route']['kwargs']['token']
+        self.pusher = None
+
+        # Clients are not logged in yet; the unguessable position token is the credential
+        if not WaitingRoom.is_valid_token(self.token):
+            await self.close()
+            return
+
+        await self.accept()
+        self.pusher = asyncio.ensure_future(self.push_position())
+
+    async def disconnect(self, close_code):
+        if self.pusher is not None:
+            self.pusher.cancel()
+
+    async def push_position(self):
+        """Check in every push interval (keeping the client's place) and report changes"""
+        last_position = None
+        while True:
+            visit = await WaitingRoom.avisit(self.token)
+            position, waiting = visit if visit is not None else (0, 0)
+
+            if position == 0:
+                await self.send(text_data=json.dumps({
+                    'type': 'admitted',
+                    'message': 'It is your turn. Please continue to sign in.'
+                }))
+                await self.close()
+                return
+
+            if position != last_position:
+                last_position = position
+                await self.send(text_data=json.dumps({
+                    'type': 'queue_position',
+                    'data': WaitingRoom.status(self.token, position, waiting)
+                }))
+            await asyncio.sleep(WaitingRoom.push_interval())
@@ -0,0 +1,111 @@
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Election
+
+logger = logging.getLogger(__name__)
+
+
+class EligibilityIndex:
+    """Region-keyed index of active elections, shared by every voter.
+
+    General elections apply everywhere, State Assembly elections are keyed by
+    state, Municipal by (state, city) and Panchayat by (state, district). The
+    index lives in the cache and is rebuilt whenever an election starts or ends,
+    so eligibility checks never hit the database. Any other change to an
+    Election (admin, shell, migrations) drops it once committed, and it expires
+    after ELIGIBILITY_INDEX_TTL seconds in case an invalidation was missed.
+    """
+
+    CACHE_KEY = 'eligibility_index'
+
+    @staticmethod
+    def build():
+        """Build the index from the currently active elections (one query)"""
+        index = {'national': set(), 'state': {}, 'city': {}, 'district': {}}
+
+        active_elections = Election.objects.filter(status='active').values_list(
+            'id', 'election_type', 'state', 'city', 'district'
+        )
+        for election_id, election_type, state, city, district in active_elections:
+            election_id = str(election_id)
+            if election_type == 'General Election':
+                index['national'].add(election_id)
+            elif election_type == 'State Assembly':
+                index['state'].setdefault(state, set()).add(election_id)
+            elif election_type == 'Municipal':
+                index['city'].setdefault((state, city), set()).add(election_id)
+            elif election_type == 'Panchayat':
+                index['district'].setdefault((state, district), set()).add(election_id)
+
+        return index
+
+    @classmethod
+    def rebuild(cls):
+        """Recompute the index and store it for all workers"""
+        index = cls.build()
+        cache.set(cls.CACHE_KEY, index, timeout=getattr(settings, 'ELIGIBILITY_INDEX_TTL', 300))
+        logger.info("Eligibility index rebuilt")
+        return index
+
+    @classmethod
+    def invalidate(cls):
+        """Drop the index; the next check rebuilds it"""
+        cache.delete(cls.CACHE_KEY)
+
+    @classmethod
+    def get(cls):
+        index = cache.get(cls.CACHE_KEY)
+        if index is None:
+            index = cls.rebuild()
+        return index
+
+    @classmethod
+    async def aget(cls):
+        index = await cache.aget(cls.CACHE_KEY)
+        if index is None:
+            index = await sync_to_async(cls.rebuild)()
+        return index
+
+    @classmethod
+    def eligible_election_ids(cls, state, city, district):
+        """All active election ids for a region"""
+        index = cls.get()
+        return (
+            index['national']
+            | index['state'].get(state, set())
+            | index['city'].get((state, city), set())
+            | index['district'].get((state, district), set())
+        )
+
+    @classmethod
+    def is_eligible(cls, state, city, district, election_id):
+        """Constant-time check that a region may vote in an election"""
+        return cls._index_allows(cls.get(), state, city, district, election_id)
+
+    @classmethod
+    async def ais_eligible(cls, state, city, district, election_id):
+        return cls._index_allows(await cls.aget(), state, city, district, election_id)
+
+    @staticmethod
+    def _index_allows(index, state, city, district, election_id):
+        election_id = str(election_id)
+        return (
+            election_id in index['national']
+            or election_id in index['state'].get(state, ())
+            or election_id in index['city'].get((state, city), ())
+            or election_id in index['district'].get((state, district), ())
+        )
+
+
+@receiver(post_save, sender=Election)
+@receiver(post_delete, sender=Election)
+def invalidate_eligibility_index(sender, **kwargs):
+    # After commit, so a concurrent rebuild cannot cache the old state again
+    transaction.on_commit(EligibilityIndex.invalidate)
@@ -0,0 +1,428 @@
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import zlib
+from datetime import datetime, timedelta
+from itertools import chain, islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Value
+from django.db.models.functions import Coalesce, Concat, Upper
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+from .analytics import ColumnarExport
+from .models import AuditLog, Election, ExportJob, Voter
+
+logger = logging.getLogger(__name__)
+
+
+VOTER_LIST_HEADER = ['Voter ID', 'Full Name', 'Email', 'Mobile', 'City', 'Pincode', 'Approval Status']
+AUDIT_LOG_HEADER = ['Timestamp', 'Type', 'User', 'Details', 'IP Address', 'Hash']
+
+
+def voters_for_election(election, approval_statuses):
+    """Voters in an election's region with one of the given approval statuses"""
+    if not approval_statuses:
+        return Voter.objects.none()
+
+    voters = Voter.objects.filter(state=election.state, approval_status__in=approval_statuses)
+    if election.election_type == 'Municipal' and election.city:
+        voters = voters.filter(city=election.city)
+    if election.election_type == 'Panchayat' and election.district:
+        voters = voters.filter(district=election.district)
+    return voters
+
+
+def filter_audit_logs(params, logs):
+    """Apply the audit log page's type, date and election filters (request.GET or a dict).
+
+    The date filter is a timestamp range rather than timestamp__date, so the
+    (log_type, timestamp) and (election, timestamp) indexes stay usable.
+    """
+    log_type = params.get('type')
+    date = params.get('date')
+    election_id = params.get('election')
+
+    if log_type:
+        logs = logs.filter(log_type=log_type)
+    if election_id:
+        logs = logs.filter(election_id=election_id)
+    if date:
+        day_start = timezone.make_aware(datetime.strptime(date, '%Y-%m-%d'))
+        logs = logs.filter(timestamp__gte=day_start, timestamp__lt=day_start + timedelta(days=1))
+    return logs
+
+
+def export_chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+
+def voter_list_rows(voters):
+    """Stream VOTER_LIST_HEADER rows as tuples, with the name and status formatted in SQL"""
+    return voters.annotate(
+        export_name=Concat('first_name', Value(' '), 'last_name'),
+        export_status=Upper('approval_status')
+    ).order_by('first_name', 'last_name', 'id').values_list(
+        'voter_id', 'export_name', 'email', 'mobile', 'city', 'pincode', 'export_status'
+    ).iterator(chunk_size=export_chunk_size())
+
+
+def audit_log_rows(logs):
+    """Stream AUDIT_LOG_HEADER rows as tuples; the user name comes from a SQL join"""
+    rows = logs.annotate(
+        export_user=Coalesce('user__username', Value('System'))
+    ).values_list('timestamp', 'log_type', 'export_user', 'details', 'ip_address', 'hash_chain')
+    for timestamp, log_type, user, details, ip_address, hash_chain in rows.iterator(chunk_size=export_chunk_size()):
+        yield timestamp, log_type, user, json.dumps(details), ip_address, hash_chain
+
+
+class CSVExport:
+    """Constant-memory CSV downloads.
+
+    Rows come from values_list().iterator(chunk_size=EXPORT_CHUNK_SIZE) (see
+    voter_list_rows and audit_log_rows), are written into a small buffer and
+    handed to a StreamingHttpResponse roughly FLUSH_BYTES at a time, optionally
+    through a streaming gzip compressor. Neither the rows nor the file are ever
+    held in memory as a whole.
+    """
+
+    FLUSH_BYTES = 64 * 1024
+
+    @staticmethod
+    def wants_gzip(request):
+        return request.GET.get('compress') == 'gzip'
+
+    @classmethod
+    def stream(cls, rows, preamble=(), footer=None, compress=False, on_complete=None):
+        """Yield the encoded file.
+
+        `preamble` rows are written first; `footer(row_count)` may return rows to
+        append. `on_complete(row_count)` runs once the last row has been sent.
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        # wbits=31 produces a complete .gz stream rather than a raw deflate one
+        compressor = zlib.compressobj(wbits=31) if compress else None
+
+        def drain():
+            data = buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+            return compressor.compress(data) if compressor else data
+
+        writer.writerows(preamble)
+        row_count = 0
+        for row in rows:
+            writer.writerow(row)
+            row_count += 1
+            if buffer.tell() >= cls.FLUSH_BYTES:
+                chunk = drain()
+                if chunk:
+                    yield chunk
+
+        if footer:
+            writer.writerows(footer(row_count))
+        chunk = drain()
+        if compressor:
+            chunk += compressor.flush()
+        yield chunk
+
+        if on_complete:
+            try:
+                on_complete(row_count)
+            except Exception as e:
+                logger.error(f"Export completion hook failed after {row_count} rows: {e}")
+
+    @classmethod
+    def response(cls, rows, filename, preamble=(), footer=None, compress=False, on_complete=None):
+        """StreamingHttpResponse serving `rows` as filename.csv (or .csv.gz)"""
+        content_type = 'text/csv'
+        filename = f"{filename}.csv"
+        if compress:
+            content_type = 'application/gzip'
+            filename += '.gz'
+
+        response = StreamingHttpResponse(
+            cls.stream(rows, preamble, footer, compress, on_complete),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+
+class ExcelExport:
+    """Constant-memory XLSX files using openpyxl's write-only mode.
+
+    Rows are appended straight from an iterator and spooled to disk by
+    openpyxl, so memory does not grow with the row count. Write-only sheets
+    need their column widths before the first row, so widths are estimated
+    from the header and the first EXCEL_WIDTH_SAMPLE_ROWS rows instead of
+    rescanning every cell afterwards.
+    """
+
+    CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    MAX_WIDTH = 50
+
+    @staticmethod
+    def sample_size():
+        return getattr(settings, 'EXCEL_WIDTH_SAMPLE_ROWS', 1000)
+
+    @staticmethod
+    def cell_value(value):
+        # Excel has no time zones; keep aware timestamps readable instead of failing
+        if isinstance(value, datetime) and timezone.is_aware(value):
+            return value.isoformat(sep=' ')
+        return value
+
+    @classmethod
+    def column_widths(cls, header, sample):
+        widths = [len(str(title)) for title in header]
+        for row in sample:
+            for index, value in enumerate(row):
+                if value is not None:
+                    widths[index] = max(widths[index], len(str(value)))
+        return [min(width + 2, cls.MAX_WIDTH) for width in widths]
+
+    @classmethod
+    def write(cls, target, header, rows, title_rows=(), footer=None, sheet_title='Sheet'):
+        """Write rows under a styled header to a path or binary file; returns the row count.
+
+        `title_rows` are lines placed above the header (the first one large and
+        bold); `footer(row_count)` may return lines to add after the data.
+        """
+        import openpyxl
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Alignment, Font, PatternFill
+        from openpyxl.utils import get_column_letter
+
+        rows = iter(rows)
+        sample = list(islice(rows, cls.sample_size()))
+
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet(sheet_title)
+        for index, width in enumerate(cls.column_widths(header, sample), 1):
+            sheet.column_dimensions[get_column_letter(index)].width = width
+
+        def styled(value, **styles):
+            cell = WriteOnlyCell(sheet, value=value)
+            for name, style in styles.items():
+                setattr(cell, name, style)
+            return cell
+
+        for index, line in enumerate(title_rows):
+            sheet.append([styled(line, font=Font(size=14, bold=True)) if index == 0 else line])
+        if title_rows:
+            sheet.append([])
+
+        header_fill = PatternFill(start_color="138808", end_color="138808", fill_type="solid")
+        sheet.append([
+            styled(title, font=Font(bold=True), fill=header_fill, alignment=Alignment(horizontal='center'))
+            for title in header
+        ])
+
+        row_count = 0
+        for row in chain(sample, rows):
+            sheet.append([cls.cell_value(value) for value in row])
+            row_count += 1
+
+        if footer:
+            sheet.append([])
+            for line in footer(row_count):
+                sheet.append([styled(line, font=Font(bold=True))])
+
+        workbook.save(target)
+        return row_count
+
+    @classmethod
+    def response(cls, header, rows, filename, **options):
+        """Build the workbook in a temporary file and serve it as filename.xlsx.
+
+        Returns (response, row_count); options are passed to write().
+        """
+        output = tempfile.TemporaryFile()
+        row_count = cls.write(output, header, rows, **options)
+        output.seek(0)
+        response = FileResponse(output, as_attachment=True, filename=f"{filename}.xlsx", content_type=cls.CONTENT_TYPE)
+        return response, row_count
+
+class BackgroundExport:
+    """Exports generated by a Celery task into MEDIA_ROOT/exports/.
+
+    A request creates an ExportJob and returns at once. The run_export_job task
+    streams the rows into a CSV, XLSX (openpyxl write-only mode) or JSONL file
+    (or Parquet/Arrow for the ColumnarExport analytics datasets),
+    pushing progress to the admin_dashboard group every EXPORT_PROGRESS_ROWS
+    rows, and the file is served by download_export_job once it is complete.
+    Identical requests (same kind, format and parameters) made within
+    EXPORT_JOB_DEDUP_TTL seconds get the existing job instead of a new one.
+    """
+
+    EXTENSIONS = {'csv': 'csv', 'xlsx': 'xlsx', 'jsonl': 'jsonl', 'parquet': 'parquet', 'arrow': 'arrow'}
+
+    @staticmethod
+    def dedup_ttl():
+        return getattr(settings, 'EXPORT_JOB_DEDUP_TTL', 600)
+
+    @staticmethod
+    def progress_every():
+        return getattr(settings, 'EXPORT_PROGRESS_ROWS', 10000)
+
+    @staticmethod
+    def fingerprint(kind, file_format, params):
+        canonical = json.dumps({'kind': kind, 'format': file_format, 'params': params}, sort_keys=True)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    @classmethod
+    def request(cls, user, kind, file_format, params):
+        """Start an export, or join an identical recent one. Returns (job, created)."""
+        fingerprint = cls.fingerprint(kind, file_format, params)
+        cache_key = f"export_job_{fingerprint}"
+
+        existing_id = cache.get(cache_key)
+        if existing_id:
+            existing = ExportJob.objects.filter(id=existing_id).exclude(status='failed').first()
+            if existing is not None:
+                return existing, False
+
+        job = ExportJob.objects.create(
+            kind=kind,
+            file_format=file_format,
+            params=params,
+            fingerprint=fingerprint,
+            requested_by=user
+        )
+        # Whoever stores the key first owns the export; a concurrent duplicate defers to it
+        if not cache.add(cache_key, str(job.id), timeout=cls.dedup_ttl()):
+            winner = ExportJob.objects.filter(id=cache.get(cache_key)).exclude(status='failed').first()
+            if winner is not None:
+                job.delete()
+                return winner, False
+            cache.set(cache_key, str(job.id), timeout=cls.dedup_ttl())
+
+        from .tasks import run_export_job
+        transaction.on_commit(lambda: run_export_job.delay(str(job.id)))
+        return job, True
+
+    @staticmethod
+    def source(job):
+        """(header, rows, total) for a job's kind and parameters"""
+        if job.kind == 'voters_list':
+            election = Election.objects.get(id=job.params['election_id'])
+            voters = voters_for_election(election, job.params.get('statuses', []))
+            return VOTER_LIST_HEADER, voter_list_rows(voters), voters.count()
+        if job.kind == 'audit_logs':
+            logs = filter_audit_logs(job.params, AuditLog.objects.order_by('-timestamp', '-id'))
+            return AUDIT_LOG_HEADER, audit_log_rows(logs), logs.count()
+        if job.kind in ColumnarExport.DATASETS:
+            return ColumnarExport.source(job.kind, job.params)
+        raise ValueError(f"Unknown export kind {job.kind}")
+
+    @classmethod
+    def run(cls, job_id):
+        """Generate the file for a pending job"""
+        if not ExportJob.objects.filter(id=job_id, status='pending').update(status='running'):
+            return None  # Already picked up by another worker
+        job = ExportJob.objects.get(id=job_id)
+
+        relative_path = f"exports/{job.id}.{cls.EXTENSIONS[job.file_format]}"
+        path = os.path.join(settings.MEDIA_ROOT, relative_path)
+        try:
+            header, rows, job.total_rows = cls.source(job)
+            ExportJob.objects.filter(id=job.id).update(total_rows=job.total_rows)
+            cls.notify(job)
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Written under a temporary name so a half-written file is never served
+            getattr(cls, f"write_{job.file_format}")(f"{path}.part", header, cls._track(job, rows))
+            os.replace(f"{path}.part", path)
+
+            job.file.name = relative_path
+            job.status = 'completed'
+            job.completed_at = timezone.now()
+            job.save(update_fields=['file', 'status', 'rows_written', 'completed_at'])
+            logger.info(f"Export {job.id} completed: {job.rows_written} rows")
+        except Exception as e:
+            logger.error(f"Export {job.id} failed: {e}")
+            job.status = 'failed'
+            job.error = str(e)
+            job.save(update_fields=['status', 'error', 'rows_written'])
+            if os.path.exists(f"{path}.part"):
+                os.remove(f"{path}.part")
+
+        cls.notify(job)
+        return job
+
+    @classmethod
+    def _track(cls, job, rows):
+        """Pass rows through, counting them and reporting progress"""
+        every = cls.progress_every()
+        for row in rows:
+            yield row
+            job.rows_written += 1
+            if job.rows_written % every == 0:
+                ExportJob.objects.filter(id=job.id).update(rows_written=job.rows_written)
+                cls.notify(job)
+
+    @staticmethod
+    def write_csv(path, header, rows):
+        with open(path, 'w', newline='', encoding='utf-8') as output:
+            writer = csv.writer(output)
+            writer.writerow(header)
+            writer.writerows(rows)
+
+    @staticmethod
+    def write_jsonl(path, header, rows):
+        with open(path, 'w', encoding='utf-8') as output:
+            for row in rows:
+                output.write(json.dumps(dict(zip(header, row)), default=str))
+                output.write('\n')
+
+    @staticmethod
+    def write_xlsx(path, header, rows):
+        ExcelExport.write(path, header, rows)
+
+    @staticmethod
+    def write_parquet(path, header, rows):
+        ColumnarExport.write(path, header, rows, 'parquet')
+
+    @staticmethod
+    def write_arrow(path, header, rows):
+        ColumnarExport.write(path, header, rows, 'arrow')
+
+    @staticmethod
+    def as_dict(job):
+        data = {
+            'id': str(job.id),
+            'kind': job.kind,
+            'format': job.file_format,
+            'status': job.status,
+            'rows_written': job.rows_written,
+            'total_rows': job.total_rows,
+            'created_at': job.created_at.isoformat() if job.created_at else None,
+            'download_url': None,
+        }
+        if job.status == 'completed':
+            data['download_url'] = f"/api/exports/{job.id}/download/"
+        if job.status == 'failed':
+            data['error'] = job.error
+        return data
+
+    @classmethod
+    def notify(cls, job):
+        channel_layer = get_channel_layer()
+        async_to_sync(channel_layer.group_send)(
+            "admin_dashboard", {
+                "type": "send_admin_update",
+                "data": {"type": "export_progress", "job": cls.as_dict(job)}
+            }
+        )
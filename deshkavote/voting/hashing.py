@@ -0,0 +1,73 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordVerifier:
+    """Password checks on a bounded pool of hashing threads.
+
+    Each login runs exactly one hash verification, on a pool with one thread
+    per core (PASSWORD_HASH_WORKERS). hashlib's PBKDF2 releases the GIL, so
+    the threads hash in parallel without a process pool. Admission control:
+    a request waits at most PASSWORD_HASH_QUEUE_TIMEOUT seconds for a free
+    slot, so the number of hashes in flight never exceeds the pool size and a
+    login storm queues briefly and is then turned away instead of piling up
+    CPU-bound work.
+
+    If the stored hash uses outdated parameters, the password is re-hashed on
+    the request thread after a successful check, as User.check_password does.
+    """
+
+    _executor = None
+    _slots = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def workers():
+        return getattr(settings, 'PASSWORD_HASH_WORKERS', None) or os.cpu_count() or 1
+
+    @staticmethod
+    def queue_timeout():
+        return getattr(settings, 'PASSWORD_HASH_QUEUE_TIMEOUT', 5)
+
+    @classmethod
+    def _pool(cls):
+        with cls._lock:
+            if cls._executor is None:
+                workers = cls.workers()
+                cls._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+                cls._slots = threading.BoundedSemaphore(workers)
+            return cls._executor, cls._slots
+
+    @classmethod
+    def shutdown(cls):
+        """Drop the pool (it is recreated with the current settings on next use)"""
+        with cls._lock:
+            if cls._executor is not None:
+                cls._executor.shutdown(wait=True)
+            cls._executor = cls._slots = None
+
+    @classmethod
+    def verify(cls, user, raw_password):
+        """True or False, or None if no hashing slot became free in time"""
+        executor, slots = cls._pool()
+        if not slots.acquire(timeout=cls.queue_timeout()):
+            logger.warning(f"Password hashing saturated, turned away login for {user.username}")
+            return None
+
+        outdated = []
+        try:
+            correct = executor.submit(check_password, raw_password, user.password, outdated.append).result()
+        finally:
+            slots.release()
+
+        if correct and outdated:
+            user.set_password(raw_password)
+            user.save(update_fields=['password'])
+        return correct
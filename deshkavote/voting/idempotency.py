@@ -0,0 +1,137 @@
+import hashlib
+import json
+import logging
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyStore:
+    """Replay cache for mutating JSON APIs keyed by the client's Idempotency-Key header.
+
+    The first successful response for a key is stored in the cache together with
+    a fingerprint of the request body. A retry with the same key and body gets
+    the stored response back after a single cache lookup - the view, and so the
+    database, are never reached. Keys are scoped to the session cookie and the
+    path, so one client can never replay another's response.
+    """
+
+    HEADER = 'Idempotency-Key'
+    LOCK_TTL = 30
+
+    @staticmethod
+    def ttl():
+        return getattr(settings, 'IDEMPOTENCY_KEY_TTL', 86400)
+
+    @staticmethod
+    def cache_key(request, key):
+        session = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        if not session or not key:
+            return None
+        scope = hashlib.sha256(f"{session}:{request.path}:{key}".encode()).hexdigest()
+        return f"idempotency_{scope}"
+
+    @staticmethod
+    def fingerprint(request):
+        return hashlib.sha256(request.body).hexdigest()
+
+    @classmethod
+    def replay(cls, request, cache_key, stored):
+        """Response for a request whose key has been seen before, or None to run the view"""
+        if stored is None:
+            return None
+        if stored['fingerprint'] != cls.fingerprint(request):
+            return JsonResponse({
+                'success': False,
+                'message': 'Idempotency-Key was already used with a different request'
+            }, status=422)
+
+        response = HttpResponse(stored['content'], status=stored['status'], content_type=stored['content_type'])
+        response['Idempotent-Replayed'] = 'true'
+        logger.info(f"Replayed idempotent response for {request.path}")
+        return response
+
+    @staticmethod
+    def in_progress():
+        return JsonResponse({
+            'success': False,
+            'message': 'A request with this Idempotency-Key is already being processed'
+        }, status=409)
+
+    @classmethod
+    def entry(cls, request, response):
+        """Cache entry for a response, or None if it should not be replayed.
+
+        Only successful outcomes are stored; failed attempts stay retryable.
+        """
+        if response.streaming or not 200 <= response.status_code < 300:
+            return None
+        if response.get('Content-Type', '').startswith('application/json'):
+            try:
+                if json.loads(response.content).get('success') is not True:
+                    return None
+            except (ValueError, AttributeError):
+                return None
+        return {
+            'fingerprint': cls.fingerprint(request),
+            'status': response.status_code,
+            'content': response.content,
+            'content_type': response['Content-Type'],
+        }
+
+
+def idempotent(view_func):
+    """Honour the Idempotency-Key header on a (sync or async) JSON view"""
+    store = IdempotencyStore
+
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            cache_key = store.cache_key(request, request.headers.get(store.HEADER))
+            if cache_key is None or request.method != 'POST':
+                return await view_func(request, *args, **kwargs)
+
+            replayed = store.replay(request, cache_key, await cache.aget(cache_key))
+            if replayed is not None:
+                return replayed
+            if not await cache.aadd(f"{cache_key}_lock", 1, timeout=store.LOCK_TTL):
+                return store.in_progress()
+
+            try:
+                response = await view_func(request, *args, **kwargs)
+                entry = store.entry(request, response)
+                if entry is not None:
+                    await cache.aset(cache_key, entry, timeout=store.ttl())
+                return response
+            finally:
+                await cache.adelete(f"{cache_key}_lock")
+
+        return markcoroutinefunction(wrapper)
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        cache_key = store.cache_key(request, request.headers.get(store.HEADER))
+        if cache_key is None or request.method != 'POST':
+            return view_func(request, *args, **kwargs)
+
+        replayed = store.replay(request, cache_key, cache.get(cache_key))
+        if replayed is not None:
+            return replayed
+        if not cache.add(f"{cache_key}_lock", 1, timeout=store.LOCK_TTL):
+            return store.in_progress()
+
+        try:
+            response = view_func(request, *args, **kwargs)
+            entry = store.entry(request, response)
+            if entry is not None:
+                cache.set(cache_key, entry, timeout=store.ttl())
+            return response
+        finally:
+            cache.delete(f"{cache_key}_lock")
+
+    return wrapper
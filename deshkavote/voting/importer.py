@@ -0,0 +1,301 @@
+import csv
+import json
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from itertools import islice
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .audit import AuditWriter
+from .models import CustomUser, Voter
+
+logger = logging.getLogger(__name__)
+
+
+# Voter field -> accepted column names (the registration form's, then the model's)
+COLUMNS = {
+    'first_name': ('firstName', 'first_name'),
+    'last_name': ('lastName', 'last_name'),
+    'email': ('email',),
+    'mobile': ('mobile',),
+    'date_of_birth': ('dob', 'date_of_birth'),
+    'gender': ('gender',),
+    'parent_spouse_name': ('parentSpouseName', 'parent_spouse_name'),
+    'street_address': ('streetAddress', 'street_address'),
+    'city': ('city',),
+    'state': ('state',),
+    'pincode': ('pincode',),
+    'place_of_birth': ('placeOfBirth', 'place_of_birth'),
+    'voter_id': ('voterId', 'voter_id'),
+    'aadhar_number': ('aadharNumber', 'aadhar_number'),
+    'pan_number': ('panNumber', 'pan_number'),
+    'constituency': ('constituency',),
+    'district': ('district',),
+    'password': ('password',),
+}
+OPTIONAL = ('constituency', 'district', 'password')
+GENDERS = {choice for choice, _ in Voter.GENDER_CHOICES}
+MAX_LENGTHS = {
+    field.name: field.max_length
+    for field in Voter._meta.get_fields()
+    if getattr(field, 'max_length', None) and field.name in COLUMNS
+}
+
+
+def _init_import_worker():
+    """Process pool initializer: make Django usable when workers are spawned rather than forked"""
+    django.setup()
+
+
+def validate_row(row, today=None):
+    """Voter field values for one input row; raises ValueError with the reason it is rejected"""
+    today = today or date.today()
+    values = {}
+    for field, names in COLUMNS.items():
+        value = next((row[name] for name in names if row.get(name) not in (None, '')), '')
+        values[field] = str(value).strip()
+
+    missing = [field for field in COLUMNS if field not in OPTIONAL and not values[field]]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+
+    too_long = [field for field, limit in MAX_LENGTHS.items() if len(values[field]) > limit]
+    if too_long:
+        raise ValueError(f"too long: {', '.join(too_long)}")
+    if values['gender'] not in GENDERS:
+        raise ValueError(f"unknown gender {values['gender']}")
+
+    try:
+        dob = datetime.strptime(values['date_of_birth'], '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError('invalid date of birth (use YYYY-MM-DD)')
+    if today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day)) < 18:
+        raise ValueError('younger than 18')
+    values['date_of_birth'] = dob
+
+    if values['password'] and len(values['password']) < 6:
+        raise ValueError('password shorter than 6 characters')
+    return values
+
+
+def prepare_chunk(rows, hash_passwords=True):
+    """Validate a chunk of (line, row) pairs and hash their passwords.
+
+    Runs in the import process pool. Returns (voters, errors): voter field
+    dicts carrying the line and the encoded password in place of the raw one,
+    and (line, voter_id, reason) tuples for rejected rows.
+    """
+    today = date.today()
+    voters, errors = [], []
+    for line, row in rows:
+        try:
+            values = validate_row(row, today)
+        except ValueError as e:
+            errors.append((line, str(row.get('voterId') or row.get('voter_id') or ''), str(e)))
+            continue
+        password = values.pop('password')
+        # Without a password (or with hashing off) the voter has to set one through a reset
+        values['password_hash'] = make_password(password if hash_passwords and password else None)
+        values['line'] = line
+        voters.append(values)
+    return voters, errors
+
+
+class VoterImporter:
+    """Bulk import of an electoral roll from CSV or JSON Lines.
+
+    The file is streamed in chunks. A process pool validates each chunk (the
+    same rules as register_voter) and hashes its passwords, which is where the
+    CPU goes: PBKDF2 in parallel on every core. The main process commits the
+    chunks in file order, each with one bulk_create for CustomUser and one for
+    Voter, skipping voter IDs that already exist.
+
+    After every commit the last line done is written to a state file, so an
+    interrupted run picks up after the last committed chunk. Because existing
+    voter IDs are skipped, re-running over already imported rows is harmless
+    too.
+    """
+
+    def __init__(self, path, file_format=None, workers=None, chunk_size=1000, hash_passwords=True,
+                 status='pending', state_path=None, on_progress=None):
+        self.path = path
+        self.file_format = file_format or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.hash_passwords = hash_passwords
+        self.status = status
+        self.state_path = state_path or f"{path}.import-state.json"
+        self.on_progress = on_progress
+        self.stats = {'rows': 0, 'inserted': 0, 'existing': 0, 'invalid': 0}
+        self.errors = []
+
+    def rows(self, skip_to=0):
+        """(line, row dict) pairs after line `skip_to`; lines count data rows from 1"""
+        with open(self.path, newline='', encoding='utf-8') as source:
+            if self.file_format == 'jsonl':
+                records = (line for line in source if line.strip())
+                for number, record in enumerate(records, 1):
+                    if number <= skip_to:
+                        continue
+                    try:
+                        row = json.loads(record)
+                    except ValueError:
+                        row = None
+                    yield number, row if isinstance(row, dict) else {}
+            else:
+                for number, row in enumerate(csv.DictReader(source), 1):
+                    if number > skip_to:
+                        yield number, row
+
+    def load_state(self):
+        try:
+            with open(self.state_path) as state_file:
+                state = json.load(state_file)
+        except (OSError, ValueError):
+            return None
+        return state if state.get('path') == os.path.abspath(self.path) else None
+
+    def save_state(self, line):
+        temporary = f"{self.state_path}.tmp"
+        with open(temporary, 'w') as state_file:
+            json.dump({'path': os.path.abspath(self.path), 'line': line, 'stats': self.stats}, state_file)
+        os.replace(temporary, self.state_path)
+
+    def run(self, resume=True):
+        """Import the file; returns the stats dict (plus resumed_from, elapsed, rows_per_second)"""
+        state = self.load_state() if resume else None
+        resumed_from = state['line'] if state else 0
+        if state:
+            self.stats = state['stats']
+        rows_before = self.stats['rows']
+
+        start = time.perf_counter()
+        for last_line, count, (voters, errors) in self.prepared(self.rows(skip_to=resumed_from)):
+            self.commit(voters, errors)
+            self.stats['rows'] += count
+            self.save_state(last_line)
+            if self.on_progress:
+                self.on_progress(self.progress(start, rows_before))
+
+        report = self.progress(start, rows_before)
+        report['resumed_from'] = resumed_from
+        self.finish(report)
+        return report
+
+    def prepared(self, rows):
+        """(last line, row count, prepare_chunk result) per chunk, in file order"""
+        chunks = iter(lambda: list(islice(rows, self.chunk_size)), [])
+        if self.workers <= 1:
+            for chunk in chunks:
+                yield chunk[-1][0], len(chunk), prepare_chunk(chunk, self.hash_passwords)
+            return
+
+        # Forked workers must not share the parent's database connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_import_worker) as pool:
+            pending = deque()
+            for chunk in chunks:
+                pending.append((chunk[-1][0], len(chunk), pool.submit(prepare_chunk, chunk, self.hash_passwords)))
+                # Keep every worker busy, but only a bounded number of chunks in memory
+                if len(pending) > self.workers * 2:
+                    last_line, count, future = pending.popleft()
+                    yield last_line, count, future.result()
+            while pending:
+                last_line, count, future = pending.popleft()
+                yield last_line, count, future.result()
+
+    def progress(self, start, rows_before=0):
+        elapsed = time.perf_counter() - start
+        done = self.stats['rows'] - rows_before
+        return {**self.stats, 'elapsed': elapsed, 'rows_per_second': done / elapsed if elapsed > 0 else 0}
+
+    def commit(self, voters, errors):
+        """Insert one validated chunk: a bulk_create each for users and voters"""
+        self.stats['invalid'] += len(errors)
+        self.errors.extend(errors)
+
+        unique = {}
+        for values in voters:
+            if values['voter_id'] in unique:
+                self.stats['invalid'] += 1
+                self.errors.append((values['line'], values['voter_id'], 'duplicate voter ID in file'))
+            else:
+                unique[values['voter_id']] = values
+        voter_ids = list(unique)
+
+        existing = set(CustomUser.objects.filter(username__in=voter_ids).values_list('username', flat=True))
+        existing.update(Voter.objects.filter(voter_id__in=voter_ids).values_list('voter_id', flat=True))
+        new = [values for voter_id, values in unique.items() if voter_id not in existing]
+        self.stats['existing'] += len(unique) - len(new)
+        if not new:
+            return
+
+        approved = self.status == 'approved'
+        with transaction.atomic():
+            users = CustomUser.objects.bulk_create([
+                CustomUser(
+                    username=values['voter_id'],
+                    password=values['password_hash'],
+                    role='voter',
+                    mobile=values['mobile'],
+                    is_active=approved
+                )
+                for values in new
+            ])
+            if any(user.pk is None for user in users):
+                # Backends without RETURNING: look the ids up instead
+                user_ids = dict(CustomUser.objects.filter(username__in=[user.username for user in users])
+                                .values_list('username', 'id'))
+            else:
+                user_ids = {user.username: user.pk for user in users}
+
+            now = timezone.now()
+            Voter.objects.bulk_create([
+                Voter(
+                    user_id=user_ids[values['voter_id']],
+                    approval_status=self.status,
+                    approval_date=now if approved else None,
+                    **{
+                        field: value for field, value in values.items()
+                        if field not in ('password_hash', 'line')
+                    }
+                )
+                for values in new
+            ])
+        self.stats['inserted'] += len(new)
+
+    def finish(self, report):
+        """Record the import in the audit log and drop the state file"""
+        AuditWriter.record([{
+            'log_type': 'admin_action',
+            'user_id': None,
+            'election_id': None,
+            'details': {
+                'action': 'import_voters',
+                'file': os.path.basename(self.path),
+                'rows': report['rows'],
+                'inserted': report['inserted'],
+                'existing': report['existing'],
+                'invalid': report['invalid'],
+                'approval_status': self.status,
+            },
+            'ip_address': None,
+            'user_agent': '',
+        }])
+        cache.delete('election_stats')
+        logger.info(
+            f"Imported voters from {self.path}: {report['inserted']} inserted, "
+            f"{report['existing']} existing, {report['invalid']} invalid"
+        )
+        try:
+            os.remove(self.state_path)
+        except OSError:
+            pass
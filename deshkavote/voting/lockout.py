@@ -0,0 +1,118 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import CustomUser
+from .redis_utils import get_redis, redis_key
+
+logger = logging.getLogger(__name__)
+
+
+class LoginLockout:
+    """Failed-login counting and account lockout, kept in Redis.
+
+    Each failed password bumps an expiring counter; the LOGIN_MAX_FAILED_ATTEMPTS-th
+    failure within LOGIN_LOCKOUT_SECONDS sets a lock key that expires after
+    LOGIN_LOCKOUT_SECONDS. Nothing is written to the CustomUser row on failed
+    attempts, and the lock is checked before the user is even loaded.
+
+    A successful login writes the user row once, when the session is created,
+    and only if last_login_ip (or legacy lockout columns) actually changed.
+
+    Without Redis the previous behaviour applies: failures, is_locked and
+    lock_time are stored on the CustomUser row.
+    """
+
+    @staticmethod
+    def max_attempts():
+        return getattr(settings, 'LOGIN_MAX_FAILED_ATTEMPTS', 5)
+
+    @staticmethod
+    def lockout_seconds():
+        return getattr(settings, 'LOGIN_LOCKOUT_SECONDS', 900)
+
+    @staticmethod
+    def failures_key(username):
+        return redis_key('login', 'failures', username)
+
+    @staticmethod
+    def locked_key(username):
+        return redis_key('login', 'locked', username)
+
+    @classmethod
+    def is_locked(cls, username):
+        """True while Redis holds a lock for the account (no database access)"""
+        r = get_redis()
+        if r is None:
+            return False
+        try:
+            return bool(r.exists(cls.locked_key(username)))
+        except Exception as e:
+            logger.error(f"Login lockout store unavailable: {e}")
+            return False
+
+    @classmethod
+    def is_locked_in_table(cls, user):
+        """Locks recorded on the user row (without Redis, or from before it was used)"""
+        return bool(
+            user.is_locked and user.lock_time and
+            timezone.now() < user.lock_time + timedelta(seconds=cls.lockout_seconds())
+        )
+
+    @classmethod
+    def record_failure(cls, user):
+        """Count a failed password; returns True if this failure locked the account"""
+        r = get_redis()
+        if r is not None:
+            try:
+                pipe = r.pipeline()
+                pipe.incr(cls.failures_key(user.username))
+                pipe.expire(cls.failures_key(user.username), cls.lockout_seconds())
+                failures = pipe.execute()[0]
+                if failures < cls.max_attempts():
+                    return False
+
+                pipe = r.pipeline()
+                pipe.set(cls.locked_key(user.username), 1, ex=cls.lockout_seconds())
+                pipe.delete(cls.failures_key(user.username))
+                pipe.execute()
+                logger.warning(f"Locked {user.username} for {cls.lockout_seconds()}s after {failures} failed logins")
+                return True
+            except Exception as e:
+                logger.error(f"Login lockout store unavailable, using the database: {e}")
+
+        user.failed_login_attempts += 1
+        if user.failed_login_attempts >= cls.max_attempts():
+            user.is_locked = True
+            user.lock_time = timezone.now()
+        user.save(update_fields=['failed_login_attempts', 'is_locked', 'lock_time'])
+        return user.is_locked
+
+    @classmethod
+    def clear_failures(cls, user):
+        """Forget failed attempts after a correct password"""
+        r = get_redis()
+        if r is not None:
+            try:
+                r.delete(cls.failures_key(user.username))
+            except Exception as e:
+                logger.error(f"Login lockout store unavailable: {e}")
+
+    @classmethod
+    def record_login(cls, user, ip_address):
+        """Write last_login_ip (and reset legacy lockout columns) once per new session, if changed"""
+        changes = {}
+        if user.last_login_ip != ip_address:
+            changes['last_login_ip'] = ip_address
+        if user.failed_login_attempts:
+            changes['failed_login_attempts'] = 0
+        if user.is_locked:
+            changes['is_locked'] = False
+
+        if changes:
+            CustomUser.objects.filter(pk=user.pk).update(**changes)
+            for field, value in changes.items():
+                setattr(user, field, value)
+        return bool(changes)
@@ -0,0 +1,95 @@
+"""Throwaway elections and voters shared by the benchmark_* commands"""
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+
+from voting.models import AuditLog, Candidate, CustomUser, Election, Voter
+from voting.redis_utils import get_redis
+from voting.vote_buffer import VoteIngestionBuffer
+from voting.vote_guard import HasVotedGuard
+
+
+def create_election(name):
+    now = timezone.now()
+    election = Election.objects.create(
+        name=name,
+        state='Benchmark',
+        election_type='General Election',
+        year=now.year,
+        start_date=now,
+        end_date=now + timedelta(days=1),
+        status='active'
+    )
+    candidate = Candidate.objects.create(
+        name=f"{name} Candidate",
+        party='Independent',
+        constituency='Benchmark',
+        symbol='Bench',
+        election=election,
+        is_verified=True
+    )
+    return election, candidate
+
+
+def create_voters(run_id, count, load=True, batch_size=10000, password=None):
+    """Create `count` approved voters in state 'Benchmark'; returns them unless load=False"""
+    password = make_password(password)
+    for start in range(0, count, batch_size):
+        names = [f"BENCH{run_id}{i}" for i in range(start, min(start + batch_size, count))]
+        CustomUser.objects.bulk_create([
+            CustomUser(username=name, password=password, role='voter', mobile='9000000000', is_active=True)
+            for name in names
+        ])
+        users = CustomUser.objects.filter(username__in=names).order_by('id')
+        Voter.objects.bulk_create([
+            Voter(
+                user=user,
+                first_name='Bench',
+                last_name=str(i),
+                email=f"bench{run_id}{i}@example.com",
+                mobile='9000000000',
+                date_of_birth='1990-01-01',
+                gender='Other',
+                parent_spouse_name='Bench',
+                street_address='Bench',
+                city='Bench',
+                state='Benchmark',
+                pincode='000000',
+                place_of_birth='Bench',
+                voter_id=user.username,
+                aadhar_number='000000000000',
+                pan_number='AAAAA0000A',
+                approval_status='approved'
+            )
+            for i, user in enumerate(users, start)
+        ])
+    if not load:
+        return None
+    return list(Voter.objects.filter(user__username__startswith=f"BENCH{run_id}").select_related('user'))
+
+
+def delete_voters(run_id, batch_size=10000):
+    """Remove voters created with create_voters(..., load=False), a batch at a time"""
+    users = CustomUser.objects.filter(username__startswith=f"BENCH{run_id}")
+    while True:
+        ids = list(users.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        CustomUser.objects.filter(id__in=ids).delete()
+
+
+def cleanup(elections, voters):
+    r = get_redis()
+    if r is not None:
+        for election in elections:
+            r.delete(HasVotedGuard.bitmap_key(election.id), HasVotedGuard.ready_key(election.id))
+        if voters:
+            r.delete(*[
+                VoteIngestionBuffer.claim_key(election.id, voter.id)
+                for election in elections for voter in voters
+            ])
+    AuditLog.objects.filter(election__in=elections).delete()
+    for election in elections:
+        election.delete()
+    CustomUser.objects.filter(id__in=[voter.user_id for voter in voters]).delete()
@@ -0,0 +1,84 @@
+import asyncio
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient
+
+from voting.eligibility import EligibilityIndex
+from voting.models import Vote
+from voting.vote_guard import HasVotedGuard
+
+from ._benchmark_data import cleanup, create_election, create_voters
+
+
+class Command(BaseCommand):
+    help = 'Compare request throughput of the sync and async cast_vote endpoints under concurrent load'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--votes', type=int, default=500, help='Number of ballots per endpoint')
+        parser.add_argument('--concurrency', type=int, default=50, help='Requests in flight at once')
+
+    def handle(self, *args, **options):
+        count = options['votes']
+        concurrency = options['concurrency']
+        run_id = uuid.uuid4().hex[:8]
+
+        self.stdout.write(f"Setting up {count} benchmark voters (run {run_id})...")
+        sync_election, sync_candidate = create_election(f"Benchmark Sync {run_id}")
+        async_election, async_candidate = create_election(f"Benchmark Async {run_id}")
+        voters = create_voters(run_id, count)
+        EligibilityIndex.rebuild()
+        for election in (sync_election, async_election):
+            HasVotedGuard.rebuild(election.id)
+
+        try:
+            # Both endpoints are served by the same in-process ASGI handler, so
+            # worker count is identical; only the view implementation differs.
+            clients = asyncio.run(self._login(voters))
+
+            results = []
+            for label, url, election, candidate in (
+                ('Sync cast_vote', '/api/cast-vote/', sync_election, sync_candidate),
+                ('Async cast_vote', '/api/cast-vote-async/', async_election, async_candidate),
+            ):
+                elapsed, failures = asyncio.run(self._run(clients, url, candidate, concurrency))
+                written = Vote.objects.filter(election=election).count()
+                results.append(elapsed)
+                self._report(label, count, elapsed, failures, written)
+
+            self.stdout.write(self.style.SUCCESS(
+                f"Async speedup at concurrency {concurrency}: {results[0] / results[1]:.2f}x"
+            ))
+
+        finally:
+            cleanup([sync_election, async_election], voters)
+            EligibilityIndex.rebuild()
+
+    async def _login(self, voters):
+        clients = []
+        for voter in voters:
+            client = AsyncClient()
+            await client.aforce_login(voter.user)
+            clients.append(client)
+        return clients
+
+    async def _run(self, clients, url, candidate, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+        payload = {'candidate_id': str(candidate.id)}
+
+        async def cast(client):
+            async with semaphore:
+                response = await client.post(url, payload, content_type='application/json')
+                return response.status_code == 200 and response.json().get('success')
+
+        start = time.perf_counter()
+        outcomes = await asyncio.gather(*(cast(client) for client in clients))
+        return time.perf_counter() - start, sum(1 for ok in outcomes if not ok)
+
+    def _report(self, label, count, elapsed, failures, written):
+        rate = count / elapsed if elapsed > 0 else 0
+        self.stdout.write(
+            f"{label:<20} {count:>8} requests in {elapsed:8.2f}s = {rate:10.1f} req/s "
+            f"({written} votes written, {failures} failed)"
+        )
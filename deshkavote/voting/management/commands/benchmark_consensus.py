@@ -0,0 +1,87 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from voting.consensus import ConsensusBatcher
+from voting.models import ElectionNode, Vote
+
+from ._benchmark_data import cleanup, create_election, create_voters
+
+
+class Command(BaseCommand):
+    help = 'Measure votes finalized per second by the batch consensus task at several batch sizes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--votes', type=int, default=1000, help='Pending ballots per batch size')
+        parser.add_argument('--batch-sizes', default='1,50,500', help='Comma-separated batch sizes to compare')
+        parser.add_argument('--latency', type=float, default=0,
+                            help='Simulated node round trip in seconds (rounds within a batch run concurrently)')
+        parser.add_argument('--no-notify', action='store_true', help='Skip channel layer notifications')
+
+    def handle(self, *args, **options):
+        count = options['votes']
+        batch_sizes = [int(size) for size in options['batch_sizes'].split(',')]
+        run_id = uuid.uuid4().hex[:8]
+
+        self.stdout.write(f"Setting up {count} benchmark voters (run {run_id})...")
+        voters = create_voters(run_id, count)
+        elections = []
+
+        try:
+            for batch_size in batch_sizes:
+                election, candidate = create_election(f"Benchmark Consensus {batch_size} {run_id}")
+                elections.append(election)
+                self._create_nodes(election, run_id, batch_size)
+                self._create_pending_votes(voters, candidate, election)
+
+                batches = 0
+                start = time.perf_counter()
+                while True:
+                    claimed, _ = ConsensusBatcher.process(
+                        batch_size=batch_size,
+                        latency=options['latency'],
+                        notify=not options['no_notify']
+                    )
+                    if not claimed:
+                        break
+                    batches += 1
+                elapsed = time.perf_counter() - start
+
+                finalized = Vote.objects.filter(election=election, status='finalized').count()
+                rate = finalized / elapsed if elapsed > 0 else 0
+                self.stdout.write(
+                    f"Batch size {batch_size:>5}: {finalized:>8} finalized in {batches:>6} batches, "
+                    f"{elapsed:8.2f}s = {rate:10.1f} votes/s"
+                )
+
+        finally:
+            cleanup(elections, voters)
+
+    def _create_nodes(self, election, run_id, batch_size):
+        ElectionNode.objects.bulk_create([
+            ElectionNode(
+                node_id=f"bench-{run_id}-{batch_size}-{i}",
+                ip_address='127.0.0.1',
+                port=9000 + i,
+                election=election
+            )
+            for i in range(3)
+        ])
+
+    def _create_pending_votes(self, voters, candidate, election):
+        now = timezone.now()
+        votes = []
+        for voter in voters:
+            nonce = uuid.uuid4().hex
+            votes.append(Vote(
+                voter=voter,
+                candidate=candidate,
+                election=election,
+                nonce=nonce,
+                vote_hash=Vote.compute_vote_hash(voter.voter_id, candidate.id, election.id, now, nonce),
+                status='pending',
+                required_confirmations=3
+            ))
+        Vote.objects.bulk_create(votes, batch_size=1000)
@@ -0,0 +1,100 @@
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from multiprocessing import get_context
+
+import django
+from django.core.management.base import BaseCommand
+
+from ._benchmark_data import cleanup, create_election, create_voters, delete_voters
+
+
+def _peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    try:
+        # VmHWM restarts at exec; ru_maxrss would include the parent's peak on Linux
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    import resource
+    import sys
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _legacy_write(output, header, rows):
+    """The previous implementation: a regular workbook built cell by cell, then every column rescanned"""
+    import openpyxl
+    from openpyxl.utils import get_column_letter
+
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    for column, title in enumerate(header, 1):
+        sheet.cell(row=1, column=column).value = title
+    for row_number, row in enumerate(rows, 2):
+        for column, value in enumerate(row, 1):
+            sheet.cell(row=row_number, column=column).value = value
+    for column in range(1, len(header) + 1):
+        letter = get_column_letter(column)
+        width = max(len(str(cell.value)) for cell in sheet[letter])
+        sheet.column_dimensions[letter].width = min(width + 2, 50)
+    workbook.save(output)
+
+
+def _measure(engine, election_id, rows):
+    """Runs in a fresh process so peak RSS belongs to this export alone"""
+    import tempfile
+
+    from voting.exports import VOTER_LIST_HEADER, ExcelExport, voter_list_rows, voters_for_election
+    from voting.models import Election
+
+    election = Election.objects.get(id=election_id)
+    baseline = _peak_rss_mb()
+    start = time.perf_counter()
+    with tempfile.TemporaryFile() as output:
+        voter_rows = islice(voter_list_rows(voters_for_election(election, ['approved'])), rows)
+        if engine == 'write_only':
+            ExcelExport.write(output, VOTER_LIST_HEADER, voter_rows, title_rows=['Benchmark'],
+                              footer=lambda count: [f"Total Voters: {count}"])
+        else:
+            _legacy_write(output, VOTER_LIST_HEADER, voter_rows)
+        file_size = output.tell()
+    return time.perf_counter() - start, _peak_rss_mb(), baseline, file_size
+
+
+class Command(BaseCommand):
+    help = 'Measure wall time and peak RSS of the Excel voter list export (write-only engine vs. the old workbook)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', default='100000,1000000', help='Comma-separated voter counts to export')
+        parser.add_argument('--engines', default='write_only,legacy',
+                            help='Comma-separated engines: write_only, legacy (the old cell-by-cell workbook)')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['rows'].split(',')]
+        engines = options['engines'].split(',')
+        run_id = uuid.uuid4().hex[:8]
+
+        self.stdout.write(f"Setting up {max(sizes)} benchmark voters (run {run_id})...")
+        election, _ = create_election(f"Benchmark Excel {run_id}")
+        create_voters(run_id, max(sizes), load=False)
+
+        try:
+            for rows in sizes:
+                for engine in engines:
+                    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn'), initializer=django.setup) as pool:
+                        elapsed, peak, baseline, file_size = pool.submit(_measure, engine, election.id, rows).result()
+                    self.stdout.write(
+                        f"{engine:>10} {rows:>9} rows: {elapsed:8.2f}s = {rows / elapsed:9.0f} rows/s, "
+                        f"peak RSS {peak:8.1f} MB (+{peak - baseline:.1f} MB), file {file_size / 1048576:.1f} MB"
+                    )
+        finally:
+            cleanup([election], [])
+            delete_voters(run_id)
@@ -0,0 +1,74 @@
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client, override_settings
+
+from voting.hashing import PasswordVerifier
+
+from ._benchmark_data import create_voters, delete_voters
+
+PASSWORD = 'benchmark-password'
+
+
+class Command(BaseCommand):
+    help = 'Measure password verifications and full login_user requests per second, per CPU core'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=200, help='Logins per measurement')
+        parser.add_argument('--concurrency', default=None,
+                            help='Comma-separated numbers of concurrent clients (default: 1 and the core count)')
+
+    def handle(self, *args, **options):
+        count = options['logins']
+        cores = os.cpu_count() or 1
+        levels = [int(level) for level in options['concurrency'].split(',')] if options['concurrency'] else sorted({1, cores})
+        run_id = uuid.uuid4().hex[:8]
+        self.stdout.write(f"{cores} CPU core(s), {PasswordVerifier.workers()} hashing worker(s)")
+
+        # Hashing alone: the previous login path verified twice, the new one once
+        encoded = make_password(PASSWORD)
+        for label, hashes in (('2 hashes/login (before)', 2), ('1 hash/login', 1)):
+            start = time.perf_counter()
+            for _ in range(max(1, count // 10)):
+                for _ in range(hashes):
+                    check_password(PASSWORD, encoded)
+            elapsed = time.perf_counter() - start
+            self._report(label, max(1, count // 10), elapsed, 1, 0)
+
+        self.stdout.write(f"Setting up {count * len(levels)} benchmark voters (run {run_id})...")
+        create_voters(run_id, count * len(levels), load=False, password=PASSWORD)
+
+        try:
+            with override_settings(RATE_LIMITS={}):
+                for index, concurrency in enumerate(levels):
+                    usernames = [f"BENCH{run_id}{i}" for i in range(index * count, (index + 1) * count)]
+                    elapsed, failures = self._run(usernames, concurrency)
+                    self._report(f"login_user x{concurrency}", count, elapsed, min(concurrency, cores), failures)
+        finally:
+            delete_voters(run_id)
+
+    def _run(self, usernames, concurrency):
+        def login(username):
+            response = Client().post('/login_user/', json.dumps({'voterId': username, 'password': PASSWORD}),
+                                     content_type='application/json', REMOTE_ADDR='10.0.0.1')
+            ok = response.status_code == 200 and response.json().get('success')
+            connections.close_all()
+            return ok
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes = list(pool.map(login, usernames))
+        return time.perf_counter() - start, sum(1 for ok in outcomes if not ok)
+
+    def _report(self, label, count, elapsed, cores_used, failures):
+        rate = count / elapsed if elapsed > 0 else 0
+        self.stdout.write(
+            f"{label:<24} {count:>6} logins in {elapsed:7.2f}s = {rate:8.1f}/s, "
+            f"{rate / cores_used:8.1f}/s per core ({failures} failed)"
+        )
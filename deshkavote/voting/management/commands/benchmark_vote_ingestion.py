@@ -0,0 +1,81 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from voting.models import Vote
+from voting.redis_utils import get_redis
+from voting.views import create_audit_log
+from voting.vote_buffer import VoteIngestionBuffer
+
+from ._benchmark_data import cleanup, create_election, create_voters
+
+
+class Command(BaseCommand):
+    help = 'Compare vote ingestion throughput of the per-row cast_vote path and the write-behind buffer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--votes', type=int, default=1000, help='Number of ballots per path')
+        parser.add_argument('--batch-size', type=int, default=VoteIngestionBuffer.batch_size(),
+                            help='Flush batch size for the buffered path')
+
+    def handle(self, *args, **options):
+        count = options['votes']
+        batch_size = options['batch_size']
+        run_id = uuid.uuid4().hex[:8]
+
+        self.stdout.write(f"Setting up {count} benchmark voters (run {run_id})...")
+        direct_election, direct_candidate = create_election(f"Benchmark Direct {run_id}")
+        buffered_election, buffered_candidate = create_election(f"Benchmark Buffered {run_id}")
+        voters = create_voters(run_id, count)
+
+        try:
+            # Per-row path: the same writes cast_vote performs for each ballot
+            start = time.perf_counter()
+            for voter in voters:
+                with transaction.atomic():
+                    vote = Vote.objects.create(
+                        voter=voter,
+                        candidate=direct_candidate,
+                        election=direct_election,
+                        status='pending',
+                        required_confirmations=3
+                    )
+                    create_audit_log(
+                        'vote_cast',
+                        user=voter.user,
+                        election=direct_election,
+                        details={'voter_id': voter.voter_id, 'candidate_name': direct_candidate.name, 'vote_hash': vote.vote_hash}
+                    )
+            direct_elapsed = time.perf_counter() - start
+            self._report('Per-row inserts', count, direct_elapsed)
+
+            if get_redis() is None:
+                self.stdout.write(self.style.WARNING('Redis is not configured as the cache backend, skipping buffered path'))
+                return
+
+            # Buffered path: acknowledge every ballot, then drain the buffer in batches
+            start = time.perf_counter()
+            for voter in voters:
+                VoteIngestionBuffer.submit(voter, buffered_candidate, buffered_election, schedule_flush=False)
+            ack_elapsed = time.perf_counter() - start
+
+            while VoteIngestionBuffer.pending_count():
+                VoteIngestionBuffer.flush(batch_size=batch_size, notify=False)
+            buffered_elapsed = time.perf_counter() - start
+
+            written = Vote.objects.filter(election=buffered_election).count()
+            self._report('Buffer acknowledgements', count, ack_elapsed)
+            self._report(f'Buffered bulk inserts (batch {batch_size})', written, buffered_elapsed)
+            self.stdout.write(self.style.SUCCESS(
+                f"Speedup: {direct_elapsed / buffered_elapsed:.1f}x end-to-end, "
+                f"{direct_elapsed / ack_elapsed:.1f}x on acknowledgement latency"
+            ))
+
+        finally:
+            cleanup([direct_election, buffered_election], voters)
+
+    def _report(self, label, count, elapsed):
+        rate = count / elapsed if elapsed > 0 else 0
+        self.stdout.write(f"{label:<40} {count:>8} votes in {elapsed:8.2f}s = {rate:10.1f} votes/s")
@@ -0,0 +1,66 @@
+import csv
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from voting.importer import VoterImporter
+
+
+class Command(BaseCommand):
+    help = 'Bulk import voters from a CSV or JSON Lines file (resumes an interrupted import of the same file)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV (with a header row) or .jsonl file of voters')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Input format (default: from the file extension)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Validation and hashing processes')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows per worker task and per bulk insert')
+        parser.add_argument('--passwords', choices=['hash', 'unusable'], default='hash',
+                            help="Hash the file's password column, or give every voter an unusable password")
+        parser.add_argument('--status', choices=['pending', 'approved'], default='pending',
+                            help='Approval status of imported voters (approved voters can log in right away)')
+        parser.add_argument('--restart', action='store_true', help='Ignore the state of an earlier, interrupted run')
+        parser.add_argument('--error-file', help='Write rejected rows (line, voter ID, reason) to this CSV')
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['path']):
+            raise CommandError(f"No such file: {options['path']}")
+
+        importer = VoterImporter(
+            options['path'],
+            file_format=options['format'],
+            workers=options['workers'],
+            chunk_size=options['chunk_size'],
+            hash_passwords=options['passwords'] == 'hash',
+            status=options['status'],
+            on_progress=lambda progress: self.stdout.write(
+                f"  {progress['rows']} rows, {progress['inserted']} inserted "
+                f"({progress['rows_per_second']:.1f} rows/s)"
+            )
+        )
+        state = None if options['restart'] else importer.load_state()
+        if state:
+            self.stdout.write(f"Resuming after line {state['line']}")
+
+        report = importer.run(resume=not options['restart'])
+        self.stdout.write(
+            f"Imported {report['rows'] - report['resumed_from']} rows in {report['elapsed']:.2f}s = "
+            f"{report['rows_per_second']:.1f} rows/s"
+        )
+        self.stdout.write(
+            f"{report['inserted']} voters created, {report['existing']} already registered, "
+            f"{report['invalid']} rejected"
+        )
+
+        if importer.errors:
+            if options['error_file']:
+                with open(options['error_file'], 'w', newline='') as error_file:
+                    writer = csv.writer(error_file)
+                    writer.writerow(['line', 'voter_id', 'reason'])
+                    writer.writerows(importer.errors)
+                self.stdout.write(f"Rejected rows written to {options['error_file']}")
+            else:
+                for line, voter_id, reason in importer.errors[:20]:
+                    self.stdout.write(self.style.WARNING(f"  line {line} {voter_id}: {reason}"))
+                if len(importer.errors) > 20:
+                    self.stdout.write(f"  ... {len(importer.errors) - 20} more (use --error-file)")
+        self.stdout.write(self.style.SUCCESS('Import complete'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from voting.models import Election
+from voting.redis_utils import get_redis
+from voting.vote_guard import HasVotedGuard
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the Redis has-voted bitmaps from the Vote table (e.g. after Redis restarts cold)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--election', help='Only rebuild this election id (default: all active elections)')
+
+    def handle(self, *args, **options):
+        if get_redis() is None:
+            raise CommandError('Redis is not configured as the cache backend')
+
+        elections = Election.objects.filter(status='active')
+        if options['election']:
+            elections = Election.objects.filter(id=options['election'])
+
+        for election in elections:
+            marked = HasVotedGuard.rebuild(election.id)
+            turnout = HasVotedGuard.turnout(election.id)
+            self.stdout.write(f"{election.name}: {marked} votes marked, turnout {turnout}")
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {elections.count()} bitmap(s)"))
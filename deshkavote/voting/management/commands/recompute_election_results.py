@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+
+from voting.models import ElectionResult, Election
+from voting.results import ElectionResultSnapshot
+
+
+class Command(BaseCommand):
+    help = 'Recount stored election results from the Vote table and report any drift (for audits)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--election', help='Only recompute this election id (default: all completed elections)')
+        parser.add_argument('--dry-run', action='store_true', help='Report differences without overwriting stored results')
+
+    def handle(self, *args, **options):
+        elections = Election.objects.filter(status='completed')
+        if options['election']:
+            elections = Election.objects.filter(id=options['election'])
+
+        mismatched = 0
+        for election in elections:
+            stored = self._stored_counts(election)
+            recounted = {
+                row['candidate__id']: row['vote_count']
+                for row in ElectionResultSnapshot.recount(election)
+            }
+
+            if stored is None:
+                self.stdout.write(f"{election.name}: no stored result")
+            elif stored != recounted:
+                mismatched += 1
+                self.stdout.write(self.style.WARNING(f"{election.name}: stored result differs from recount"))
+                for candidate_id in sorted(set(stored) | set(recounted), key=str):
+                    if stored.get(candidate_id, 0) != recounted.get(candidate_id, 0):
+                        self.stdout.write(
+                            f"  candidate {candidate_id}: stored {stored.get(candidate_id, 0)}, "
+                            f"recounted {recounted.get(candidate_id, 0)}"
+                        )
+            else:
+                self.stdout.write(f"{election.name}: OK ({sum(recounted.values())} votes)")
+
+            if not options['dry_run']:
+                ElectionResultSnapshot.compute(election, recount=True)
+
+        action = 'Checked' if options['dry_run'] else 'Recomputed'
+        self.stdout.write(self.style.SUCCESS(
+            f"{action} {elections.count()} election(s), {mismatched} with differences"
+        ))
+
+    def _stored_counts(self, election):
+        try:
+            result = election.result
+        except ElectionResult.DoesNotExist:
+            return None
+        return {row.candidate_id: row.votes for row in result.candidate_results.all()}
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.5 on 2026-10-16 12:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0012_candidatetally'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ElectionResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_votes', models.PositiveIntegerField(default=0)),
+                ('eligible_voters', models.PositiveIntegerField(default=0)),
+                ('voter_turnout', models.FloatField(default=0)),
+                ('is_tie', models.BooleanField(default=False)),
+                ('consensus_threshold', models.IntegerField(default=51)),
+                ('consensus_achieved', models.BooleanField(default=False)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('election', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='result', to='voting.election')),
+                ('winner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='voting.candidate')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CandidateResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('party', models.CharField(max_length=50)),
+                ('symbol', models.CharField(max_length=50)),
+                ('rank', models.PositiveIntegerField()),
+                ('votes', models.PositiveIntegerField(default=0)),
+                ('percentage', models.FloatField(default=0)),
+                ('candidate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='voting.candidate')),
+                ('election_result', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='candidate_results', to='voting.electionresult')),
+            ],
+            options={
+                'ordering': ['rank'],
+                'unique_together': {('election_result', 'candidate')},
+            },
+        ),
+    ]
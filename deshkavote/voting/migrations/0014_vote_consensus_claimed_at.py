@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-16 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0013_electionresult_candidateresult'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vote',
+            name='consensus_claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
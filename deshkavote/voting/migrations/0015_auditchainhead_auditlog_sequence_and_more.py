@@ -0,0 +1,45 @@
+# Generated by Django 5.2.5 on 2026-10-17 09:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def seed_chain_head(apps, schema_editor):
+    """Continue the existing chain from its newest entry"""
+    AuditLog = apps.get_model('voting', 'AuditLog')
+    AuditChainHead = apps.get_model('voting', 'AuditChainHead')
+    last_log = AuditLog.objects.order_by('-timestamp').first()
+    AuditChainHead.objects.get_or_create(
+        pk=1,
+        defaults={'sequence': 0, 'head_hash': last_log.hash_chain if last_log else ''}
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0014_vote_consensus_claimed_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditChainHead',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.BigIntegerField(default=0)),
+                ('head_hash', models.CharField(blank=True, max_length=64)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='auditlog',
+            name='sequence',
+            field=models.BigIntegerField(blank=True, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='auditlog',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(seed_chain_head, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-17 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0015_auditchainhead_auditlog_sequence_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.BigIntegerField(unique=True)),
+                ('hash_chain', models.CharField(max_length=64)),
+                ('signature', models.CharField(max_length=128)),
+                ('rows_verified', models.BigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-sequence'],
+            },
+        ),
+    ]
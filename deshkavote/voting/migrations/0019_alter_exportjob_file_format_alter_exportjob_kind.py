@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-17 14:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0018_exportjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exportjob',
+            name='file_format',
+            field=models.CharField(choices=[('csv', 'CSV'), ('xlsx', 'Excel'), ('jsonl', 'JSON Lines'), ('parquet', 'Parquet'), ('arrow', 'Arrow IPC')], max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='exportjob',
+            name='kind',
+            field=models.CharField(choices=[('voters_list', 'Voters List'), ('audit_logs', 'Audit Logs'), ('votes', 'Votes (analytics)'), ('voter_demographics', 'Voter Demographics (analytics)')], max_length=20),
+        ),
+    ]
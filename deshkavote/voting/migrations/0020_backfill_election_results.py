@@ -0,0 +1,71 @@
+# Generated by Django 5.2.5 on 2026-10-17 09:00
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def backfill_results(apps, schema_editor):
+    """Snapshot completed elections that ended before results were stored, counting the Vote table"""
+    Election = apps.get_model('voting', 'Election')
+    ElectionResult = apps.get_model('voting', 'ElectionResult')
+    CandidateResult = apps.get_model('voting', 'CandidateResult')
+    Vote = apps.get_model('voting', 'Vote')
+    Voter = apps.get_model('voting', 'Voter')
+
+    for election in Election.objects.filter(status='completed', result__isnull=True):
+        vote_counts = list(
+            Vote.objects.filter(election=election, status='finalized').values(
+                'candidate__id', 'candidate__name', 'candidate__party', 'candidate__symbol'
+            ).annotate(vote_count=Count('id')).order_by('-vote_count')
+        )
+        total_votes = sum(row['vote_count'] for row in vote_counts)
+
+        voters = Voter.objects.filter(approval_status='approved')
+        if election.election_type == 'State Assembly':
+            voters = voters.filter(state=election.state)
+        elif election.election_type == 'Municipal':
+            voters = voters.filter(state=election.state, city=election.city)
+        elif election.election_type == 'Panchayat':
+            voters = voters.filter(state=election.state, district=election.district)
+        eligible_voters = voters.count()
+
+        percentages = [
+            round(row['vote_count'] / total_votes * 100, 2) if total_votes > 0 else 0 for row in vote_counts
+        ]
+        is_tie = len(vote_counts) > 1 and vote_counts[0]['vote_count'] == vote_counts[1]['vote_count']
+        winner = vote_counts[0] if vote_counts and not is_tie else None
+
+        result = ElectionResult.objects.create(
+            election=election,
+            total_votes=total_votes,
+            eligible_voters=eligible_voters,
+            voter_turnout=round(total_votes / eligible_voters * 100, 2) if eligible_voters > 0 else 0,
+            winner_id=winner['candidate__id'] if winner else None,
+            is_tie=is_tie,
+            consensus_threshold=election.consensus_threshold,
+            consensus_achieved=bool(winner) and total_votes > 0 and percentages[0] >= election.consensus_threshold
+        )
+        CandidateResult.objects.bulk_create([
+            CandidateResult(
+                election_result=result,
+                candidate_id=row['candidate__id'],
+                name=row['candidate__name'],
+                party=row['candidate__party'],
+                symbol=row['candidate__symbol'],
+                rank=rank,
+                votes=row['vote_count'],
+                percentage=percentage
+            )
+            for rank, (row, percentage) in enumerate(zip(vote_counts, percentages), 1)
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0019_alter_exportjob_file_format_alter_exportjob_kind'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_results, migrations.RunPython.noop),
+    ]
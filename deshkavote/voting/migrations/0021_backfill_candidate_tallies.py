@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-17 09:30
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def backfill_tallies(apps, schema_editor):
+    """Count finalized votes cast before the tally table existed"""
+    Election = apps.get_model('voting', 'Election')
+    Candidate = apps.get_model('voting', 'Candidate')
+    CandidateTally = apps.get_model('voting', 'CandidateTally')
+    Vote = apps.get_model('voting', 'Vote')
+
+    for election_id in Election.objects.exclude(tallies__isnull=False).values_list('id', flat=True):
+        recount = dict(
+            Vote.objects.filter(election_id=election_id, status='finalized')
+            .values('candidate_id').annotate(vote_count=Count('id'))
+            .values_list('candidate_id', 'vote_count')
+        )
+        CandidateTally.objects.bulk_create([
+            CandidateTally(election_id=election_id, candidate_id=candidate_id, vote_count=recount.get(candidate_id, 0))
+            for candidate_id in Candidate.objects.filter(election_id=election_id).values_list('id', flat=True)
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0020_backfill_election_results'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_tallies, migrations.RunPython.noop),
+    ]
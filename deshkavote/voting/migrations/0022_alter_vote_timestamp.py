@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-17 12:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0021_backfill_candidate_tallies'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='vote',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
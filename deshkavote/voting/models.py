@@ -117,44 +117,19 @@ class Voter(models.Model):
         return (self.aadhar_verified and self.pan_verified and
                 self.voter_id_verified)
 
-    def get_eligible_elections(self):
-        """Get elections this voter is eligible for based on location"""
-        eligible_elections = []
-
-        # National elections - all voters eligible
-        national_elections = Election.objects.filter(
-            election_type='General Election',
-            status='active'
-        )
-        eligible_elections.extend(national_elections)
+    def get_eligible_election_ids(self):
+        """Get ids of active elections this voter is eligible for, from the shared region index"""
+        from .eligibility import EligibilityIndex
+        return EligibilityIndex.eligible_election_ids(self.state, self.city, self.district)
 
-        # State elections - voters from same state
-        state_elections = Election.objects.filter(
-            election_type='State Assembly',
-            state=self.state,
-            status='active'
-        )
-        eligible_elections.extend(state_elections)
-
-        # Municipal elections - voters from same city
-        municipal_elections = Election.objects.filter(
-            election_type='Municipal',
-            state=self.state,
-            city=self.city,
-            status='active'
-        )
-        eligible_elections.extend(municipal_elections)
-
-        # Panchayat elections - voters from same district
-        panchayat_elections = Election.objects.filter(
-            election_type='Panchayat',
-            state=self.state,
-            district=self.district,
-            status='active'
-        )
-        eligible_elections.extend(panchayat_elections)
+    def is_eligible_for(self, election):
+        """Check eligibility for a single election without a database round trip"""
+        from .eligibility import EligibilityIndex
+        return EligibilityIndex.is_eligible(self.state, self.city, self.district, election.id)
 
-        return eligible_elections
+    def get_eligible_elections(self):
+        """Get elections this voter is eligible for based on location"""
+        return list(Election.objects.filter(id__in=self.get_eligible_election_ids(), status='active'))
 
     def __str__(self):
         return f"{self.voter_id} - {self.first_name} {self.last_name}"
@@ -302,7 +277,8 @@ class Vote(models.Model):
     voter = models.ForeignKey(Voter, on_delete=models.CASCADE)
     candidate = models.ForeignKey(Candidate, on_delete=models.CASCADE)
     election = models.ForeignKey(Election, on_delete=models.CASCADE)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set before hashing (not auto_now_add) so the stored timestamp is the one in vote_hash
+    timestamp = models.DateTimeField(default=timezone.now)
 
     # Distributed systems fields
     vote_hash = models.CharField(max_length=64, unique=True)
@@ -311,6 +287,7 @@ class Vote(models.Model):
     status = models.CharField(max_length=20, choices=VOTE_STATUS_CHOICES, default='pending')
 
     # Consensus tracking
+    consensus_claimed_at = models.DateTimeField(null=True, blank=True)  # Set while a batch worker owns the vote
     node_confirmations = models.JSONField(default=list)  # Track which nodes confirmed this vote
     confirmation_count = models.IntegerField(default=0)
     required_confirmations = models.IntegerField(default=3)
@@ -325,10 +302,17 @@ class Vote(models.Model):
     class Meta:
         unique_together = ('voter', 'election')
 
+    @staticmethod
+    def compute_vote_hash(voter_code, candidate_id, election_id, timestamp, nonce):
+        """Hash vote fields without touching related objects (used for bulk inserts)"""
+        data = f"{voter_code}{candidate_id}{election_id}{timestamp}{nonce}"
+        return hashlib.sha256(data.encode()).hexdigest()
+
     def generate_vote_hash(self):
         """Generate blockchain-style hash for vote integrity"""
-        data = f"{self.voter.voter_id}{self.candidate.id}{self.election.id}{self.timestamp}{self.nonce}"
-        return hashlib.sha256(data.encode()).hexdigest()
+        return Vote.compute_vote_hash(
+            self.voter.voter_id, self.candidate.id, self.election.id, self.timestamp, self.nonce
+        )
 
     def generate_nonce(self):
         """Generate random nonce for vote verification"""
@@ -344,6 +328,52 @@ class Vote(models.Model):
     def __str__(self):
         return f"{self.voter.voter_id} voted for {self.candidate.name}"
 
+class CandidateTally(models.Model):
+    """Running count of finalized votes per candidate (durable copy of the Redis tally)"""
+    election = models.ForeignKey(Election, on_delete=models.CASCADE, related_name='tallies')
+    candidate = models.OneToOneField(Candidate, on_delete=models.CASCADE, related_name='tally')
+    vote_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['election', '-vote_count'])]
+
+    def __str__(self):
+        return f"{self.candidate.name}: {self.vote_count}"
+
+class ElectionResult(models.Model):
+    """Results of a completed election, computed once when it ends"""
+    election = models.OneToOneField(Election, on_delete=models.CASCADE, related_name='result')
+    total_votes = models.PositiveIntegerField(default=0)
+    eligible_voters = models.PositiveIntegerField(default=0)
+    voter_turnout = models.FloatField(default=0)
+    winner = models.ForeignKey(Candidate, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    is_tie = models.BooleanField(default=False)
+    consensus_threshold = models.IntegerField(default=51)
+    consensus_achieved = models.BooleanField(default=False)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Result of {self.election.name}"
+
+class CandidateResult(models.Model):
+    """One candidate's line in an ElectionResult (name/party/symbol frozen at computation time)"""
+    election_result = models.ForeignKey(ElectionResult, on_delete=models.CASCADE, related_name='candidate_results')
+    candidate = models.ForeignKey(Candidate, on_delete=models.CASCADE, related_name='+')
+    name = models.CharField(max_length=100)
+    party = models.CharField(max_length=50)
+    symbol = models.CharField(max_length=50)
+    rank = models.PositiveIntegerField()
+    votes = models.PositiveIntegerField(default=0)
+    percentage = models.FloatField(default=0)
+
+    class Meta:
+        ordering = ['rank']
+        unique_together = ('election_result', 'candidate')
+
+    def __str__(self):
+        return f"{self.rank}. {self.name}: {self.votes}"
+
 class VoteConsensusLog(models.Model):
     """Track consensus process for votes"""
     vote = models.ForeignKey(Vote, on_delete=models.CASCADE, related_name='consensus_logs')
@@ -399,15 +429,28 @@ class AuditLog(models.Model):
     details = models.JSONField(default=dict)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set before hashing (not auto_now_add) so the stored timestamp is the one in hash_chain
+    timestamp = models.DateTimeField(default=timezone.now)
 
     # Immutability protection
     hash_chain = models.CharField(max_length=64)
     previous_hash = models.CharField(max_length=64, blank=True)
+    sequence = models.BigIntegerField(null=True, blank=True, unique=True)  # Position in the chain (None for legacy rows)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['timestamp', 'id'], name='auditlog_timestamp_idx'),
+            models.Index(fields=['log_type', 'timestamp'], name='auditlog_type_timestamp_idx'),
+            models.Index(fields=['election', 'timestamp'], name='auditlog_election_ts_idx'),
+        ]
 
     def generate_hash(self):
         """Generate hash for audit log integrity"""
-        data = f"{self.log_type}{self.user_id}{self.timestamp}{self.details}{self.previous_hash}"
+        details = self.details
+        if self.sequence is not None:
+            # Canonical JSON: jsonb does not keep key order, so str(details) would not survive a round trip
+            details = json.dumps(self.details, sort_keys=True, separators=(',', ':'))
+        data = f"{self.log_type}{self.user_id}{self.timestamp}{details}{self.previous_hash}"
         return hashlib.sha256(data.encode()).hexdigest()
 
     def save(self, *args, **kwargs):
@@ -415,6 +458,76 @@ class AuditLog(models.Model):
             self.hash_chain = self.generate_hash()
         super().save(*args, **kwargs)
 
+class AuditChainHead(models.Model):
+    """Single row pointing at the newest audit entry.
+
+    Every append locks this row (SELECT ... FOR UPDATE), so concurrent writers
+    are serialized and the chain stays linear.
+    """
+    sequence = models.BigIntegerField(default=0)
+    head_hash = models.CharField(max_length=64, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Audit chain head #{self.sequence}"
+
+class AuditCheckpoint(models.Model):
+    """Signed record that the chain was verified up to a sequence number.
+
+    Later verification runs start from the newest checkpoint whose signature
+    (HMAC over sequence and hash, keyed by SECRET_KEY) is still valid.
+    """
+    sequence = models.BigIntegerField(unique=True)
+    hash_chain = models.CharField(max_length=64)
+    signature = models.CharField(max_length=128)
+    rows_verified = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-sequence']
+
+    def __str__(self):
+        return f"Audit checkpoint #{self.sequence}"
+
+class ExportJob(models.Model):
+    """Export file generated in the background under MEDIA_ROOT/exports/"""
+    KIND_CHOICES = (
+        ('voters_list', 'Voters List'),
+        ('audit_logs', 'Audit Logs'),
+        ('votes', 'Votes (analytics)'),
+        ('voter_demographics', 'Voter Demographics (analytics)'),
+    )
+    FORMAT_CHOICES = (
+        ('csv', 'CSV'),
+        ('xlsx', 'Excel'),
+        ('jsonl', 'JSON Lines'),
+        ('parquet', 'Parquet'),
+        ('arrow', 'Arrow IPC'),
+    )
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    file_format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    params = models.JSONField(default=dict)
+    fingerprint = models.CharField(max_length=64, db_index=True)  # Identifies identical requests
+    requested_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    rows_written = models.BigIntegerField(default=0)
+    total_rows = models.BigIntegerField(null=True, blank=True)
+    file = models.FileField(upload_to='exports/', blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} export ({self.file_format}) - {self.status}"
+
 class VoterSession(models.Model):
     """Track voter sessions for security"""
     voter = models.ForeignKey(Voter, on_delete=models.CASCADE)
@@ -1,14 +1,420 @@
+import json
 import random
 import logging
+import threading
+import time
+import uuid
 from django.utils import timezone
+from django.utils.crypto import salted_hmac
 from django.conf import settings
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage, get_connection, send_mail
 from .models import OTPVerification, Voter
+from .redis_utils import get_redis, redis_key
 
 logger = logging.getLogger(__name__)
 
+
+class RedisOTPStore:
+    """OTP state in Redis instead of the OTPVerification table.
+
+    Each mobile number has one hash {code, email, attempts} that expires after
+    OTP_TTL seconds, so nothing needs cleaning up. Issuing an OTP replaces the
+    hash (invalidating the previous code) in one MULTI/EXEC. Verifying is one
+    EVALSHA: the script bumps attempts with HINCRBY, compares the code, and
+    deletes the hash once the code is used or the attempts are exhausted.
+
+    Only an HMAC of the code is stored.
+    """
+
+    VERIFY_SCRIPT = """
+    local code = redis.call('HGET', KEYS[1], 'code')
+    if not code then
+        return {0, 0}
+    end
+    local attempts = redis.call('HINCRBY', KEYS[1], 'attempts', 1)
+    local remaining = tonumber(ARGV[2]) - attempts
+    if code == ARGV[1] then
+        redis.call('DEL', KEYS[1])
+        return {1, remaining}
+    end
+    if remaining <= 0 then
+        redis.call('DEL', KEYS[1])
+        remaining = 0
+    end
+    return {2, remaining}
+    """
+
+    MISSING, VERIFIED, MISMATCH = 0, 1, 2
+
+    @staticmethod
+    def is_enabled():
+        return getattr(settings, 'OTP_STORE', 'database') == 'redis'
+
+    @staticmethod
+    def ttl():
+        return getattr(settings, 'OTP_TTL', 600)
+
+    @staticmethod
+    def max_attempts():
+        return getattr(settings, 'OTP_MAX_ATTEMPTS', 3)
+
+    @staticmethod
+    def key(mobile):
+        return redis_key('otp', mobile)
+
+    @staticmethod
+    def digest(otp_code):
+        return salted_hmac('voting.otp_service.RedisOTPStore', str(otp_code)).hexdigest()
+
+    @classmethod
+    def client(cls):
+        return get_redis() if cls.is_enabled() else None
+
+    @classmethod
+    def save(cls, r, mobile, email, otp_code):
+        pipe = r.pipeline()
+        pipe.delete(cls.key(mobile))
+        pipe.hset(cls.key(mobile), mapping={'code': cls.digest(otp_code), 'email': email, 'attempts': 0})
+        pipe.expire(cls.key(mobile), cls.ttl())
+        pipe.execute()
+
+    @classmethod
+    def check(cls, r, mobile, otp_code):
+        """Returns (status, attempts_left) with status MISSING, VERIFIED or MISMATCH"""
+        status, remaining = r.register_script(cls.VERIFY_SCRIPT)(
+            keys=[cls.key(mobile)], args=[cls.digest(otp_code), cls.max_attempts()]
+        )
+        return int(status), int(remaining)
+
+
+class OTPMailer:
+    """Queued OTP email delivery over one long-lived SMTP connection.
+
+    send_otp pushes the email onto a Redis list and returns; the
+    send_otp_emails task claims up to OTP_EMAIL_BATCH_SIZE messages and sends
+    them with a single send_messages() call on a connection that each worker
+    keeps open between batches (closed after OTP_SMTP_IDLE_TIMEOUT seconds
+    idle, or on any error).
+
+    Queue entries never hold the code in clear: it is encrypted with a
+    keystream derived from SECRET_KEY and a random per-entry nonce. A batch
+    is claimed by moving its entries (LMOVE, in one MULTI) onto a processing
+    list of its own, which is only deleted once the batch has been sent. A
+    failed batch goes back to the front of the queue, and batches left behind
+    by a crashed worker are requeued after CLAIM_TIMEOUT seconds - delivery
+    is at least once.
+
+    A circuit breaker stops hammering a failing SMTP server: after
+    OTP_SMTP_FAILURE_THRESHOLD consecutive failed batches it opens for
+    OTP_SMTP_COOLDOWN seconds, during which messages stay queued. The first
+    batch after the cooldown is a probe; if it fails too the breaker reopens
+    at once. Messages older than OTP_TTL are dropped, as their code has
+    expired.
+
+    Every delivered message records its enqueue-to-delivery delay; stats()
+    summarises the most recent ones.
+    """
+
+    QUEUE_KEY = redis_key('otp_mail', 'queue')
+    SCHEDULED_KEY = redis_key('otp_mail', 'scheduled')
+    FAILURES_KEY = redis_key('otp_mail', 'failures')
+    OPEN_KEY = redis_key('otp_mail', 'breaker_open')
+    TRIPPED_KEY = redis_key('otp_mail', 'breaker_tripped')
+    DELAYS_KEY = redis_key('otp_mail', 'delays')
+    SENT_KEY = redis_key('otp_mail', 'sent')
+    DROPPED_KEY = redis_key('otp_mail', 'dropped')
+    CLAIMS_KEY = redis_key('otp_mail', 'claims')
+    DELAY_SAMPLES = 1000
+    CLAIM_TIMEOUT = 120  # Seconds before a claimed batch that was never acknowledged is requeued
+
+    SUBJECT = 'Your OTP for Desh Ka Vote'
+
+    _connection = None
+    _connection_used = 0.0
+    _connection_lock = threading.Lock()
+
+    @staticmethod
+    def is_enabled():
+        """Queued delivery is opt-in and requires Redis"""
+        mode = getattr(settings, 'OTP_EMAIL_MODE', 'sync')
+        return mode == 'queued' and get_redis() is not None
+
+    @staticmethod
+    def batch_size():
+        return getattr(settings, 'OTP_EMAIL_BATCH_SIZE', 50)
+
+    @staticmethod
+    def idle_timeout():
+        return getattr(settings, 'OTP_SMTP_IDLE_TIMEOUT', 60)
+
+    @staticmethod
+    def failure_threshold():
+        return getattr(settings, 'OTP_SMTP_FAILURE_THRESHOLD', 5)
+
+    @staticmethod
+    def cooldown():
+        return getattr(settings, 'OTP_SMTP_COOLDOWN', 60)
+
+    @staticmethod
+    def body(otp_code):
+        return (
+            f"Welcome to Desh Ka Vote, your secure platform for participating in elections.\n\n"
+            f"Your One-Time Password (OTP) is: {otp_code}\n\n"
+            f"This OTP is valid for 10 minutes and should be kept confidential. "
+            f"Never share it with anyone — not even your friends or family. "
+            f"It’s the key to accessing your account and casting your vote safely. \n\n"
+            f"Thank you for being a responsible voter and making your voice heard!"
+        )
+
+    @staticmethod
+    def _keystream(nonce, length):
+        return salted_hmac('voting.otp_service.OTPMailer', nonce, algorithm='sha256').digest()[:length]
+
+    @classmethod
+    def seal(cls, otp_code, nonce):
+        code = str(otp_code).encode()
+        return bytes(a ^ b for a, b in zip(code, cls._keystream(nonce, len(code)))).hex()
+
+    @classmethod
+    def unseal(cls, sealed, nonce):
+        code = bytes.fromhex(sealed)
+        return bytes(a ^ b for a, b in zip(code, cls._keystream(nonce, len(code)))).decode()
+
+    @staticmethod
+    def processing_key(claim_id):
+        return redis_key('otp_mail', 'processing', claim_id)
+
+    @classmethod
+    def enqueue(cls, email, mobile, otp_code, schedule=True):
+        """Queue an OTP email; returns False if it has to be sent inline instead"""
+        if not cls.is_enabled():
+            return False
+        nonce = uuid.uuid4().hex
+        try:
+            get_redis().rpush(cls.QUEUE_KEY, json.dumps({
+                'id': nonce,
+                'email': email,
+                'mobile': mobile,
+                'code': cls.seal(otp_code, nonce),
+                'enqueued_at': time.time(),
+            }))
+        except Exception as e:
+            logger.error(f"OTP email queue unavailable, sending inline: {e}")
+            return False
+
+        if schedule:
+            cls.schedule()
+        return True
+
+    @classmethod
+    def schedule(cls, countdown=0):
+        """Start a delivery task unless one is already on its way"""
+        from .tasks import send_otp_emails
+
+        if get_redis().set(cls.SCHEDULED_KEY, 1, nx=True, ex=countdown + 30):
+            send_otp_emails.apply_async(countdown=countdown)
+
+    @classmethod
+    def pending_count(cls):
+        r = get_redis()
+        return r.llen(cls.QUEUE_KEY) if r else 0
+
+    @classmethod
+    def send(cls, messages):
+        """Send through the pooled connection, opening (or reopening) it as needed"""
+        with cls._connection_lock:
+            if cls._connection is not None and time.monotonic() - cls._connection_used > cls.idle_timeout():
+                cls._close()
+            if cls._connection is None:
+                connection = get_connection(fail_silently=False)
+                connection.open()
+                cls._connection = connection
+            try:
+                return cls._connection.send_messages(messages)
+            except Exception:
+                cls._close()
+                raise
+            finally:
+                cls._connection_used = time.monotonic()
+
+    @classmethod
+    def close(cls):
+        with cls._connection_lock:
+            cls._close()
+
+    @classmethod
+    def _close(cls):
+        connection, cls._connection = cls._connection, None
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    @classmethod
+    def drain(cls, batch_size=None):
+        """Deliver one batch of queued emails.
+
+        Returns the number sent, or None if the circuit breaker is open.
+        """
+        r = get_redis()
+        batch_size = batch_size or cls.batch_size()
+
+        # While open, the retry scheduled when the breaker tripped is still pending
+        if r.exists(cls.OPEN_KEY):
+            return None
+        r.delete(cls.SCHEDULED_KEY)
+        cls.requeue_stale(r)
+
+        claim_id, raw_entries = cls.claim(r, batch_size)
+        if not raw_entries:
+            return 0
+
+        entries = [json.loads(raw) for raw in raw_entries]
+        cutoff = time.time() - RedisOTPStore.ttl()
+        live = [entry for entry in entries if entry['enqueued_at'] >= cutoff]
+        if len(live) < len(entries):
+            r.incrby(cls.DROPPED_KEY, len(entries) - len(live))
+            logger.warning(f"Dropped {len(entries) - len(live)} expired OTP emails")
+        if not live:
+            cls.acknowledge(r, claim_id)
+            return 0
+
+        messages = [
+            EmailMessage(
+                cls.SUBJECT, cls.body(cls.unseal(entry['code'], entry['id'])),
+                settings.EMAIL_HOST_USER, [entry['email']]
+            )
+            for entry in live
+        ]
+        try:
+            cls.send(messages)
+        except Exception as e:
+            cls.release(r, claim_id, len(raw_entries))
+            cls._record_failure(r, e, live)
+            return 0
+
+        delivered_at = time.time()
+        delays = [delivered_at - entry['enqueued_at'] for entry in live]
+        pipe = r.pipeline()
+        pipe.delete(cls.processing_key(claim_id))
+        pipe.zrem(cls.CLAIMS_KEY, claim_id)
+        pipe.delete(cls.FAILURES_KEY, cls.TRIPPED_KEY)
+        pipe.incrby(cls.SENT_KEY, len(live))
+        pipe.lpush(cls.DELAYS_KEY, *[f"{delay:.4f}" for delay in delays])
+        pipe.ltrim(cls.DELAYS_KEY, 0, cls.DELAY_SAMPLES - 1)
+        pipe.execute()
+
+        logger.info(f"Sent {len(live)} OTP emails, enqueue-to-delivery max {max(delays):.2f}s")
+        return len(live)
+
+    @classmethod
+    def claim(cls, r, batch_size):
+        """Move up to batch_size entries onto a new processing list; returns (claim id, entries)"""
+        claim_id = uuid.uuid4().hex
+        pipe = r.pipeline()
+        pipe.zadd(cls.CLAIMS_KEY, {claim_id: time.time()})
+        for _ in range(batch_size):
+            pipe.lmove(cls.QUEUE_KEY, cls.processing_key(claim_id), 'LEFT', 'RIGHT')
+        raw_entries = [raw for raw in pipe.execute()[1:] if raw is not None]
+        if not raw_entries:
+            r.zrem(cls.CLAIMS_KEY, claim_id)
+        return claim_id, raw_entries
+
+    @classmethod
+    def acknowledge(cls, r, claim_id):
+        pipe = r.pipeline()
+        pipe.delete(cls.processing_key(claim_id))
+        pipe.zrem(cls.CLAIMS_KEY, claim_id)
+        pipe.execute()
+
+    @classmethod
+    def release(cls, r, claim_id, count):
+        """Put a claimed batch back at the front of the queue, in its original order"""
+        pipe = r.pipeline()
+        for _ in range(count):
+            pipe.lmove(cls.processing_key(claim_id), cls.QUEUE_KEY, 'RIGHT', 'LEFT')
+        pipe.delete(cls.processing_key(claim_id))
+        pipe.zrem(cls.CLAIMS_KEY, claim_id)
+        pipe.execute()
+
+    @classmethod
+    def requeue_stale(cls, r):
+        """Release batches whose worker never acknowledged them (it crashed mid-send)"""
+        for claim_id in r.zrangebyscore(cls.CLAIMS_KEY, 0, time.time() - cls.CLAIM_TIMEOUT):
+            claim_id = claim_id.decode()
+            count = r.llen(cls.processing_key(claim_id))
+            logger.warning(f"Requeueing {count} OTP emails from an unacknowledged batch")
+            cls.release(r, claim_id, count)
+
+    @classmethod
+    def _record_failure(cls, r, error, entries):
+        failures = r.incr(cls.FAILURES_KEY)
+        r.expire(cls.FAILURES_KEY, cls.cooldown() * 10)
+
+        if failures >= cls.failure_threshold() or r.exists(cls.TRIPPED_KEY):
+            logger.error(f"SMTP circuit breaker open for {cls.cooldown()}s after {failures} failed batches: {error}")
+            pipe = r.pipeline()
+            pipe.set(cls.OPEN_KEY, 1, ex=cls.cooldown())
+            pipe.set(cls.TRIPPED_KEY, 1)
+            pipe.delete(cls.FAILURES_KEY)
+            pipe.execute()
+            retry_in = cls.cooldown() + 1
+        else:
+            logger.error(f"Failed to send {len(entries)} OTP emails (attempt {failures}): {error}")
+            retry_in = failures
+
+        if settings.DEBUG:
+            for entry in entries:
+                print(f"\n{'='*50}")
+                print(f"DEVELOPMENT MODE - OTP for {entry['mobile']}: {cls.unseal(entry['code'], entry['id'])}")
+                print(f"{'='*50}\n")
+
+        r.delete(cls.SCHEDULED_KEY)
+        cls.schedule(countdown=retry_in)
+
+    @classmethod
+    def stats(cls):
+        """Delivery counters and enqueue-to-delivery delays (seconds) of the latest messages"""
+        r = get_redis()
+        if r is None:
+            return None
+
+        pipe = r.pipeline()
+        pipe.get(cls.SENT_KEY)
+        pipe.get(cls.DROPPED_KEY)
+        pipe.llen(cls.QUEUE_KEY)
+        pipe.exists(cls.OPEN_KEY)
+        pipe.lrange(cls.DELAYS_KEY, 0, -1)
+        sent, dropped, queued, breaker_open, delays = pipe.execute()
+
+        delays = sorted(float(delay) for delay in delays)
+
+        def percentile(p):
+            return round(delays[min(len(delays) - 1, int(len(delays) * p))], 3) if delays else None
+
+        return {
+            'sent': int(sent or 0),
+            'dropped': int(dropped or 0),
+            'queued': queued,
+            'breaker_open': bool(breaker_open),
+            'delay_p50': percentile(0.5),
+            'delay_p95': percentile(0.95),
+            'delay_max': percentile(1.0),
+        }
+
+
 class OTPService:
-    """Handle OTP generation and verification using email."""
+    """Handle OTP generation and verification using email.
+
+    OTPs live in RedisOTPStore; the OTPVerification table is used when the
+    store is disabled or Redis is unavailable, and otherwise only as an audit
+    trail (OTP_AUDIT_TRAIL, never holding the code).
+    """
+
+    @staticmethod
+    def audit_trail():
+        return getattr(settings, 'OTP_AUDIT_TRAIL', False)
 
     @staticmethod
     def generate_otp():
@@ -27,31 +433,29 @@ class OTPService:
             if not voter or not voter.email:
                 return False, "No email associated with this mobile number.", None
 
-            # Invalidate all previous unverified OTPs for this voter
-            OTPVerification.objects.filter(email=voter.email, verified=False).update(verified=True)
-
             # Generate new OTP
             otp_code = OTPService.generate_otp()
 
-            # Create OTP record
-            OTPVerification.objects.create(
-                email=voter.email,
-                mobile=mobile,
-                otp=otp_code,
-            )
+            if not OTPService._store_in_redis(voter, mobile, otp_code):
+                # Invalidate all previous unverified OTPs for this voter
+                OTPVerification.objects.filter(email=voter.email, verified=False).update(verified=True)
+
+                # Create OTP record
+                OTPVerification.objects.create(
+                    email=voter.email,
+                    mobile=mobile,
+                    otp=otp_code,
+                )
+
+            if OTPMailer.enqueue(voter.email, mobile, otp_code):
+                logger.info(f"OTP email queued for {voter.email}")
+                return True, f"OTP sent successfully to {voter.email}", otp_code
 
             # Try sending email OTP
             try:
                 send_mail(
-                    subject='Your OTP for Desh Ka Vote',
-                    message = (
-                        f"Welcome to Desh Ka Vote, your secure platform for participating in elections.\n\n"
-                        f"Your One-Time Password (OTP) is: {otp_code}\n\n"
-                        f"This OTP is valid for 10 minutes and should be kept confidential. "
-                        f"Never share it with anyone — not even your friends or family. "
-                        f"It’s the key to accessing your account and casting your vote safely. \n\n"
-                        f"Thank you for being a responsible voter and making your voice heard!"
-                    ),
+                    subject=OTPMailer.SUBJECT,
+                    message=OTPMailer.body(otp_code),
                     from_email=settings.EMAIL_HOST_USER,
                     recipient_list=[voter.email],
                     fail_silently=False,
@@ -70,12 +474,58 @@ class OTPService:
             logger.error(f"Error in send_otp service: {e}")
             return False, f"An unexpected error occurred: {str(e)}", None
 
+    @staticmethod
+    def _store_in_redis(voter, mobile, otp_code):
+        """Save the OTP in Redis; returns False if the table has to be used instead"""
+        r = RedisOTPStore.client()
+        if r is None:
+            return False
+        try:
+            RedisOTPStore.save(r, mobile, voter.email, otp_code)
+        except Exception as e:
+            logger.error(f"Redis OTP store unavailable, using the database: {e}")
+            return False
+
+        if OTPService.audit_trail():
+            OTPVerification.objects.filter(mobile=mobile, verified=False).update(verified=True)
+            OTPVerification.objects.create(email=voter.email, mobile=mobile, otp='')
+        return True
+
     @staticmethod
     def verify_otp(mobile, otp_code):
         """
         Verify OTP for voter by mobile/email.
         Returns: (success: bool, message: str)
         """
+        r = RedisOTPStore.client()
+        if r is not None:
+            try:
+                status, remaining = RedisOTPStore.check(r, mobile, otp_code)
+            except Exception as e:
+                logger.error(f"Redis OTP store unavailable, using the database: {e}")
+            else:
+                return OTPService._verify_result(mobile, status, remaining)
+
+        return OTPService._verify_in_database(mobile, otp_code)
+
+    @staticmethod
+    def _verify_result(mobile, status, remaining):
+        if status == RedisOTPStore.MISSING:
+            return False, "No valid OTP found. Please request a new one."
+
+        if OTPService.audit_trail() and (status == RedisOTPStore.VERIFIED or remaining == 0):
+            OTPVerification.objects.filter(mobile=mobile, verified=False).update(
+                verified=True, attempts=RedisOTPStore.max_attempts() - remaining
+            )
+
+        if status == RedisOTPStore.VERIFIED:
+            return True, "OTP verified successfully"
+        if remaining > 0:
+            return False, f"Invalid OTP. You have {remaining} attempt(s) remaining."
+        return False, "Invalid OTP. Maximum attempts reached. Please request a new OTP."
+
+    @staticmethod
+    def _verify_in_database(mobile, otp_code):
         try:
             voter = Voter.objects.filter(mobile=mobile).first()
             if not voter or not voter.email:
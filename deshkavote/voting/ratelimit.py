@@ -0,0 +1,202 @@
+import json
+import logging
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import JsonResponse
+
+from .redis_utils import get_async_redis, get_redis, redis_key
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """Token buckets in Redis for the login, OTP, registration and vote endpoints.
+
+    RATE_LIMITS maps an endpoint to {scope: (burst, refill_per_minute)}:
+
+    - 'ip': one bucket per client address
+    - 'voter': one bucket per voter ID (or mobile number) in the request, or per
+      session cookie on logged-in endpoints - nothing is looked up to find it
+    - 'endpoint': one bucket shared by every client
+
+    All of a request's buckets are checked and debited by one Lua script, so a
+    request costs a single Redis round trip and is rejected (429) before the
+    view runs any query. A request only takes a token when every bucket has
+    one. The script also counts allowed and limited requests per endpoint and
+    scope (see stats()). If Redis is unavailable requests are let through.
+    """
+
+    SCRIPT = """
+    local now = tonumber(ARGV[1])
+    local count = #KEYS - 1
+    local tokens = {}
+    local wait = 0
+    local limited = nil
+
+    for i = 1, count do
+        local burst = tonumber(ARGV[i * 3 - 1])
+        local rate = tonumber(ARGV[i * 3])
+        local bucket = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+        local level = tonumber(bucket[1]) or burst
+        local ts = tonumber(bucket[2]) or now
+        level = math.min(burst, level + math.max(0, now - ts) * rate)
+        tokens[i] = level
+        if level < 1 and (1 - level) / rate > wait then
+            wait = (1 - level) / rate
+            limited = ARGV[i * 3 + 1]
+        end
+    end
+
+    if limited then
+        redis.call('HINCRBY', KEYS[#KEYS], limited, 1)
+        return {0, tostring(wait), limited}
+    end
+
+    for i = 1, count do
+        local burst = tonumber(ARGV[i * 3 - 1])
+        local rate = tonumber(ARGV[i * 3])
+        redis.call('HSET', KEYS[i], 'tokens', tokens[i] - 1, 'ts', now)
+        redis.call('EXPIRE', KEYS[i], math.ceil(burst / rate) + 1)
+    end
+    redis.call('HINCRBY', KEYS[#KEYS], ARGV[#ARGV], 1)
+    return {1, '0', ''}
+    """
+
+    STATS_KEY = redis_key('ratelimit', 'stats')
+    VOTER_FIELDS = ('voterId', 'voter_id', 'username', 'mobile')
+
+    @staticmethod
+    def limits(endpoint):
+        return getattr(settings, 'RATE_LIMITS', {}).get(endpoint, {})
+
+    @staticmethod
+    def bucket_key(endpoint, scope, identity):
+        return redis_key('ratelimit', endpoint, scope, identity)
+
+    @classmethod
+    def voter_identity(cls, request):
+        """Voter ID / mobile from the request body, else the session cookie"""
+        if request.method == 'POST':
+            if request.content_type == 'application/json':
+                try:
+                    data = json.loads(request.body)
+                except ValueError:
+                    data = {}
+                data = data if isinstance(data, dict) else {}
+            else:
+                data = request.POST
+            for field in cls.VOTER_FIELDS:
+                if data.get(field):
+                    return str(data[field])[:64]
+        return request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+
+    @classmethod
+    def identity(cls, request, scope):
+        if scope == 'ip':
+            return request.META.get('REMOTE_ADDR')
+        if scope == 'voter':
+            return cls.voter_identity(request)
+        if scope == 'endpoint':
+            return 'all'
+        raise ValueError(f"Unknown rate limit scope {scope}")
+
+    @classmethod
+    def script_args(cls, endpoint, request):
+        """(keys, args) for the script, or None if no bucket applies"""
+        keys, args = [], [time.time()]
+        for scope, (burst, per_minute) in cls.limits(endpoint).items():
+            identity = cls.identity(request, scope)
+            if identity is None:
+                continue
+            keys.append(cls.bucket_key(endpoint, scope, identity))
+            args += [burst, per_minute / 60, f"{endpoint}:{scope}:limited"]
+        if not keys:
+            return None
+        return keys + [cls.STATS_KEY], args + [f"{endpoint}:allowed"]
+
+    @staticmethod
+    def too_many_requests(retry_after):
+        response = JsonResponse({
+            'success': False,
+            'message': 'Too many requests. Please try again later.',
+            'retry_after': retry_after,
+        }, status=429)
+        response['Retry-After'] = str(retry_after)
+        return response
+
+    @classmethod
+    def result(cls, endpoint, request, reply):
+        """None if the request may proceed, else the 429 response"""
+        allowed, wait, limited = reply
+        if int(allowed):
+            return None
+        limited = limited.decode() if isinstance(limited, bytes) else limited
+        retry_after = max(1, int(float(wait) + 0.999))
+        logger.warning(f"Rate limited {request.META.get('REMOTE_ADDR')} on {limited}")
+        return cls.too_many_requests(retry_after)
+
+    @classmethod
+    def check(cls, endpoint, request):
+        script_args = cls.script_args(endpoint, request)
+        r = get_redis()
+        if script_args is None or r is None:
+            return None
+        try:
+            reply = r.register_script(cls.SCRIPT)(keys=script_args[0], args=script_args[1])
+        except Exception as e:
+            logger.error(f"Rate limiter unavailable: {e}")
+            return None
+        return cls.result(endpoint, request, reply)
+
+    @classmethod
+    async def acheck(cls, endpoint, request):
+        script_args = cls.script_args(endpoint, request)
+        r = get_async_redis()
+        if script_args is None or r is None:
+            return None
+        try:
+            reply = await r.register_script(cls.SCRIPT)(keys=script_args[0], args=script_args[1])
+        except Exception as e:
+            logger.error(f"Rate limiter unavailable: {e}")
+            return None
+        return cls.result(endpoint, request, reply)
+
+    @classmethod
+    def stats(cls):
+        """{'<endpoint>:allowed': n, '<endpoint>:<scope>:limited': n, ...}"""
+        r = get_redis()
+        if r is None:
+            return None
+        try:
+            return {key.decode(): int(value) for key, value in r.hgetall(cls.STATS_KEY).items()}
+        except Exception as e:
+            logger.error(f"Rate limiter stats unavailable: {e}")
+            return None
+
+
+def rate_limited(endpoint):
+    """Apply the RATE_LIMITS buckets of `endpoint` to a (sync or async) view"""
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def wrapper(request, *args, **kwargs):
+                limited = await RateLimiter.acheck(endpoint, request)
+                if limited is not None:
+                    return limited
+                return await view_func(request, *args, **kwargs)
+
+            return markcoroutinefunction(wrapper)
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            limited = RateLimiter.check(endpoint, request)
+            if limited is not None:
+                return limited
+            return view_func(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
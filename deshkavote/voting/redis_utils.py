@@ -0,0 +1,58 @@
+import asyncio
+import logging
+import weakref
+
+from django.conf import settings
+
+# Try to import optional dependencies
+try:
+    from django_redis import get_redis_connection
+except ImportError:
+    get_redis_connection = None
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+
+def get_redis(alias='default'):
+    """Return the raw Redis client behind the cache, or None if the cache is not Redis-backed"""
+    if get_redis_connection is None:
+        return None
+    try:
+        return get_redis_connection(alias)
+    except NotImplementedError:
+        # Cache backend is not django_redis (e.g. locmem in tests)
+        return None
+    except Exception as e:
+        logger.error(f"Redis connection unavailable: {e}")
+        return None
+
+
+# asyncio clients are bound to the event loop they were created on
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_redis(alias='default'):
+    """Return an asyncio Redis client for the running event loop, or None if the cache is not Redis-backed"""
+    cache_settings = settings.CACHES.get(alias, {})
+    if aioredis is None or 'django_redis' not in cache_settings.get('BACKEND', ''):
+        return None
+
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        location = cache_settings['LOCATION']
+        if isinstance(location, (list, tuple)):
+            location = location[0]
+        client = aioredis.from_url(location)
+        _async_clients[loop] = client
+    return client
+
+
+def redis_key(*parts):
+    """Build a namespaced key for data stored directly in Redis (bypassing the cache KEY_PREFIX)"""
+    return ':'.join([getattr(settings, 'REDIS_KEY_PREFIX', 'deshkavote')] + [str(part) for part in parts])
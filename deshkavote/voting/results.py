@@ -0,0 +1,137 @@
+import logging
+
+from django.db import transaction
+from django.db.models import Count
+
+from .models import CandidateResult, ElectionResult, Vote, Voter
+from .tally import TallyStore
+
+logger = logging.getLogger(__name__)
+
+
+class ElectionResultSnapshot:
+    """Materialized results of completed elections.
+
+    Completed elections never change, so counts, percentages, winner, tie and
+    consensus-threshold checks and the eligible-voter count are computed once
+    when the election ends and stored as ElectionResult/CandidateResult rows.
+    Result pages then render straight from the snapshot.
+    """
+
+    @staticmethod
+    def eligible_voter_count(election):
+        """Approved voters in the election's region"""
+        voters = Voter.objects.filter(approval_status='approved')
+        if election.election_type == 'State Assembly':
+            voters = voters.filter(state=election.state)
+        elif election.election_type == 'Municipal':
+            voters = voters.filter(state=election.state, city=election.city)
+        elif election.election_type == 'Panchayat':
+            voters = voters.filter(state=election.state, district=election.district)
+        return voters.count()
+
+    @staticmethod
+    def recount(election):
+        """Rank candidates by counting finalized votes in the Vote table (audit path)"""
+        return list(
+            Vote.objects.filter(election=election, status='finalized').values(
+                'candidate__id', 'candidate__name', 'candidate__party', 'candidate__symbol'
+            ).annotate(vote_count=Count('id')).order_by('-vote_count')
+        )
+
+    @classmethod
+    def compute(cls, election, recount=False):
+        """Compute and store the snapshot for an election.
+
+        Counts come from the tally store, or from the Vote table when recount=True.
+        """
+        vote_counts = cls.recount(election) if recount else TallyStore.results(election.id)
+        total_votes = sum(row['vote_count'] for row in vote_counts)
+
+        candidate_rows = []
+        for rank, row in enumerate(vote_counts, 1):
+            percentage = (row['vote_count'] / total_votes * 100) if total_votes > 0 else 0
+            candidate_rows.append(CandidateResult(
+                candidate_id=row['candidate__id'],
+                name=row['candidate__name'],
+                party=row['candidate__party'],
+                symbol=row['candidate__symbol'],
+                rank=rank,
+                votes=row['vote_count'],
+                percentage=round(percentage, 2)
+            ))
+
+        # Determine winner (candidate with most votes); a tie for first place has none
+        is_tie = len(candidate_rows) > 1 and candidate_rows[0].votes == candidate_rows[1].votes
+        winner = candidate_rows[0] if candidate_rows and not is_tie else None
+        consensus_achieved = bool(winner) and total_votes > 0 and winner.percentage >= election.consensus_threshold
+
+        eligible_voters = cls.eligible_voter_count(election)
+        voter_turnout = (total_votes / eligible_voters * 100) if eligible_voters > 0 else 0
+
+        with transaction.atomic():
+            result, _ = ElectionResult.objects.update_or_create(
+                election=election,
+                defaults={
+                    'total_votes': total_votes,
+                    'eligible_voters': eligible_voters,
+                    'voter_turnout': round(voter_turnout, 2),
+                    'winner_id': winner.candidate_id if winner else None,
+                    'is_tie': is_tie,
+                    'consensus_threshold': election.consensus_threshold,
+                    'consensus_achieved': consensus_achieved,
+                }
+            )
+            result.candidate_results.all().delete()
+            for row in candidate_rows:
+                row.election_result = result
+            CandidateResult.objects.bulk_create(candidate_rows)
+
+        logger.info(f"Stored results for election {election.id}: {total_votes} votes")
+        return result
+
+    @classmethod
+    def get(cls, election):
+        """Stored snapshot, computed on first access for elections that ended before snapshots existed.
+
+        Such elections may have no tally rows either, so the snapshot is
+        counted from the Vote table.
+        """
+        try:
+            return election.result
+        except ElectionResult.DoesNotExist:
+            return cls.compute(election, recount=True)
+
+    @staticmethod
+    def candidate_rows(result):
+        return [
+            {
+                'id': row.candidate_id,
+                'name': row.name,
+                'party': row.party,
+                'symbol': row.symbol,
+                'votes': row.votes,
+                'percentage': row.percentage
+            }
+            for row in result.candidate_results.all()
+        ]
+
+    @classmethod
+    def as_context(cls, election):
+        """Template context entry used by results_page and voter_results"""
+        result = cls.get(election)
+        candidates_results = cls.candidate_rows(result)
+        winner = None
+        if result.winner_id:
+            winner = next((row for row in candidates_results if row['id'] == result.winner_id), None)
+
+        return {
+            'election': election,
+            'candidates_results': candidates_results,
+            'total_votes': result.total_votes,
+            'eligible_voters': result.eligible_voters,
+            'voter_turnout': result.voter_turnout,
+            'winner': winner,
+            'consensus_achieved': result.consensus_achieved,
+            'consensus_threshold': result.consensus_threshold
+        }
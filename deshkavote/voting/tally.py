@@ -0,0 +1,241 @@
+import logging
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Candidate, CandidateTally, Vote
+from .redis_utils import get_redis, redis_key
+
+logger = logging.getLogger(__name__)
+
+
+class TallyStore:
+    """Per-candidate counts of finalized votes, maintained as votes finalize.
+
+    Every finalization bumps a CandidateTally row in the same transaction as the
+    status change, so the table is an exact running count. After commit the same
+    increment is applied to a Redis hash per election, which is what the result
+    views read. If Redis is unavailable, or the hash has not been warmed yet,
+    reads fall back to the counter table. Either way a read costs O(candidates),
+    independent of how many votes have been cast.
+
+    A cold hash is filled from the table by the next read. Increments that find
+    the hash cold bump a generation counter instead, and the fill only lands if
+    the generation is unchanged since the read began; otherwise a vote may have
+    committed after the table was read, and the hash stays cold until a later
+    read fills it.
+    """
+
+    CHANGE_GRACE = timedelta(seconds=5)
+
+    INCREMENT_SCRIPT = """
+    if redis.call('EXISTS', KEYS[2]) == 1 then
+        redis.call('HINCRBY', KEYS[1], ARGV[1], ARGV[2])
+        return 1
+    end
+    redis.call('INCR', KEYS[3])
+    return 0
+    """
+
+    STORE_SCRIPT = """
+    redis.call('DEL', KEYS[1], KEYS[2])
+    if (redis.call('GET', KEYS[3]) or '') ~= ARGV[1] then
+        return 0
+    end
+    for i = 2, #ARGV, 2 do
+        redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+    end
+    redis.call('SET', KEYS[2], 1)
+    return 1
+    """
+
+    @staticmethod
+    def hash_key(election_id):
+        return redis_key('tally', election_id)
+
+    @staticmethod
+    def ready_key(election_id):
+        return redis_key('tally', election_id, 'ready')
+
+    @staticmethod
+    def generation_key(election_id):
+        return redis_key('tally', election_id, 'generation')
+
+    @classmethod
+    def keys(cls, election_id):
+        return [cls.hash_key(election_id), cls.ready_key(election_id), cls.generation_key(election_id)]
+
+    @classmethod
+    def increment(cls, election_id, candidate_id, by=1):
+        """Count a newly finalized vote. Call inside the finalizing transaction."""
+        updated = CandidateTally.objects.filter(candidate_id=candidate_id).update(
+            vote_count=F('vote_count') + by,
+            updated_at=timezone.now()
+        )
+        if not updated:
+            try:
+                with transaction.atomic():
+                    CandidateTally.objects.create(election_id=election_id, candidate_id=candidate_id, vote_count=by)
+            except IntegrityError:
+                # Another worker created the row first
+                CandidateTally.objects.filter(candidate_id=candidate_id).update(
+                    vote_count=F('vote_count') + by,
+                    updated_at=timezone.now()
+                )
+
+        transaction.on_commit(lambda: cls._increment_cached(election_id, candidate_id, by))
+
+    @classmethod
+    def _increment_cached(cls, election_id, candidate_id, by):
+        r = get_redis()
+        if r is None:
+            return
+        try:
+            r.register_script(cls.INCREMENT_SCRIPT)(keys=cls.keys(election_id), args=[str(candidate_id), by])
+        except Exception as e:
+            logger.error(f"Failed to update cached tally for election {election_id}: {e}")
+
+    @classmethod
+    def counts_many(cls, election_ids):
+        """{election_id: {candidate_id: votes}} for several elections"""
+        election_ids = [str(election_id) for election_id in election_ids]
+        counts = {}
+        cold = list(election_ids)
+
+        r = get_redis()
+        if r is not None and election_ids:
+            try:
+                pipe = r.pipeline()
+                for election_id in election_ids:
+                    pipe.exists(cls.ready_key(election_id))
+                    pipe.hgetall(cls.hash_key(election_id))
+                    pipe.get(cls.generation_key(election_id))
+                replies = pipe.execute()
+                cold, generations = [], {}
+                for election_id, ready, cached, generation in zip(election_ids, *[replies[i::3] for i in range(3)]):
+                    if ready:
+                        counts[election_id] = {key.decode(): int(value) for key, value in cached.items()}
+                    else:
+                        cold.append(election_id)
+                        generations[election_id] = generation
+            except Exception as e:
+                logger.error(f"Cached tally unavailable, reading counter table: {e}")
+                r, cold = None, list(election_ids)
+
+        if cold:
+            for election_id in cold:
+                counts[election_id] = {}
+            rows = CandidateTally.objects.filter(election_id__in=cold).values_list('election_id', 'candidate_id', 'vote_count')
+            for election_id, candidate_id, vote_count in rows:
+                counts[str(election_id)][str(candidate_id)] = vote_count
+            if r is not None:
+                for election_id in cold:
+                    cls._store_cached(r, election_id, counts[election_id], generations[election_id])
+
+        return counts
+
+    @classmethod
+    def counts(cls, election_id):
+        return cls.counts_many([election_id])[str(election_id)]
+
+    @classmethod
+    def changed_since(cls, election_ids, since):
+        """Ids of the given elections whose counts changed after `since`.
+
+        updated_at is stamped before the finalizing transaction commits, so the
+        window is widened by CHANGE_GRACE to catch rows committed just after a
+        reader's previous cutoff. Callers may see an unchanged election twice.
+        """
+        return {
+            str(election_id)
+            for election_id in CandidateTally.objects.filter(
+                election_id__in=list(election_ids), updated_at__gt=since - cls.CHANGE_GRACE
+            ).values_list('election_id', flat=True).distinct()
+        }
+
+    @classmethod
+    def results_many(cls, election_ids, include_empty=False):
+        """Ranked results per election, shaped like the old values().annotate() rows.
+
+        Returns {election_id: [{'candidate__id', 'candidate__name', 'candidate__party',
+        'candidate__symbol', 'vote_count'}, ...]} ordered by vote_count descending.
+        Candidates without finalized votes are left out unless include_empty is set.
+        """
+        counts = cls.counts_many(election_ids)
+        results = {election_id: [] for election_id in counts}
+
+        candidates = Candidate.objects.filter(election_id__in=list(counts)).values(
+            'id', 'name', 'party', 'symbol', 'election_id'
+        )
+        for candidate in candidates:
+            election_id = str(candidate['election_id'])
+            vote_count = counts[election_id].get(str(candidate['id']), 0)
+            if vote_count or include_empty:
+                results[election_id].append({
+                    'candidate__id': candidate['id'],
+                    'candidate__name': candidate['name'],
+                    'candidate__party': candidate['party'],
+                    'candidate__symbol': candidate['symbol'],
+                    'vote_count': vote_count
+                })
+
+        for rows in results.values():
+            rows.sort(key=lambda row: row['vote_count'], reverse=True)
+        return results
+
+    @classmethod
+    def results(cls, election_id):
+        return cls.results_many([election_id])[str(election_id)]
+
+    @classmethod
+    def rebuild(cls, election_id):
+        """Recount an election from the Vote table and overwrite both stores"""
+        r = get_redis()
+        generation = cls._cool(r, election_id)
+        recount = dict(
+            Vote.objects.filter(election_id=election_id, status='finalized')
+            .values('candidate_id').annotate(vote_count=Count('id'))
+            .values_list('candidate_id', 'vote_count')
+        )
+        candidate_ids = Candidate.objects.filter(election_id=election_id).values_list('id', flat=True)
+
+        with transaction.atomic():
+            CandidateTally.objects.filter(election_id=election_id).delete()
+            CandidateTally.objects.bulk_create([
+                CandidateTally(election_id=election_id, candidate_id=candidate_id, vote_count=recount.get(candidate_id, 0))
+                for candidate_id in candidate_ids
+            ])
+
+        counts = {str(candidate_id): vote_count for candidate_id, vote_count in recount.items()}
+        if r is not None:
+            cls._store_cached(r, election_id, counts, generation)
+
+        logger.info(f"Rebuilt tally for election {election_id}: {sum(counts.values())} votes")
+        return counts
+
+    @classmethod
+    def _cool(cls, r, election_id):
+        """Mark the hash cold (so increments bump the generation) and return the generation"""
+        if r is None:
+            return None
+        try:
+            pipe = r.pipeline()
+            pipe.delete(cls.ready_key(election_id))
+            pipe.get(cls.generation_key(election_id))
+            return pipe.execute()[1]
+        except Exception as e:
+            logger.error(f"Cached tally unavailable: {e}")
+            return None
+
+    @classmethod
+    def _store_cached(cls, r, election_id, counts, generation):
+        """Fill the hash and mark it ready in one step, unless an increment arrived since `generation` was read"""
+        args = [generation.decode() if generation else '']
+        for candidate_id, vote_count in counts.items():
+            args += [candidate_id, vote_count]
+        try:
+            r.register_script(cls.STORE_SCRIPT)(keys=cls.keys(election_id), args=args)
+        except Exception as e:
+            logger.error(f"Failed to store cached tally for election {election_id}: {e}")
@@ -4,58 +4,18 @@ from django.core.cache import cache
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 import logging
-import time
 
 logger = logging.getLogger(__name__)
 
 @shared_task
-def process_vote_consensus(vote_id):
+def process_vote_consensus(vote_id, attempt=0):
     """Background task to process vote consensus"""
     try:
-        from .models import Vote, VoteConsensusLog, ElectionNode
-        
-        vote = Vote.objects.get(id=vote_id)
-        time.sleep(2)  # Simulate processing time
-
-        # Get active nodes for this election
-        nodes = ElectionNode.objects.filter(
-            election=vote.election,
-            status='active'
-        )[:vote.required_confirmations]
-
-        # Create consensus logs
-        for node in nodes:
-            VoteConsensusLog.objects.create(
-                vote=vote,
-                node_id=node.node_id,
-                consensus_round=1,
-                status='pending',
-                signature=f"sig_{vote.vote_hash}_{node.node_id}"
-            )
-
-        node_count = nodes.count()
-
-        # Simulate consensus achievement
-        if node_count >= vote.required_confirmations:
-            # Update consensus logs to confirmed
-            VoteConsensusLog.objects.filter(vote=vote).update(status='confirmed')
-            
-            # Update vote status
-            vote.status = 'finalized'
-            vote.confirmation_count = node_count
-            vote.save()
-            
-            cache.delete(f"vote_status_{vote_id}")
-            
-            # Notify via WebSocket
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
-                f"vote_{vote_id}",
-                {
-                    "type": "send_vote_update",
-                    "data": {"status": "finalized", "message": "Your vote has been verified."}
-                }
-            )
+        from .consensus import ConsensusBatcher
+
+        claimed, finalized = ConsensusBatcher.process(batch_size=1, vote_ids=[vote_id], attempt=attempt)
+        if not finalized:
+            return f"Consensus pending for vote {vote_id}"
 
         return f"Consensus achieved for vote {vote_id}"
 
@@ -64,6 +24,25 @@ def process_vote_consensus(vote_id):
         return f"Error processing vote consensus: {e}"
 
 
+@shared_task
+def process_consensus_batch(attempt=0):
+    """Background task to claim and finalize a batch of pending votes"""
+    try:
+        from .consensus import ConsensusBatcher
+
+        claimed, finalized = ConsensusBatcher.process(attempt=attempt)
+
+        # Keep going while full batches are waiting
+        if claimed >= ConsensusBatcher.batch_size():
+            process_consensus_batch.delay()
+
+        return f"Consensus batch: {claimed} claimed, {finalized} finalized"
+
+    except Exception as e:
+        logger.error(f"Error in batch consensus processing: {e}")
+        return f"Error processing consensus batch: {e}"
+
+
 @shared_task
 def sync_election_across_nodes(election_id):
     """Background task to synchronize election across distributed nodes"""
@@ -108,4 +87,86 @@ def sync_election_across_nodes(election_id):
 
     except Exception as e:
         logger.error(f"Error synchronizing election: {e}")
-        return f"Error: {e}"
\ No newline at end of file
+        return f"Error: {e}"
+
+@shared_task
+def flush_vote_buffer():
+    """Background task to drain buffered ballots into the Vote table"""
+    try:
+        from .vote_buffer import VoteIngestionBuffer
+
+        inserted = VoteIngestionBuffer.flush()
+
+        if inserted is None:
+            return "Another flush is in progress"
+
+        # Keep draining while full batches are waiting
+        if VoteIngestionBuffer.pending_count() >= VoteIngestionBuffer.batch_size():
+            flush_vote_buffer.delay()
+
+        return f"Flushed {inserted} buffered votes"
+
+    except Exception as e:
+        logger.error(f"Error flushing vote buffer: {e}")
+        return f"Error: {e}"
+
+
+@shared_task
+def flush_audit_buffer():
+    """Background task to chain queued audit events into the AuditLog table"""
+    try:
+        from .audit import AuditWriter
+
+        written = AuditWriter.flush()
+
+        if written is None:
+            return "Another flush is in progress"
+
+        # Keep draining while full batches are waiting
+        if AuditWriter.pending_count() >= AuditWriter.batch_size():
+            flush_audit_buffer.delay()
+
+        return f"Flushed {written} audit events"
+
+    except Exception as e:
+        logger.error(f"Error flushing audit buffer: {e}")
+        return f"Error: {e}"
+
+
+@shared_task
+def run_export_job(job_id):
+    """Background task to generate an export file"""
+    try:
+        from .exports import BackgroundExport
+
+        job = BackgroundExport.run(job_id)
+        if job is None:
+            return f"Export {job_id} was already started"
+
+        return f"Export {job_id} {job.status}: {job.rows_written} rows"
+
+    except Exception as e:
+        logger.error(f"Error running export job {job_id}: {e}")
+        return f"Error: {e}"
+
+
+@shared_task
+def send_otp_emails():
+    """Background task to deliver queued OTP emails over the pooled SMTP connection"""
+    try:
+        from .otp_service import OTPMailer
+
+        sent = OTPMailer.drain()
+
+        if sent is None:
+            return "SMTP circuit breaker is open"
+
+        # Keep going while emails are waiting
+        if OTPMailer.pending_count():
+            OTPMailer.schedule()
+
+        return f"Sent {sent} OTP emails"
+
+    except Exception as e:
+        logger.error(f"Error sending OTP emails: {e}")
+        return f"Error: {e}"
@@ -1,3 +1,1567 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import socketserver
+import tempfile
+import threading
+import time
+import uuid
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .models import (
+    CustomUser, Voter, Election, Candidate, Vote, AuditLog, VoteConsensusLog, ElectionResult, CandidateTally,
+    ElectionNode, AuditChainHead, AuditCheckpoint, ExportJob, OTPVerification
+)
+from .analytics import ColumnarExport
+from .audit import AuditChain, AuditWriter
+from .consensus import ConsensusBatcher, SimulatedNodeClient
+from .eligibility import EligibilityIndex
+from .exports import BackgroundExport, ExcelExport
+from .otp_service import OTPMailer, OTPService, RedisOTPStore
+from .hashing import PasswordVerifier
+from .lockout import LoginLockout
+from .ratelimit import RateLimiter
+from .redis_utils import get_redis, redis_key
+from .results import ElectionResultSnapshot
+from .tally import TallyStore
+from .vote_buffer import VoteIngestionBuffer
+from .vote_guard import HasVotedGuard
+from .waiting_room import WaitingRoom
+from .views import DistributedElectionManager, create_audit_log, create_audit_logs_bulk, record_vote
+
+
+def clear_redis_keys():
+    """Drop the keys of this test run (its own prefix and database, see settings), nothing else"""
+    r = get_redis()
+    if r is None:
+        cache.clear()  # locmem: private to this process
+        return
+    keys = list(r.scan_iter(match=redis_key('*'), count=1000))
+    if keys:
+        r.delete(*keys)
+
+
+def make_voter(voter_id, state='Test State', city='Test City', district=''):
+    user = CustomUser.objects.create_user(
+        username=voter_id,
+        password='voter123',
+        role='voter',
+        mobile='9876543210',
+        is_active=True
+    )
+    return Voter.objects.create(
+        user=user,
+        first_name='Test',
+        last_name=voter_id,
+        email=f'{voter_id.lower()}@voter.com',
+        mobile='9876543210',
+        date_of_birth='2000-01-01',
+        gender='Male',
+        parent_spouse_name='Test Parent',
+        street_address='Test Street',
+        city=city,
+        state=state,
+        district=district,
+        pincode='123456',
+        place_of_birth='Test Place',
+        voter_id=voter_id,
+        aadhar_number='123456789012',
+        pan_number='ABCDE1234X',
+        approval_status='approved'
+    )
+
+
+def make_election(name='Test Election', election_type='General Election', state='Test State',
+                  city='', district='', status='active'):
+    now = timezone.now()
+    return Election.objects.create(
+        name=name,
+        state=state,
+        city=city,
+        district=district,
+        election_type=election_type,
+        year=now.year,
+        start_date=now,
+        end_date=now + timedelta(days=1),
+        status=status
+    )
+
+
+def make_candidate(election, name='Test Candidate'):
+    return Candidate.objects.create(
+        name=name,
+        party='Independent',
+        constituency='Test Constituency',
+        symbol='Lamp',
+        election=election,
+        is_verified=True
+    )
+
+
+@skipUnless(get_redis(), 'Vote buffer requires Redis as the cache backend')
+class VoteIngestionBufferTests(TestCase):
+    def setUp(self):
+        clear_redis_keys()
+        self.addCleanup(clear_redis_keys)
+        self.election = make_election()
+        self.candidate = make_candidate(self.election)
+        self.voters = [make_voter(f'BUF{i}') for i in range(3)]
+
+    def test_flush_bulk_inserts_acknowledged_ballots(self):
+        tokens = [
+            VoteIngestionBuffer.submit(voter, self.candidate, self.election, schedule_flush=False)
+            for voter in self.voters
+        ]
+
+        self.assertEqual(VoteIngestionBuffer.flush(notify=False), 3)
+        self.assertEqual(VoteIngestionBuffer.pending_count(), 0)
+        self.assertEqual(
+            sorted(str(vote_id) for vote_id in Vote.objects.values_list('id', flat=True)),
+            sorted(tokens)
+        )
+        self.assertEqual(AuditLog.objects.filter(log_type='vote_cast').count(), 3)
+
+    def test_second_ballot_for_same_election_is_rejected(self):
+        voter = self.voters[0]
+        self.assertIsNotNone(VoteIngestionBuffer.submit(voter, self.candidate, self.election, schedule_flush=False))
+        self.assertIsNone(VoteIngestionBuffer.submit(voter, self.candidate, self.election, schedule_flush=False))
+
+        VoteIngestionBuffer.flush(notify=False)
+        self.assertEqual(Vote.objects.filter(voter=voter, election=self.election).count(), 1)
+
+    def test_stored_timestamp_reproduces_vote_hash(self):
+        voter = self.voters[0]
+        VoteIngestionBuffer.submit(voter, self.candidate, self.election, schedule_flush=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            VoteIngestionBuffer.flush(notify=False)
+
+        vote = Vote.objects.get(voter=voter, election=self.election)
+        self.assertEqual(
+            vote.vote_hash,
+            Vote.compute_vote_hash(voter.voter_id, self.candidate.id, self.election.id, vote.timestamp, vote.nonce)
+        )
+
+    @override_settings(VOTE_BUFFER_MAX_ATTEMPTS=2)
+    def test_unwritable_entry_is_dead_lettered(self):
+        r = get_redis()
+        r.rpush(VoteIngestionBuffer.QUEUE_KEY, json.dumps({'token': 'poison', 'voter_pk': self.voters[0].id}))
+        VoteIngestionBuffer.submit(self.voters[1], self.candidate, self.election, schedule_flush=False)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(VoteIngestionBuffer.flush(notify=False), 1)
+        self.assertEqual(VoteIngestionBuffer.pending_count(), 1)
+
+        self.assertEqual(VoteIngestionBuffer.flush(notify=False), 0)
+        self.assertEqual(VoteIngestionBuffer.pending_count(), 0)
+        self.assertEqual(VoteIngestionBuffer.dead_letter_count(), 1)
+        self.assertEqual(json.loads(r.lindex(VoteIngestionBuffer.DEAD_LETTER_KEY, 0))['attempts'], 2)
+
+    def test_flush_lock_of_another_flusher_is_kept(self):
+        r = get_redis()
+        r.set(VoteIngestionBuffer.FLUSH_LOCK_KEY, 'other', ex=60)
+        self.assertIsNone(VoteIngestionBuffer.flush(notify=False))
+        self.assertEqual(r.get(VoteIngestionBuffer.FLUSH_LOCK_KEY), b'other')
+
+        r.delete(VoteIngestionBuffer.FLUSH_LOCK_KEY)
+        VoteIngestionBuffer.flush(notify=False)
+        self.assertIsNone(r.get(VoteIngestionBuffer.FLUSH_LOCK_KEY))
+
+
+class EligibilityIndexTests(TestCase):
+    def setUp(self):
+        self.general = make_election('General', 'General Election')
+        self.state = make_election('Assembly', 'State Assembly', state='Kerala')
+        self.municipal = make_election('Municipal', 'Municipal', state='Kerala', city='Kochi')
+        self.panchayat = make_election('Panchayat', 'Panchayat', state='Kerala', district='Idukki')
+        self.other_state = make_election('Other Assembly', 'State Assembly', state='Goa')
+        make_election('Upcoming', 'General Election', status='upcoming')
+        EligibilityIndex.rebuild()
+
+    def test_region_lookup_matches_location_rules(self):
+        voter = make_voter('ELG1', state='Kerala', city='Kochi', district='Idukki')
+        expected = {str(e.id) for e in (self.general, self.state, self.municipal, self.panchayat)}
+
+        with self.assertNumQueries(0):
+            self.assertEqual(voter.get_eligible_election_ids(), expected)
+            self.assertTrue(voter.is_eligible_for(self.municipal))
+            self.assertFalse(voter.is_eligible_for(self.other_state))
+
+    def test_index_is_rebuilt_when_election_ends(self):
+        admin = CustomUser.objects.create_user(
+            username='admin', password='admin123', role='admin', is_staff=True, is_active=True
+        )
+        self.client.force_login(admin)
+
+        response = self.client.post('/api/end-election/', {'election_id': str(self.general.id)}, content_type='application/json')
+        self.assertTrue(response.json()['success'])
+
+        voter = make_voter('ELG2', state='Goa')
+        self.assertEqual(voter.get_eligible_election_ids(), {str(self.other_state.id)})
+
+    def test_index_is_dropped_when_an_election_changes_elsewhere(self):
+        voter = make_voter('ELG3', state='Goa')
+        self.assertTrue(voter.is_eligible_for(self.other_state))
+
+        # As from the Django admin or a shell, not through the start/end views
+        self.other_state.status = 'completed'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other_state.save()
+        self.assertFalse(voter.is_eligible_for(self.other_state))
+
+
+@skipUnless(get_redis(), 'Has-voted guard requires Redis as the cache backend')
+class HasVotedGuardTests(TestCase):
+    def setUp(self):
+        clear_redis_keys()
+        self.addCleanup(clear_redis_keys)
+        self.election = make_election()
+        self.candidate = make_candidate(self.election)
+        self.voter = make_voter('GRD1')
+        EligibilityIndex.rebuild()
+
+    def cast(self):
+        return self.client.post(
+            '/api/cast-vote/', {'candidate_id': str(self.candidate.id)}, content_type='application/json'
+        ).json()
+
+    def test_duplicate_ballot_rejected_by_bitmap(self):
+        HasVotedGuard.rebuild(self.election.id)
+        self.client.force_login(self.voter.user)
+
+        self.assertTrue(self.cast()['success'])
+        self.assertEqual(HasVotedGuard.turnout(self.election.id), 1)
+
+        response = self.cast()
+        self.assertFalse(response['success'])
+        self.assertEqual(response['message'], 'You have already voted in this election')
+        self.assertEqual(Vote.objects.filter(election=self.election).count(), 1)
+
+    def test_notification_failure_keeps_the_recorded_vote(self):
+        HasVotedGuard.rebuild(self.election.id)
+        self.client.force_login(self.voter.user)
+
+        with mock.patch('voting.views.get_channel_layer', side_effect=RuntimeError('channel layer down')):
+            response = self.cast()
+        self.assertTrue(response['success'])
+        self.assertTrue(Vote.objects.filter(id=response['vote_id']).exists())
+        self.assertTrue(HasVotedGuard.has_voted(self.election.id, self.voter.id))
+
+    def test_rebuild_marks_existing_votes(self):
+        Vote.objects.create(voter=self.voter, candidate=self.candidate, election=self.election)
+
+        self.assertIsNone(HasVotedGuard.has_voted(self.election.id, self.voter.id))
+        self.assertEqual(HasVotedGuard.rebuild(self.election.id), 1)
+        self.assertTrue(HasVotedGuard.has_voted(self.election.id, self.voter.id))
+
+    def test_rebuild_clears_bits_without_a_vote(self):
+        buffered = make_voter('GRD2')
+        r = get_redis()
+        r.setbit(HasVotedGuard.bitmap_key(self.election.id), self.voter.id, 1)  # Left set by a lost write
+        r.set(VoteIngestionBuffer.claim_key(self.election.id, buffered.id), 'token', ex=60)
+
+        self.assertEqual(HasVotedGuard.rebuild(self.election.id), 1)
+        self.assertFalse(HasVotedGuard.has_voted(self.election.id, self.voter.id))
+        self.assertTrue(HasVotedGuard.has_voted(self.election.id, buffered.id))
+
+
+class CastVoteAsyncTests(TestCase):
+    def setUp(self):
+        self.election = make_election()
+        self.candidate = make_candidate(self.election)
+        self.voter = make_voter('ASY1')
+        EligibilityIndex.rebuild()
+
+    async def cast(self):
+        response = await self.async_client.post(
+            '/api/cast-vote-async/', {'candidate_id': str(self.candidate.id)}, content_type='application/json'
+        )
+        return response.json()
+
+    async def test_async_endpoint_records_one_ballot(self):
+        await self.async_client.aforce_login(self.voter.user)
+
+        first = await self.cast()
+        self.assertTrue(first['success'])
+        vote = await Vote.objects.aget(id=first['vote_id'])
+        self.assertEqual(vote.candidate_id, self.candidate.id)
+        self.assertTrue(await AuditLog.objects.filter(log_type='vote_cast', election=self.election).aexists())
+
+        second = await self.cast()
+        self.assertFalse(second['success'])
+        self.assertEqual(second['message'], 'You have already voted in this election')
+        self.assertEqual(await Vote.objects.filter(election=self.election).acount(), 1)
+
+    async def test_notification_failure_keeps_the_recorded_vote(self):
+        await self.async_client.aforce_login(self.voter.user)
+
+        with mock.patch('voting.views.get_channel_layer', side_effect=RuntimeError('channel layer down')):
+            response = await self.cast()
+        self.assertTrue(response['success'])
+        self.assertTrue(await Vote.objects.filter(id=response['vote_id']).aexists())
+
+
+class IdempotencyKeyTests(TestCase):
+    def setUp(self):
+        self.election = make_election()
+        self.candidate = make_candidate(self.election)
+        self.voter = make_voter('IDM1')
+        EligibilityIndex.rebuild()
+        self.client.force_login(self.voter.user)
+
+    def cast(self, key, candidate_id=None):
+        return self.client.post(
+            '/api/cast-vote/', {'candidate_id': str(candidate_id or self.candidate.id)},
+            content_type='application/json', headers={'Idempotency-Key': key}
+        )
+
+    def test_retry_replays_stored_response_without_queries(self):
+        first = self.cast('retry-1')
+        self.assertTrue(first.json()['success'])
+
+        with self.assertNumQueries(0):
+            retry = self.cast('retry-1')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Vote.objects.filter(voter=self.voter).count(), 1)
+
+    def test_key_reused_with_different_body_is_rejected(self):
+        self.cast('retry-2')
+        other = make_candidate(self.election, 'Other Candidate')
+
+        response = self.cast('retry-2', other.id)
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(response.json()['success'])
+
+
+class TallyStoreTests(TestCase):
+    def setUp(self):
+        self.election = make_election()
+        self.leader = make_candidate(self.election, 'Leader')
+        self.runner_up = make_candidate(self.election, 'Runner Up')
+        TallyStore.rebuild(self.election.id)
+
+    def finalize(self, voter_id, candidate):
+        vote = Vote.objects.create(
+            voter=make_voter(voter_id), candidate=candidate, election=self.election, required_confirmations=1
+        )
+        VoteConsensusLog.objects.create(vote=vote, node_id='node-1', consensus_round=1, status='confirmed', signature='sig')
+        with self.captureOnCommitCallbacks(execute=True):
+            DistributedElectionManager.achieve_consensus(vote.id)
+        return vote
+
+    def test_finalization_increments_once(self):
+        vote = self.finalize('TAL1', self.leader)
+        self.finalize('TAL2', self.leader)
+        self.finalize('TAL3', self.runner_up)
+
+        # A retried consensus task must not count the same vote again
+        with self.captureOnCommitCallbacks(execute=True):
+            DistributedElectionManager.achieve_consensus(vote.id)
+
+        self.assertEqual(
+            [(row['candidate__name'], row['vote_count']) for row in TallyStore.results(self.election.id)],
+            [('Leader', 2), ('Runner Up', 1)]
+        )
+        self.assertEqual(TallyStore.rebuild(self.election.id), TallyStore.counts(self.election.id))
+
+    @skipUnless(get_redis(), 'Cached tallies require Redis as the cache backend')
+    def test_vote_finalized_during_a_cold_read_is_not_lost(self):
+        get_redis().delete(*TallyStore.keys(self.election.id))
+        store = TallyStore._store_cached
+
+        def vote_lands_before_the_fill(r, election_id, counts, generation):
+            with self.captureOnCommitCallbacks(execute=True):
+                TallyStore.increment(self.election.id, self.leader.id)
+            store(r, election_id, counts, generation)
+
+        with mock.patch.object(TallyStore, '_store_cached', vote_lands_before_the_fill):
+            self.assertEqual(TallyStore.counts(self.election.id)[str(self.leader.id)], 0)
+        self.assertEqual(TallyStore.counts(self.election.id)[str(self.leader.id)], 1)
+        self.assertEqual(TallyStore.counts(self.election.id)[str(self.leader.id)], 1)
+
+    def test_migration_backfills_votes_cast_before_tallies(self):
+        from importlib import import_module
+        from django.apps import apps
+
+        Vote.objects.create(voter=make_voter('TAL5'), candidate=self.leader, election=self.election, status='finalized')
+        CandidateTally.objects.all().delete()
+        import_module('voting.migrations.0021_backfill_candidate_tallies').backfill_tallies(apps, None)
+
+        self.assertEqual(
+            dict(CandidateTally.objects.values_list('candidate__name', 'vote_count')),
+            {'Leader': 1, 'Runner Up': 0}
+        )
+
+    def test_results_api_does_not_scan_votes(self):
+        self.finalize('TAL4', self.runner_up)
+        admin = CustomUser.objects.create_user(username='admin', password='admin123', role='admin', is_active=True)
+        self.client.force_login(admin)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/election-results/{self.election.id}/')
+        self.assertEqual(response.json()['results'][0]['vote_count'], 1)
+        self.assertFalse(any('voting_vote' in query['sql'] for query in queries))
+
+
+class ElectionResultSnapshotTests(TestCase):
+    def setUp(self):
+        self.election = make_election()
+        self.leader = make_candidate(self.election, 'Leader')
+        self.runner_up = make_candidate(self.election, 'Runner Up')
+        for i, candidate in enumerate([self.leader, self.leader, self.runner_up]):
+            Vote.objects.create(voter=make_voter(f'RES{i}'), candidate=candidate, election=self.election, status='finalized')
+        TallyStore.rebuild(self.election.id)
+        EligibilityIndex.rebuild()
+
+        self.admin = CustomUser.objects.create_user(
+            username='admin', password='admin123', role='admin', is_staff=True, is_active=True
+        )
+        self.client.force_login(self.admin)
+
+    def test_snapshot_stored_when_election_ends(self):
+        response = self.client.post('/api/end-election/', {'election_id': str(self.election.id)}, content_type='application/json')
+        self.assertTrue(response.json()['success'])
+
+        result = ElectionResult.objects.get(election=self.election)
+        self.assertEqual(result.total_votes, 3)
+        self.assertEqual(result.eligible_voters, 3)
+        self.assertEqual(result.winner_id, self.leader.id)
+        self.assertTrue(result.consensus_achieved)
+        self.assertEqual(
+            [(row.name, row.votes, row.percentage) for row in result.candidate_results.all()],
+            [('Leader', 2, 66.67), ('Runner Up', 1, 33.33)]
+        )
+
+        # Later result reads come from the snapshot, not the Vote table
+        with CaptureQueriesContext(connection) as queries:
+            api = self.client.get(f'/api/election-results/{self.election.id}/').json()
+            page = self.client.get('/results/')
+        self.assertEqual(api['results'][0], {'candidate_name': 'Leader', 'party': 'Independent', 'vote_count': 2})
+        self.assertEqual(page.context['results_data'][0]['winner']['name'], 'Leader')
+        self.assertFalse(any('voting_vote' in query['sql'] for query in queries))
+
+    def test_recompute_command_reports_drift(self):
+        self.election.status = 'completed'
+        self.election.save()
+        ElectionResultSnapshot.compute(self.election)
+        Vote.objects.filter(candidate=self.runner_up).update(candidate=self.leader)
+
+        out = StringIO()
+        call_command('recompute_election_results', stdout=out)
+        self.assertIn('stored result differs from recount', out.getvalue())
+        self.assertEqual(ElectionResult.objects.get(election=self.election).candidate_results.get().votes, 3)
+
+    def test_election_completed_before_snapshots_is_counted_from_votes(self):
+        # Ended before tallies and snapshots existed: votes only in the Vote table
+        CandidateTally.objects.filter(election=self.election).delete()
+        if get_redis():
+            get_redis().delete(*TallyStore.keys(self.election.id))
+        self.election.status = 'completed'
+        self.election.save()
+
+        api = self.client.get(f'/api/election-results/{self.election.id}/').json()
+        self.assertEqual([row['vote_count'] for row in api['results']], [2, 1])
+        result = ElectionResult.objects.get(election=self.election)
+        self.assertEqual((result.total_votes, result.winner_id), (3, self.leader.id))
+
+    def test_migration_backfills_completed_elections(self):
+        from importlib import import_module
+        from django.apps import apps
+
+        self.election.status = 'completed'
+        self.election.save()
+        make_election(name='Still Running')
+        import_module('voting.migrations.0020_backfill_election_results').backfill_results(apps, None)
+
+        result = ElectionResult.objects.get()
+        self.assertEqual(result.election, self.election)
+        self.assertEqual(
+            [(row.name, row.votes, row.rank) for row in result.candidate_results.all()],
+            [('Leader', 2, 1), ('Runner Up', 1, 2)]
+        )
+        self.assertEqual((result.winner_id, result.consensus_achieved), (self.leader.id, True))
+
+
+class LiveElectionPollsTests(TestCase):
+    def setUp(self):
+        self.quiet = make_election('Quiet')
+        make_candidate(self.quiet, 'Quiet Candidate')
+        self.busy = make_election('Busy')
+        self.busy_candidates = [make_candidate(self.busy, f'Busy {i}') for i in range(3)]
+        TallyStore.rebuild(self.quiet.id)
+        TallyStore.rebuild(self.busy.id)
+
+        admin = CustomUser.objects.create_user(username='admin', password='admin123', role='admin', is_active=True)
+        self.client.force_login(admin)
+
+    def polls(self, **params):
+        return self.client.get('/api/get-live-election-polls/', params).json()
+
+    def test_full_ranking_with_constant_queries(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            TallyStore.increment(self.busy.id, self.busy_candidates[2].id)
+
+        with CaptureQueriesContext(connection) as queries:
+            data = self.polls()
+        self.assertFalse(any('voting_vote' in query['sql'] for query in queries))
+
+        busy = next(poll for poll in data['polls'] if poll['election_id'] == str(self.busy.id))
+        self.assertEqual(len(busy['candidates']), 3)
+        self.assertEqual(busy['candidates'][0]['name'], 'Busy 2')
+        self.assertEqual(busy['total_votes'], 1)
+
+    def test_since_returns_only_changed_elections(self):
+        since = timezone.now() + timedelta(seconds=10) + TallyStore.CHANGE_GRACE
+        with self.captureOnCommitCallbacks(execute=True):
+            TallyStore.increment(self.busy.id, self.busy_candidates[0].id)
+        CandidateTally.objects.filter(election=self.busy).update(updated_at=since + timedelta(seconds=1))
+
+        data = self.polls(since=since.isoformat())
+        self.assertEqual([poll['election_id'] for poll in data['polls']], [str(self.busy.id)])
+        self.assertEqual(set(data['active_election_ids']), {str(self.quiet.id), str(self.busy.id)})
+
+
+class ConsensusBatcherTests(TestCase):
+    def setUp(self):
+        self.election = make_election()
+        self.candidate = make_candidate(self.election)
+        for i in range(3):
+            ElectionNode.objects.create(node_id=f'node-{i}', ip_address='127.0.0.1', port=9000 + i, election=self.election)
+        self.votes = [
+            Vote.objects.create(voter=make_voter(f'CNS{i}'), candidate=self.candidate, election=self.election)
+            for i in range(5)
+        ]
+        TallyStore.rebuild(self.election.id)
+
+    def test_batch_finalizes_claimed_votes_in_bulk(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as queries:
+                claimed, finalized = ConsensusBatcher.process(batch_size=3, latency=0)
+
+        self.assertEqual((claimed, finalized), (3, 3))
+        self.assertEqual(VoteConsensusLog.objects.filter(status='confirmed').count(), 9)
+        # Query count does not grow with the batch: claim, nodes, one log insert, one finalize
+        self.assertLess(len(queries), 15)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(ConsensusBatcher.process(batch_size=3, latency=0), (2, 2))
+        self.assertEqual(ConsensusBatcher.process(batch_size=3, latency=0), (0, 0))
+        self.assertEqual(Vote.objects.filter(status='finalized').count(), 5)
+        self.assertEqual(TallyStore.counts(self.election.id), {str(self.candidate.id): 5})
+
+    def test_votes_without_quorum_are_retried(self):
+        ElectionNode.objects.filter(node_id='node-2').update(status='faulty')
+
+        with mock.patch('voting.views.process_vote_consensus.apply_async') as apply_async:
+            self.assertEqual(ConsensusBatcher.process(latency=0), (5, 0))
+        self.assertEqual(Vote.objects.filter(status='consensus_pending').count(), 5)
+        self.assertEqual(apply_async.call_count, 5)
+        self.assertEqual(apply_async.call_args.kwargs['countdown'], ConsensusBatcher.retry_delay())
+        self.assertEqual(apply_async.call_args.kwargs['kwargs'], {'attempt': 1})
+
+        # Not reclaimed before the retry is due...
+        self.assertEqual(ConsensusBatcher.process(latency=0), (0, 0))
+        # ...but as soon as it is, without waiting for STALE_CLAIM
+        Vote.objects.update(consensus_claimed_at=F('consensus_claimed_at') - timedelta(seconds=ConsensusBatcher.retry_delay() + 1))
+        ElectionNode.objects.update(status='active')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(ConsensusBatcher.process(latency=0, attempt=1), (5, 5))
+
+    def test_consensus_starts_after_commit(self):
+        with mock.patch('voting.views.process_vote_consensus.delay') as delay:
+            with self.captureOnCommitCallbacks() as callbacks:
+                ConsensusBatcher.start([self.votes[0].id])
+            delay.assert_not_called()
+
+            for callback in callbacks:
+                callback()
+        delay.assert_called_once_with(str(self.votes[0].id))
+
+
+class ConsensusRoundTests(TestCase):
+    def setUp(self):
+        self.election = make_election()
+        self.candidate = make_candidate(self.election)
+        self.nodes = [
+            ElectionNode.objects.create(node_id=f'round-{i}', ip_address='127.0.0.1', port=9100 + i, election=self.election)
+            for i in range(5)
+        ]
+        self.vote = Vote.objects.create(voter=make_voter('RND1'), candidate=self.candidate, election=self.election)
+
+    def client_with(self, delays):
+        return SimulatedNodeClient(latency=lambda node: delays[node.node_id])
+
+    def test_quorum_reached_without_waiting_for_stragglers(self):
+        delays = {'round-0': 0.01, 'round-1': 0.02, 'round-2': 0.03, 'round-3': 30, 'round-4': 30}
+
+        start = time.perf_counter()
+        confirmations = DistributedElectionManager.create_consensus_round(self.vote, client=self.client_with(delays))
+        self.assertLess(time.perf_counter() - start, 5)
+
+        self.assertEqual(confirmations, 3)
+        self.assertEqual(
+            set(VoteConsensusLog.objects.filter(vote=self.vote).values_list('node_id', flat=True)),
+            {'round-0', 'round-1', 'round-2'}
+        )
+
+    def test_round_gives_up_once_quorum_is_unreachable(self):
+        delays = {'round-0': 0.01, 'round-1': 30, 'round-2': 30, 'round-3': 30, 'round-4': 0.01}
+        vote = Vote.objects.select_related('election').get(id=self.vote.id)
+
+        start = time.perf_counter()
+        rounds = ConsensusBatcher.run_round([vote], client=self.client_with(delays), node_timeout=0.2)
+        self.assertLess(time.perf_counter() - start, 5)
+
+        self.assertEqual(rounds[vote.id].quorum, 3)
+        self.assertEqual(set(rounds[vote.id].signatures), {'round-0', 'round-4'})
+        self.assertEqual(ConsensusBatcher.finalize([vote], rounds), [])
+
+
+class AuditChainTests(TestCase):
+    def test_appends_form_a_linear_verifiable_chain(self):
+        first = create_audit_log('admin_action', details={'step': 1})
+        batch = create_audit_logs_bulk([
+            {'log_type': 'admin_action', 'details': {'step': 2}},
+            {'log_type': 'admin_action', 'details': {'step': 3}},
+        ])
+
+        with CaptureQueriesContext(connection) as queries:
+            last = create_audit_log('security_event', details={'step': 4})
+        self.assertEqual(len(queries), 5)  # savepoint, lock head, insert, move head, release
+        self.assertFalse(any('ORDER BY' in query['sql'] for query in queries))
+
+        chain = list(AuditLog.objects.order_by('sequence'))
+        self.assertEqual([log.sequence for log in chain], [1, 2, 3, 4])
+        self.assertEqual([log.id for log in chain], [first.id, batch[0].id, batch[1].id, last.id])
+
+        previous_hash = ''
+        for log in chain:
+            self.assertEqual(log.previous_hash, previous_hash)
+            self.assertEqual(log.hash_chain, log.generate_hash())
+            previous_hash = log.hash_chain
+        self.assertEqual(AuditChainHead.objects.get().head_hash, previous_hash)
+
+    def test_vote_rolls_back_when_its_entry_cannot_be_chained(self):
+        election = make_election()
+        candidate = make_candidate(election)
+        voter = make_voter('AUD1')
+
+        with mock.patch.object(AuditChain, 'chain', side_effect=RuntimeError('chain unavailable')):
+            with self.assertRaises(RuntimeError):
+                record_vote(voter, candidate, election, voter.user)
+        self.assertFalse(Vote.objects.filter(voter=voter).exists())
+
+
+@skipUnless(get_redis(), 'Audit buffer requires Redis as the cache backend')
+@override_settings(AUDIT_LOG_MODE='buffered')
+class AuditWriterTests(TestCase):
+    def setUp(self):
+        clear_redis_keys()
+        self.addCleanup(clear_redis_keys)
+
+    def test_non_durable_events_are_queued_and_flushed_into_the_chain(self):
+        with mock.patch.object(AuditWriter, 'schedule_flush'), self.captureOnCommitCallbacks(execute=True):
+            self.assertIsNone(create_audit_log('admin_action', details={'action': 'queued'}))
+            self.assertIsNotNone(create_audit_log('vote_cast', details={'action': 'durable'}))
+
+        # The durable event is written at once; the other waits for the flusher
+        self.assertEqual(list(AuditLog.objects.values_list('log_type', flat=True)), ['vote_cast'])
+        self.assertEqual(AuditWriter.pending_count(), 1)
+
+        self.assertEqual(AuditWriter.flush(), 1)
+        self.assertEqual(AuditWriter.pending_count(), 0)
+        self.assertEqual(AuditWriter.flush(), 0)
+
+        chain = list(AuditLog.objects.order_by('sequence'))
+        self.assertEqual([log.log_type for log in chain], ['vote_cast', 'admin_action'])
+        self.assertEqual(chain[1].previous_hash, chain[0].hash_chain)
+        self.assertEqual(chain[1].hash_chain, chain[1].generate_hash())
+
+    def test_rolled_back_events_are_not_queued(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    create_audit_log('admin_action')
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(AuditWriter.pending_count(), 0)
+
+    def test_retried_flush_does_not_duplicate_entries(self):
+        AuditWriter._push([json.dumps({
+            'id': str(uuid.uuid4()), 'log_type': 'admin_action', 'timestamp': timezone.now().isoformat()
+        })], schedule_flush=False)
+        payloads = get_redis().lrange(AuditWriter.QUEUE_KEY, 0, -1)
+
+        self.assertEqual(AuditWriter.flush(), 1)
+        get_redis().rpush(AuditWriter.QUEUE_KEY, *payloads)  # As if the trim had been lost
+        self.assertEqual(AuditWriter.flush(), 0)
+        self.assertEqual(AuditLog.objects.count(), 1)
+
+    def test_flush_lock_of_another_flusher_is_kept(self):
+        r = get_redis()
+        r.set(AuditWriter.FLUSH_LOCK_KEY, 'other', ex=60)
+        self.assertIsNone(AuditWriter.flush())
+        self.assertEqual(r.get(AuditWriter.FLUSH_LOCK_KEY), b'other')
+
+    def test_events_that_cannot_be_written_are_dead_lettered(self):
+        payload = json.dumps({'id': str(uuid.uuid4()), 'log_type': 'admin_action', 'timestamp': timezone.now().isoformat()})
+        with override_settings(AUDIT_BUFFER_MAX_PENDING=0), \
+                mock.patch.object(AuditChain, 'chain', side_effect=RuntimeError('database unavailable')):
+            AuditWriter._push([payload], schedule_flush=False)
+        self.assertEqual(AuditWriter.dead_letter_count(), 1)
+        self.assertEqual(AuditWriter.pending_count(), 0)
+
+
+class VerifyAuditChainTests(TestCase):
+    def setUp(self):
+        create_audit_logs_bulk([{'log_type': 'admin_action', 'details': {'step': step}} for step in range(7)])
+
+    def verify(self, **options):
+        out = StringIO()
+        call_command('verify_audit_chain', workers=1, stdout=out, **options)
+        return out.getvalue()
+
+    def test_segments_are_stitched_and_checkpointed(self):
+        output = self.verify(segments=3)
+        self.assertIn('Verified entries 1..7: 7 rows', output)
+        self.assertIn('rows/s', output)
+        self.assertEqual(AuditCheckpoint.objects.get().sequence, 7)
+
+        # The next run only checks what was appended since the checkpoint
+        create_audit_log('admin_action', details={'step': 7})
+        self.assertIn('Verified entries 8..8: 1 rows', self.verify())
+
+    def test_tampered_entry_is_reported(self):
+        AuditLog.objects.filter(sequence=4).update(details={'step': 'forged'})
+        with self.assertRaises(CommandError):
+            self.verify(segments=3)
+        self.assertFalse(AuditCheckpoint.objects.exists())
+
+    def test_rewritten_link_is_caught_at_a_segment_boundary(self):
+        # Re-hashing a forged entry hides it from its own check, not from its successor's link
+        forged = AuditLog.objects.get(sequence=4)
+        forged.details = {'step': 'forged'}
+        forged.hash_chain = forged.generate_hash()
+        forged.save()
+
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('verify_audit_chain', workers=1, segments=2, stdout=out)
+        self.assertIn('#5: previous_hash does not match', out.getvalue())
+
+    def test_reordered_details_keys_still_verify(self):
+        create_audit_log('admin_action', details={'voter_id': 'V1', 'candidate_name': 'Leader', 'vote_hash': 'abc'})
+        # jsonb hands details back in its own key order
+        AuditLog.objects.filter(sequence=8).update(
+            details={'vote_hash': 'abc', 'candidate_name': 'Leader', 'voter_id': 'V1'}
+        )
+        self.assertIn('Audit chain OK', self.verify(segments=2))
+
+    def test_forged_checkpoint_is_rejected(self):
+        self.verify()
+        AuditCheckpoint.objects.update(hash_chain='0' * 64)
+        with self.assertRaises(CommandError):
+            self.verify()
+
+
+class AuditLogPaginationTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(username='admin', password='admin123', role='admin', is_active=True)
+        self.client.force_login(self.admin)
+        self.election = make_election()
+        # Identical timestamps force the id tie-breaker to be part of the cursor
+        timestamp = timezone.now()
+        create_audit_logs_bulk([
+            {'log_type': 'admin_action', 'user_id': self.admin.id, 'timestamp': timestamp, 'details': {'n': n}}
+            for n in range(150)
+        ])
+        create_audit_logs_bulk([
+            {'log_type': 'election_started', 'election_id': self.election.id, 'details': {'n': n}}
+            for n in range(20)
+        ])
+
+    def test_cursor_walks_every_entry_once(self):
+        seen = []
+        params = {}
+        with CaptureQueriesContext(connection) as queries:
+            while True:
+                data = self.client.get('/api/audit-logs/', params).json()
+                seen += [log['id'] for log in data['logs']]
+                if not data['next_cursor']:
+                    break
+                params = {'after': data['next_cursor']}
+
+        self.assertEqual(len(seen), 170)
+        self.assertEqual(len(set(seen)), 170)
+        # One query per page besides session/auth lookups - no per-row user lookups
+        self.assertLessEqual(len([q for q in queries if 'voting_auditlog' in q['sql']]), 2)
+
+    def test_filters_and_invalid_cursor(self):
+        data = self.client.get('/api/audit-logs/', {'election': str(self.election.id)}).json()
+        self.assertEqual(len(data['logs']), 20)
+        self.assertIsNone(data['next_cursor'])
+
+        today = timezone.localdate().isoformat()
+        data = self.client.get('/api/audit-logs/', {'type': 'admin_action', 'date': today}).json()
+        self.assertEqual(len(data['logs']), 100)
+        self.assertEqual(data['logs'][0]['user'], 'admin')
+
+        self.assertEqual(self.client.get('/api/audit-logs/', {'after': 'garbage'}).status_code, 400)
+
+    def explain(self, queryset):
+        if connection.vendor == 'postgresql':
+            # The planner prefers a sequential scan on a table this small; it must still be able to use the index
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                return queryset.explain()
+        return queryset.explain()
+
+    def test_filtered_pages_are_index_range_scans(self):
+        newest = AuditLog.objects.order_by('-timestamp', '-id')
+        cursor = timezone.now()
+
+        plans = {
+            'auditlog_type_timestamp_idx': newest.filter(log_type='admin_action', timestamp__lt=cursor),
+            'auditlog_election_ts_idx': newest.filter(election_id=self.election.id, timestamp__lt=cursor),
+            'auditlog_timestamp_idx': newest.filter(timestamp__lt=cursor),
+        }
+        for index, queryset in plans.items():
+            with self.subTest(index=index):
+                self.assertIn(index, self.explain(queryset[:100]))
+
+
+class StreamingExportTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(username='admin', password='admin123', role='admin', is_active=True)
+        self.client.force_login(self.admin)
+        self.election = make_election()
+        self.voters = [make_voter(f'EXP{i}') for i in range(5)]
+        create_audit_logs_bulk([
+            {'log_type': 'admin_action', 'user_id': self.admin.id if n % 2 else None, 'details': {'n': n}}
+            for n in range(10)
+        ])
+
+    def download(self, path, params):
+        response = self.client.get(path, params)
+        self.assertTrue(response.streaming)
+        with CaptureQueriesContext(connection) as queries:
+            content = b''.join(response.streaming_content)
+        return response, content, queries
+
+    def test_audit_export_joins_users_in_sql_and_records_row_count(self):
+        response, content, queries = self.download('/api/export-audit-logs/', {'type': 'admin_action'})
+
+        rows = list(csv.reader(io.StringIO(content.decode())))
+        self.assertEqual(rows[0], ['Timestamp', 'Type', 'User', 'Details', 'IP Address', 'Hash'])
+        self.assertEqual(len(rows), 11)
+        self.assertEqual({row[2] for row in rows[1:]}, {'admin', 'System'})
+        self.assertFalse(any('FROM "voting_customuser"' in query['sql'] for query in queries))
+
+        export_log = AuditLog.objects.filter(details__action='export_audit_logs').get()
+        self.assertEqual(export_log.details['rows_streamed'], 10)
+
+    def test_voter_list_streams_gzip_with_footer(self):
+        response, content, _ = self.download('/api/download-voters-list/', {
+            'election_id': str(self.election.id), 'approved': 'true', 'compress': 'gzip'
+        })
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('.csv.gz', response['Content-Disposition'])
+
+        rows = list(csv.reader(io.StringIO(gzip.decompress(content).decode())))
+        self.assertEqual(rows[3][0], 'Voter ID')
+        self.assertEqual([row[0] for row in rows[4:9]], [f'EXP{i}' for i in range(5)])
+        self.assertEqual(rows[4][1], 'Test EXP0')
+        self.assertEqual(rows[4][6], 'APPROVED')
+        self.assertEqual(rows[-1], ['Total Voters: 5'])
+
+        download_log = AuditLog.objects.filter(details__action='download_voters_list').get()
+        self.assertEqual(download_log.details['rows_streamed'], 5)
+
+
+class BackgroundExportTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root, EXPORT_PROGRESS_ROWS=2)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        clear_redis_keys()
+        self.addCleanup(clear_redis_keys)
+
+        self.admin = CustomUser.objects.create_user(username='admin', password='admin123', role='admin', is_active=True)
+        self.client.force_login(self.admin)
+        self.election = make_election()
+        for i in range(5):
+            make_voter(f'JOB{i}')
+
+    def request_export(self, file_format):
+        with mock.patch('voting.tasks.run_export_job.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                data = self.client.post('/api/exports/', json.dumps({
+                    'kind': 'voters_list',
+                    'format': file_format,
+                    'params': {'election_id': str(self.election.id), 'statuses': ['approved']}
+                }), content_type='application/json').json()
+        # Run the queued job here instead of relying on an eager Celery
+        for call in delay.call_args_list:
+            BackgroundExport.run(*call.args)
+        return data
+
+    def test_job_writes_file_reports_progress_and_serves_download(self):
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)('admin_dashboard', channel)
+
+        data = self.request_export('jsonl')
+        self.assertTrue(data['success'])
+        job = ExportJob.objects.get(id=data['job']['id'])
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual((job.total_rows, job.rows_written), (5, 5))
+
+        updates = []
+        while True:
+            try:
+                message = async_to_sync(asyncio.wait_for)(layer.receive(channel), 0.1)
+            except asyncio.TimeoutError:
+                break
+            updates.append(message['data']['job'])
+        self.assertEqual([update['rows_written'] for update in updates], [0, 2, 4, 5])
+        self.assertEqual(updates[-1]['status'], 'completed')
+
+        response = self.client.get(f'/api/exports/{job.id}/download/')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(json.loads(lines[0])['Voter ID'], 'JOB0')
+        self.assertEqual(len(lines), 5)
+
+    def test_identical_requests_share_a_job(self):
+        first = self.request_export('xlsx')
+        second = self.request_export('xlsx')
+        self.assertEqual(first['job']['id'], second['job']['id'])
+        self.assertTrue(second['deduplicated'])
+        self.assertEqual(ExportJob.objects.count(), 1)
+
+        import openpyxl
+        workbook = openpyxl.load_workbook(ExportJob.objects.get().file.path, read_only=True)
+        self.assertEqual(len(list(workbook.active.rows)), 6)
+
+        self.assertFalse(self.request_export('csv')['deduplicated'])
+
+
+class ExcelExportTests(TestCase):
+    def test_write_only_workbook_with_sampled_widths(self):
+        import openpyxl
+
+        rows = iter([('A', 'short'), ('B', 'x' * 30)] + [('C', 'y' * 80)])
+        with override_settings(EXCEL_WIDTH_SAMPLE_ROWS=2), tempfile.TemporaryFile() as output:
+            row_count = ExcelExport.write(output, ['Code', 'Text'], rows, title_rows=['Title'],
+                                          footer=lambda count: [f"Total: {count}"])
+            output.seek(0)
+            sheet = openpyxl.load_workbook(output).active
+
+        self.assertEqual(row_count, 3)
+        values = [[cell.value for cell in row] for row in sheet.iter_rows()]
+        self.assertEqual(values[0][0], 'Title')
+        self.assertEqual(values[2], ['Code', 'Text'])
+        self.assertEqual(values[5], ['C', 'y' * 80])
+        self.assertEqual(values[-1][0], 'Total: 3')
+        # Widths come from the header and the sampled rows only, capped at MAX_WIDTH
+        self.assertEqual(sheet.column_dimensions['A'].width, 6)
+        self.assertEqual(sheet.column_dimensions['B'].width, 32)
+
+    def test_voter_list_excel_download(self):
+        admin = CustomUser.objects.create_user(username='admin', password='admin123', role='admin', is_active=True)
+        self.client.force_login(admin)
+        election = make_election()
+        for i in range(3):
+            make_voter(f'XLS{i}')
+
+        response = self.client.get('/api/download-voters-list/', {
+            'election_id': str(election.id), 'approved': 'true', 'format': 'excel'
+        })
+        self.assertEqual(response['Content-Type'], ExcelExport.CONTENT_TYPE)
+        self.assertEqual(AuditLog.objects.get(details__action='download_voters_list').details['voter_count'], 3)
+
+
+@skipUnless(ColumnarExport.is_available(), 'pyarrow is not installed')
+class ColumnarExportTests(TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir)
+
+        self.election = make_election()
+        candidate = make_candidate(self.election)
+        self.voters = [make_voter(f'PQ{i}') for i in range(3)]
+        for i, voter in enumerate(self.voters):
+            Vote.objects.create(voter=voter, candidate=candidate, election=self.election, vote_hash=f'pq{i}')
+
+    def test_votes_parquet_is_typed_and_unlinked_from_voters(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        path = f"{self.output_dir}/votes.parquet"
+        call_command('export_analytics', 'votes', path, '--election', str(self.election.id),
+                     '--chunk-size', '2', stdout=StringIO())
+
+        table = pq.read_table(path)
+        self.assertEqual(table.column_names, ['election_id', 'candidate_id', 'hour', 'status'])
+        self.assertEqual(table.num_rows, 3)
+        self.assertTrue(pa.types.is_timestamp(table.schema.field('hour').type))
+        # Only the hour is exported, never the exact time a ballot was cast
+        self.assertTrue(all(
+            (hour.minute, hour.second, hour.microsecond) == (0, 0, 0) for hour in table.column('hour').to_pylist()
+        ))
+        self.assertEqual(set(table.column('election_id').to_pylist()), {str(self.election.id)})
+
+    def test_demographics_arrow_hashes_voter_ids_and_memory_maps(self):
+        import pyarrow as pa
+
+        columns, rows, total = ColumnarExport.source('voter_demographics', {'pii': 'hash'})
+        path = f"{self.output_dir}/voters.arrow"
+        self.assertEqual(ColumnarExport.write(path, columns, rows, 'arrow', chunk_size=2), total)
+
+        with pa.memory_map(path) as source:
+            table = pa.ipc.open_file(source).read_all()
+        self.assertEqual(table.column_names,
+                         ['voter_key', 'state', 'district', 'city', 'gender', 'birth_year', 'approval_status'])
+        self.assertEqual(table.column('voter_key').to_pylist(),
+                         [ColumnarExport.voter_key(voter.voter_id) for voter in sorted(self.voters, key=lambda v: v.id)])
+        self.assertEqual(table.column('birth_year').to_pylist(), [2000] * 3)
+
+        columns, _, _ = ColumnarExport.source('voter_demographics')
+        self.assertNotIn('voter_key', columns)
+
+    def test_columnar_formats_are_rejected_for_other_exports(self):
+        admin = CustomUser.objects.create_user(username='admin', password='admin123', role='admin', is_active=True)
+        self.client.force_login(admin)
+        response = self.client.post('/api/exports/', json.dumps({
+            'kind': 'audit_logs', 'format': 'parquet'
+        }), content_type='application/json').json()
+        self.assertFalse(response['success'])
+
+
+@skipUnless(get_redis(), 'Redis OTP store requires Redis as the cache backend')
+@override_settings(OTP_STORE='redis')
+class RedisOTPStoreTests(TestCase):
+    def setUp(self):
+        clear_redis_keys()
+        self.addCleanup(clear_redis_keys)
+        self.voter = make_voter('OTP1')
+        self.mobile = self.voter.mobile
+
+    def test_otp_lives_in_an_expiring_hash_not_the_table(self):
+        success, _, otp_code = OTPService.send_otp(self.mobile)
+        self.assertTrue(success)
+        self.assertFalse(OTPVerification.objects.exists())
+
+        r = get_redis()
+        self.assertLessEqual(r.ttl(RedisOTPStore.key(self.mobile)), 600)
+        self.assertNotEqual(r.hget(RedisOTPStore.key(self.mobile), 'code').decode(), otp_code)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(OTPService.verify_otp(self.mobile, otp_code), (True, 'OTP verified successfully'))
+        self.assertEqual(len(queries), 0)
+        # A code can only be used once
+        self.assertFalse(OTPService.verify_otp(self.mobile, otp_code)[0])
+
+    def test_attempts_are_counted_atomically_and_exhaust_the_otp(self):
+        _, _, otp_code = OTPService.send_otp(self.mobile)
+        wrong = '000000' if otp_code != '000000' else '111111'
+
+        self.assertIn('2 attempt(s) remaining', OTPService.verify_otp(self.mobile, wrong)[1])
+        self.assertIn('1 attempt(s) remaining', OTPService.verify_otp(self.mobile, wrong)[1])
+        self.assertIn('Maximum attempts reached', OTPService.verify_otp(self.mobile, wrong)[1])
+        self.assertEqual(OTPService.verify_otp(self.mobile, otp_code),
+                         (False, 'No valid OTP found. Please request a new one.'))
+
+    def test_new_otp_replaces_the_previous_one(self):
+        _, _, first = OTPService.send_otp(self.mobile)
+        with mock.patch.object(OTPService, 'generate_otp', return_value='654321' if first != '654321' else '123456'):
+            _, _, second = OTPService.send_otp(self.mobile)
+        self.assertFalse(OTPService.verify_otp(self.mobile, first)[0])
+        self.assertTrue(OTPService.verify_otp(self.mobile, second)[0])
+
+    @override_settings(OTP_AUDIT_TRAIL=True)
+    def test_audit_trail_records_otps_without_codes(self):
+        _, _, otp_code = OTPService.send_otp(self.mobile)
+        OTPService.verify_otp(self.mobile, otp_code)
+
+        record = OTPVerification.objects.get()
+        self.assertEqual((record.otp, record.verified, record.attempts), ('', True, 1))
+
+    @override_settings(OTP_STORE='database')
+    def test_database_store_still_available(self):
+        _, _, otp_code = OTPService.send_otp(self.mobile)
+        self.assertEqual(OTPVerification.objects.get().otp, otp_code)
+        self.assertTrue(OTPService.verify_otp(self.mobile, otp_code)[0])
+
+
+class FakeSMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply('220 fake-smtp ESMTP')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip().upper()
+            if command.startswith('DATA'):
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                for data_line in iter(self.rfile.readline, b''):
+                    if data_line.rstrip(b'\r\n') == b'.':
+                        break
+                    data.append(data_line)
+                self.server.messages.append(b''.join(data).decode())
+                self.reply('250 OK')
+            elif command.startswith('QUIT'):
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    """Local SMTP server that records the messages it receives"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeSMTPHandler)
+        self.connections = 0
+        self.messages = []
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+    def settings(self):
+        return override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1', EMAIL_PORT=self.server_address[1], EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='', OTP_EMAIL_MODE='queued'
+        )
+
+
+@skipUnless(get_redis(), 'Queued OTP email requires Redis as the cache backend')
+@override_settings(OTP_EMAIL_MODE='queued')
+class OTPMailerTests(TestCase):
+    def setUp(self):
+        clear_redis_keys()
+        self.addCleanup(clear_redis_keys)
+        OTPMailer.close()
+        self.addCleanup(OTPMailer.close)
+
+    def test_batches_share_one_pooled_smtp_connection(self):
+        with FakeSMTPServer() as server, server.settings():
+            for i in range(5):
+                OTPMailer.enqueue(f'voter{i}@voter.com', f'98765432{i}0', f'12345{i}', schedule=False)
+            self.assertEqual(OTPMailer.drain(), 5)
+
+            OTPMailer.enqueue('late@voter.com', '9876543299', '999999', schedule=False)
+            self.assertEqual(OTPMailer.drain(), 1)
+            OTPMailer.close()
+
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(len(server.messages), 6)
+        self.assertIn('Your One-Time Password (OTP) is: 123450', server.messages[0])
+
+        stats = OTPMailer.stats()
+        self.assertEqual((stats['sent'], stats['queued'], stats['breaker_open']), (6, 0, False))
+        self.assertGreaterEqual(stats['delay_max'], 0)
+
+    def test_send_otp_returns_before_delivery(self):
+        voter = make_voter('MAIL1')
+        with FakeSMTPServer() as server, server.settings():
+            with mock.patch('voting.tasks.send_otp_emails.apply_async') as apply_async:
+                success, message, otp_code = OTPService.send_otp(voter.mobile)
+            self.assertTrue(success)
+            apply_async.assert_called_once()
+            self.assertEqual(server.messages, [])
+
+            self.assertEqual(OTPMailer.drain(), 1)
+            OTPMailer.close()
+        self.assertIn(otp_code, server.messages[0])
+
+    def test_queue_never_holds_the_code_and_survives_a_crashed_worker(self):
+        OTPMailer.enqueue('crash@voter.com', '9876543210', '482913', schedule=False)
+        self.assertNotIn(b'482913', get_redis().lindex(OTPMailer.QUEUE_KEY, 0))
+
+        # A worker claims the batch and dies before sending it
+        OTPMailer.claim(get_redis(), OTPMailer.batch_size())
+        self.assertEqual(OTPMailer.pending_count(), 0)
+        with FakeSMTPServer() as server, server.settings():
+            self.assertEqual(OTPMailer.drain(), 0)
+            with mock.patch('voting.otp_service.time.time', return_value=time.time() + OTPMailer.CLAIM_TIMEOUT + 1):
+                self.assertEqual(OTPMailer.drain(), 1)
+            OTPMailer.close()
+        self.assertIn('Your One-Time Password (OTP) is: 482913', server.messages[0])
+        self.assertFalse(get_redis().exists(OTPMailer.CLAIMS_KEY))
+
+    @override_settings(OTP_SMTP_FAILURE_THRESHOLD=2, OTP_EMAIL_MODE='queued',
+                       EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend')
+    def test_circuit_breaker_keeps_emails_queued_while_smtp_is_down(self):
+        with mock.patch('django.core.mail.backends.smtp.EmailBackend.open', side_effect=OSError('refused')) as smtp_open, \
+                mock.patch('voting.tasks.send_otp_emails.apply_async') as apply_async:
+            OTPMailer.enqueue('down@voter.com', '9876543210', '123456', schedule=False)
+            self.assertEqual(OTPMailer.drain(), 0)
+            self.assertEqual(apply_async.call_args.kwargs['countdown'], 1)  # Retried soon
+            self.assertEqual(OTPMailer.drain(), 0)
+            self.assertEqual(smtp_open.call_count, 2)
+            self.assertTrue(OTPMailer.stats()['breaker_open'])
+            # The next attempt waits out the cooldown
+            self.assertEqual(apply_async.call_args.kwargs['countdown'], OTPMailer.cooldown() + 1)
+
+            OTPMailer.enqueue('down2@voter.com', '9876543211', '654321', schedule=False)
+            self.assertIsNone(OTPMailer.drain())
+            self.assertEqual(smtp_open.call_count, 2)
+        self.assertEqual(OTPMailer.pending_count(), 2)
+
+        # After the cooldown a successful probe closes the breaker
+        get_redis().delete(OTPMailer.OPEN_KEY)
+        with FakeSMTPServer() as server, override_settings(
+            EMAIL_HOST='127.0.0.1', EMAIL_PORT=server.server_address[1], EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD=''
+        ):
+            self.assertEqual(OTPMailer.drain(), 2)
+            OTPMailer.close()
+        self.assertFalse(get_redis().exists(OTPMailer.TRIPPED_KEY))
+
+
+@skipUnless(get_redis(), 'Rate limiter requires Redis as the cache backend')
+class RateLimiterTests(TestCase):
+    def setUp(self):
+        clear_redis_keys()
+        self.addCleanup(clear_redis_keys)
+
+    def login(self, voter_id, remote_addr='10.0.0.1'):
+        return self.client.post('/login_user/', json.dumps({'voterId': voter_id, 'password': 'wrong'}),
+                                content_type='application/json', REMOTE_ADDR=remote_addr)
+
+    @override_settings(RATE_LIMITS={'login_user': {'voter': (2, 1)}})
+    def test_voter_bucket_rejects_before_any_query(self):
+        self.assertEqual(self.login('NOBODY').status_code, 200)
+        self.assertEqual(self.login('NOBODY').status_code, 200)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.login('NOBODY')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+        self.assertEqual(len(queries), 0)
+
+        # Other voters have their own bucket
+        self.assertEqual(self.login('SOMEONE').status_code, 200)
+        self.assertEqual(RateLimiter.stats(), {'login_user:allowed': 3, 'login_user:voter:limited': 1})
+
+    @override_settings(RATE_LIMITS={'send_otp': {'ip': (1, 60)}})
+    def test_ip_bucket_refills_over_time(self):
+        now = time.time()
+        with mock.patch('voting.ratelimit.time.time', return_value=now):
+            self.assertEqual(self.client.post('/login/otp/', {'mobile': '1'}, REMOTE_ADDR='10.0.0.2').status_code, 200)
+            self.assertEqual(self.client.post('/login/otp/', {'mobile': '2'}, REMOTE_ADDR='10.0.0.2').status_code, 429)
+            self.assertEqual(self.client.post('/login/otp/', {'mobile': '3'}, REMOTE_ADDR='10.0.0.3').status_code, 200)
+        with mock.patch('voting.ratelimit.time.time', return_value=now + 1):
+            self.assertEqual(self.client.post('/login/otp/', {'mobile': '4'}, REMOTE_ADDR='10.0.0.2').status_code, 200)
+
+    @override_settings(RATE_LIMITS={'cast_vote': {'ip': (1, 1)}})
+    def test_idempotent_replay_is_not_rate_limited(self):
+        election = make_election()
+        candidate = make_candidate(election)
+        EligibilityIndex.rebuild()
+        voter = make_voter('RLV1')
+        self.client.force_login(voter.user)
+
+        def cast():
+            return self.client.post('/api/cast-vote/', {'candidate_id': str(candidate.id)},
+                                    content_type='application/json', headers={'Idempotency-Key': 'replay-1'})
+
+        first = cast()
+        self.assertTrue(first.json()['success'])
+        # The bucket is empty, but the retry is answered from the stored response
+        replay = cast()
+        self.assertEqual(replay.status_code, 200)
+        self.assertEqual(replay.json()['vote_id'], first.json()['vote_id'])
+
+    @override_settings(RATE_LIMITS={'login_user': {'ip': (5, 60), 'voter': (1, 1)}})
+    def test_rejected_requests_take_no_tokens(self):
+        self.login('FIRST')
+        for _ in range(3):
+            self.assertEqual(self.login('FIRST').status_code, 429)
+        # The IP bucket only paid for the one admitted request
+        self.assertEqual([self.login(f'V{i}').status_code for i in range(5)], [200] * 4 + [429])
+
+
+@skipUnless(get_redis(), 'Login lockout requires Redis as the cache backend')
+@override_settings(RATE_LIMITS={})
+class LoginLockoutTests(TestCase):
+    def setUp(self):
+        clear_redis_keys()
+        self.addCleanup(clear_redis_keys)
+        self.voter = make_voter('LOCK1')
+        self.voter.approval_status = 'approved'
+        self.voter.save()
+
+    def login(self, password, remote_addr='10.0.0.1'):
+        return self.client.post('/login_user/', json.dumps({'voterId': 'LOCK1', 'password': password}),
+                                content_type='application/json', REMOTE_ADDR=remote_addr).json()
+
+    def user_updates(self, queries):
+        return [query['sql'] for query in queries if query['sql'].startswith('UPDATE "voting_customuser"')]
+
+    def test_failed_attempts_lock_the_account_without_row_writes(self):
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(5):
+                self.assertEqual(self.login('wrong')['message'], 'Invalid Voter ID or password')
+        self.assertEqual(self.user_updates(queries), [])
+        self.assertTrue(LoginLockout.is_locked('LOCK1'))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.login('voter123')
+        self.assertEqual(response['message'], 'Account is temporarily locked. Please try again later.')
+        self.assertEqual(len(queries), 0)
+
+        user = CustomUser.objects.get(username='LOCK1')
+        self.assertEqual((user.failed_login_attempts, user.is_locked), (0, False))
+
+    def test_success_clears_failures_and_writes_last_login_ip_once(self):
+        for _ in range(4):
+            self.login('wrong')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(self.login('voter123')['success'])
+        self.assertEqual(len([sql for sql in self.user_updates(queries) if 'last_login_ip' in sql]), 1)
+        self.assertEqual(CustomUser.objects.get(username='LOCK1').last_login_ip, '10.0.0.1')
+        self.assertFalse(get_redis().exists(LoginLockout.failures_key('LOCK1')))
+
+        # Same address on the next session: nothing to write back
+        self.client.logout()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(self.login('voter123')['success'])
+        self.assertFalse([sql for sql in self.user_updates(queries) if 'last_login_ip' in sql])
+
+
+@override_settings(RATE_LIMITS={}, PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_QUEUE_TIMEOUT=0)
+class PasswordVerifierTests(TestCase):
+    def setUp(self):
+        PasswordVerifier.shutdown()
+        self.addCleanup(PasswordVerifier.shutdown)
+        make_voter('HASH1')
+
+    def login(self):
+        return self.client.post('/login_user/', json.dumps({'voterId': 'HASH1', 'password': 'voter123'}),
+                                content_type='application/json')
+
+    def test_each_login_verifies_the_password_once(self):
+        from django.contrib.auth.hashers import check_password
+
+        with mock.patch('voting.hashing.check_password', wraps=check_password) as verify:
+            self.login()
+        self.assertEqual(verify.call_count, 1)
+
+    def test_logins_beyond_the_pool_are_turned_away(self):
+        _, slots = PasswordVerifier._pool()
+        slots.acquire()
+        try:
+            response = self.login()
+        finally:
+            slots.release()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.login().status_code, 200)
+
+
+@skipUnless(get_redis(), 'Waiting room requires Redis as the cache backend')
+@override_settings(WAITING_ROOM_ENABLED=True, WAITING_ROOM_BURST=1, WAITING_ROOM_ADMIT_RATE=1,
+                   WAITING_ROOM_PUSH_INTERVAL=0.01, RATE_LIMITS={})
+class WaitingRoomTests(TestCase):
+    def setUp(self):
+        clear_redis_keys()
+        self.addCleanup(clear_redis_keys)
+        self.now = time.time()
+
+    def visit(self, token, after=0):
+        with mock.patch('voting.waiting_room.time.time', return_value=self.now + after):
+            return WaitingRoom.visit(token)
+
+    def login(self, client):
+        with mock.patch('voting.waiting_room.time.time', return_value=self.now):
+            return client.post('/login_user/', json.dumps({'voterId': 'NOBODY', 'password': 'x'}),
+                               content_type='application/json')
+
+    def test_clients_beyond_the_admission_rate_queue_without_touching_the_database(self):
+        from django.test import Client
+
+        first = self.login(self.client).json()
+        self.assertNotIn('queued', first)
+        self.assertEqual(first['message'], 'Invalid Voter ID or password')
+
+        with CaptureQueriesContext(connection) as queries:
+            queued = [self.login(Client()).json() for _ in range(2)]
+        self.assertEqual(len(queries), 0)
+        self.assertEqual([response['waiting_room']['position'] for response in queued], [1, 2])
+
+        # The admitted client keeps its pass
+        self.assertNotIn('queued', self.login(self.client).json())
+
+        # One second later the head of the queue is admitted and the next one moves up
+        second, third = [response['waiting_room']['token'] for response in queued]
+        self.assertEqual(self.visit(third, after=1), (1, 1))
+        self.assertEqual(self.visit(second, after=1)[0], 0)
+        self.assertEqual(WaitingRoom.stats()['admitted'], 2)
+
+    def test_abandoned_clients_lose_their_place_without_using_an_admission(self):
+        tokens = [WaitingRoom.new_token() for _ in range(3)]
+        self.assertEqual([self.visit(token)[0] for token in tokens], [0, 1, 2])
+
+        # The second client stopped checking in; its admission goes to the third
+        self.assertEqual(self.visit(tokens[2], after=40)[0], 0)
+        self.assertEqual(WaitingRoom.stats(), {'admitted': 2, 'abandoned': 1, 'enabled': True, 'waiting': 0})
+        # Coming back means joining at the end
+        self.assertEqual(self.visit(tokens[1], after=40), (1, 1))
+
+    def test_websocket_pushes_position_until_admitted(self):
+        from channels.routing import URLRouter
+        from channels.testing import WebsocketCommunicator
+        from .urls import websocket_urlpatterns
+
+        self.visit(WaitingRoom.new_token())
+        token = WaitingRoom.new_token()
+        self.visit(token)
+
+        async def follow():
+            communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f"/ws/waiting-room/{token}/")
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            update = await communicator.receive_json_from()
+            self.assertEqual((update['type'], update['data']['position']), ('queue_position', 1))
+
+            self.now += 1  # An admission becomes available
+            with mock.patch('voting.waiting_room.time.time', side_effect=lambda: self.now):
+                admitted = await communicator.receive_json_from()
+            self.assertEqual(admitted['type'], 'admitted')
+            await communicator.disconnect()
+
+        with mock.patch('voting.waiting_room.time.time', side_effect=lambda: self.now):
+            async_to_sync(follow)()
+
+
+class ImportVotersTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def row(self, voter_id, **fields):
+        row = {
+            'firstName': 'Asha', 'lastName': 'Rao', 'email': f'{voter_id.lower()}@example.com',
+            'mobile': '9876543210', 'dob': '1990-05-17', 'gender': 'Female', 'parentSpouseName': 'Ravi Rao',
+            'streetAddress': '12 MG Road', 'city': 'Pune', 'state': 'Maharashtra', 'pincode': '411001',
+            'placeOfBirth': 'Pune', 'voterId': voter_id, 'aadharNumber': '123412341234',
+            'panNumber': 'ABCDE1234F', 'constituency': 'Pune', 'password': 'voter123',
+        }
+        row.update(fields)
+        return row
+
+    def write_csv(self, rows):
+        path = f"{self.directory}/voters.csv"
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        return path
+
+    def run_import(self, path, **options):
+        out = StringIO()
+        call_command('import_voters', path, workers=1, stdout=out, **options)
+        return out.getvalue()
+
+    def test_csv_rows_are_validated_and_inserted_in_chunks(self):
+        path = self.write_csv([
+            self.row('IMP1'), self.row('IMP2'),
+            self.row('IMP3', dob='2015-01-01'),
+            self.row('IMP4', gender='Unknown'),
+            self.row('IMP1'),
+            self.row('IMP5', mobile=''),
+        ])
+        output = self.run_import(path, chunk_size=10, error_file=f"{self.directory}/errors.csv")
+
+        self.assertIn('rows/s', output)
+        self.assertIn('2 voters created, 0 already registered, 4 rejected', output)
+        voter = Voter.objects.select_related('user').get(voter_id='IMP1')
+        self.assertEqual((voter.approval_status, voter.user.role, voter.user.is_active), ('pending', 'voter', False))
+        self.assertEqual(voter.user.username, 'IMP1')
+        self.assertTrue(voter.user.check_password('voter123'))
+        with open(f"{self.directory}/errors.csv") as f:
+            errors = {row['line']: row['reason'] for row in csv.DictReader(f)}
+        self.assertEqual(errors['3'], 'younger than 18')
+        self.assertEqual(errors['5'], 'duplicate voter ID in file')
+        self.assertIn('mobile', errors['6'])
+
+        self.assertEqual(AuditLog.objects.get(details__action='import_voters').details['inserted'], 2)
+        self.assertFalse(os.path.exists(f"{path}.import-state.json"))
+
+    def test_jsonl_with_unusable_passwords_and_approval(self):
+        path = f"{self.directory}/voters.jsonl"
+        # Model field names are accepted as well as the registration form's
+        row = self.row('IMPJ1')
+        row.update(voter_id=row.pop('voterId'), first_name='Dev', date_of_birth=row.pop('dob'))
+        del row['firstName']
+        with open(path, 'w') as f:
+            f.write(json.dumps(row) + '\n\nnot json\n')
+
+        output = self.run_import(path, passwords='unusable', status='approved')
+        self.assertIn('1 voters created, 0 already registered, 1 rejected', output)
+        voter = Voter.objects.select_related('user').get(voter_id='IMPJ1')
+        self.assertEqual((voter.first_name, voter.approval_status, voter.user.is_active), ('Dev', 'approved', True))
+        self.assertIsNotNone(voter.approval_date)
+        self.assertFalse(voter.user.has_usable_password())
+
+    def test_interrupted_import_resumes_after_the_last_committed_chunk(self):
+        from .importer import VoterImporter
+
+        path = self.write_csv([self.row(f'IMPR{i}') for i in range(5)])
+        commit = VoterImporter.commit
+        calls = []
+
+        def fail_on_second_chunk(importer, voters, errors):
+            calls.append(len(voters))
+            if len(calls) == 2:
+                raise RuntimeError('connection lost')
+            commit(importer, voters, errors)
+
+        with mock.patch.object(VoterImporter, 'commit', fail_on_second_chunk):
+            with self.assertRaises(RuntimeError):
+                self.run_import(path, chunk_size=2)
+        self.assertEqual(Voter.objects.count(), 2)
+
+        output = self.run_import(path, chunk_size=2)
+        self.assertIn('Resuming after line 2', output)
+        self.assertIn('Imported 3 rows', output)
+        self.assertIn('5 voters created, 0 already registered, 0 rejected', output)
+        self.assertEqual(Voter.objects.filter(voter_id__startswith='IMPR').count(), 5)
+
+        # Importing the same file again only finds existing voters
+        self.assertIn('0 voters created, 5 already registered', self.run_import(path))
@@ -38,6 +38,7 @@ urlpatterns = [
     path('api/add-candidate/', views.add_candidate, name='add_candidate'),
     path('api/update-candidate/', views.update_candidate, name='update_candidate'),
     path('api/cast-vote/', views.cast_vote, name='cast_vote'),
+    path('api/cast-vote-async/', views.cast_vote_async, name='cast_vote_async'),
     path('api/start-election/', views.start_election, name='start_election'),
     path('api/end-election/', views.end_election, name='end_election'),
     path('api/verify-candidate/', views.verify_candidate, name='verify_candidate'),
@@ -68,6 +69,9 @@ urlpatterns = [
     
     path('api/audit-logs/', views.get_audit_logs, name='get_audit_logs'),
     path('api/export-audit-logs/', views.export_audit_logs, name='export_audit_logs'),
+    path('api/exports/', views.create_export_job, name='create_export_job'),
+    path('api/exports/<uuid:job_id>/', views.get_export_job, name='get_export_job'),
+    path('api/exports/<uuid:job_id>/download/', views.download_export_job, name='download_export_job'),
 
     path('api/election-status/<uuid:election_id>/', views.get_election_status, name='election_status'),
     path('api/vote-status/<uuid:vote_id>/', views.get_vote_status, name='vote_status'),
@@ -90,4 +94,5 @@ websocket_urlpatterns = [
     path('ws/vote/<uuid:vote_id>/', consumers.VoteConsumer.as_asgi(), name='ws_vote'),
     path('ws/admin/', consumers.AdminConsumer.as_asgi(), name='ws_admin'),
     path('ws/voter/', consumers.VoterConsumer.as_asgi(), name='ws_voter'),
+    path('ws/waiting-room/<str:token>/', consumers.WaitingRoomConsumer.as_asgi(), name='ws_waiting_room'),
 ]
\ No newline at end of file
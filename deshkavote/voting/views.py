@@ -1,15 +1,16 @@
 # Clean version of views.py with proper imports and function order
 
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, FileResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_GET
 from django.core.exceptions import ValidationError
 from django.utils import timezone
-from django.db import transaction, models
+from django.utils.dateparse import parse_datetime
+from django.db import transaction, models, IntegrityError
 from django.db.models import Count
 from django.core.cache import cache
 from django.conf import settings
@@ -26,10 +27,27 @@ from django.shortcuts import render, redirect
 from django.contrib.auth import login
 from .models import CustomUser
 from .models import CandidateUser
-from .otp_service import OTPService
+from .otp_service import OTPMailer, OTPService
 from .forms import DocumentUploadForm
+from .vote_buffer import VoteIngestionBuffer
+from .eligibility import EligibilityIndex
+from .vote_guard import HasVotedGuard
+from .hashing import PasswordVerifier
+from .idempotency import idempotent
+from .lockout import LoginLockout
+from .ratelimit import RateLimiter, rate_limited
+from .waiting_room import WaitingRoom, waiting_room
+from .tally import TallyStore
+from .results import ElectionResultSnapshot
+from .consensus import ConsensusBatcher
+from .audit import AuditWriter
+from .analytics import ColumnarExport
+from .exports import (
+    AUDIT_LOG_HEADER, VOTER_LIST_HEADER, BackgroundExport, CSVExport, ExcelExport, audit_log_rows,
+    filter_audit_logs, voter_list_rows, voters_for_election
+)
 # Import Django Channels libraries
-from asgiref.sync import async_to_sync
+from asgiref.sync import async_to_sync, sync_to_async
 from channels.layers import get_channel_layer
 
 # Try to import optional dependencies
@@ -47,7 +65,7 @@ except ImportError:
 
 from .models import (
     CustomUser, Voter, Election, Candidate, Vote,
-    VoteConsensusLog, ElectionNode, AuditLog, VoterSession
+    VoteConsensusLog, ElectionNode, AuditLog, VoterSession, ExportJob
 )
 
 # Set up logging
@@ -58,37 +76,36 @@ class DistributedElectionManager:
     """Manage distributed election operations"""
 
     @staticmethod
-    def create_consensus_round(vote):
-        """Create consensus round for vote verification"""
-        nodes = ElectionNode.objects.filter(
-            election=vote.election,
-            status='active'
-        )[:vote.required_confirmations]
-
-        for node in nodes:
-            VoteConsensusLog.objects.create(
-                vote=vote,
-                node_id=node.node_id,
-                consensus_round=1,
-                status='pending',
-                signature=f"sig_{vote.vote_hash}_{node.node_id}"
-            )
+    def create_consensus_round(vote, client=None):
+        """Create consensus round for vote verification.
 
-        return nodes.count()
+        Every active node is asked concurrently; the round stops once the quorum
+        has confirmed. Returns the number of confirmations recorded.
+        """
+        rounds = ConsensusBatcher.run_round([vote], client=client)
+        return len(rounds[vote.id].signatures)
 
     @staticmethod
     def achieve_consensus(vote_id):
         """Check if consensus is achieved for a vote"""
-        vote = Vote.objects.get(id=vote_id)
+        vote = Vote.objects.select_related('election').get(id=vote_id)
         confirmed_logs = VoteConsensusLog.objects.filter(
             vote=vote,
             status='confirmed'
         ).count()
 
         if confirmed_logs >= vote.required_confirmations:
-            vote.status = 'finalized'
-            vote.confirmation_count = confirmed_logs
-            vote.save()
+            with transaction.atomic():
+                # Conditional update so a retried task never counts a vote twice
+                finalized = Vote.objects.filter(id=vote.id).exclude(status='finalized').update(
+                    status='finalized',
+                    confirmation_count=confirmed_logs
+                )
+                if finalized:
+                    TallyStore.increment(vote.election_id, vote.candidate_id)
+                    if vote.election.status == 'completed':
+                        # Late finalization after the election ended: refresh its stored results
+                        transaction.on_commit(lambda: ElectionResultSnapshot.compute(vote.election))
             return True
         return False
 
@@ -122,10 +139,6 @@ class DistributedElectionManager:
 
 def create_audit_log(log_type, user=None, election=None, details=None, request=None):
     """Create audit log entry with hash chain"""
-    # Get previous hash for chain integrity
-    last_log = AuditLog.objects.order_by('-timestamp').first()
-    previous_hash = last_log.hash_chain if last_log else ""
-
     # Extract request details
     ip_address = None
     user_agent = ""
@@ -133,45 +146,36 @@ def create_audit_log(log_type, user=None, election=None, details=None, request=N
         ip_address = request.META.get('REMOTE_ADDR')
         user_agent = request.META.get('HTTP_USER_AGENT', '')
 
-    log_entry = AuditLog.objects.create(
-        log_type=log_type,
-        user=user,
-        election=election,
-        details=details or {},
-        ip_address=ip_address,
-        user_agent=user_agent,
-        previous_hash=previous_hash
-    )
+    # Chained onto the locked chain head, or queued for the audit flusher (returns None then)
+    logs = AuditWriter.record([{
+        'log_type': log_type,
+        'user_id': user.id if user else None,
+        'election_id': election.id if election else None,
+        'details': details,
+        'ip_address': ip_address,
+        'user_agent': user_agent
+    }])
+
+    return logs[0] if logs else None
 
-    return log_entry
+def create_audit_logs_bulk(entries):
+    """Create several chained audit log entries with a single insert.
+
+    Each entry is a dict of AuditLog field values (log_type, user_id, election_id,
+    details, ip_address, user_agent). Entries are chained in the given order;
+    returns the rows written right away (non-durable types may be queued).
+    """
+    return AuditWriter.record(entries)
 
 # Celery tasks
 @shared_task
-def process_vote_consensus(vote_id):
+def process_vote_consensus(vote_id, attempt=0):
     """Background task to process vote consensus"""
     try:
-        vote = Vote.objects.get(id=vote_id)
-        time.sleep(2)  # Simulate processing time
-
-        # Create consensus logs
-        node_count = DistributedElectionManager.create_consensus_round(vote)
-
-        # Simulate consensus achievement
-        if node_count >= vote.required_confirmations:
-            # Update consensus logs to confirmed
-            VoteConsensusLog.objects.filter(vote=vote).update(status='confirmed')
-            DistributedElectionManager.achieve_consensus(vote_id)
-            cache.delete(f"vote_status_{vote_id}")
-            
-            # Notify via WebSocket
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
-                f"vote_{vote_id}",
-                {
-                    "type": "send_vote_update",
-                    "data": {"status": "finalized", "message": "Your vote has been verified."}
-                }
-            )
+        # A batch of one: same claim/confirm/finalize path as the batch task
+        claimed, finalized = ConsensusBatcher.process(batch_size=1, vote_ids=[vote_id], attempt=attempt)
+        if not finalized:
+            return f"Consensus pending for vote {vote_id}"
 
         return f"Consensus achieved for vote {vote_id}"
 
@@ -199,6 +203,7 @@ def auth_page(request):
     return render(request, 'auth.html')
 
 
+@rate_limited('register_voter')
 @csrf_exempt
 def register_voter(request):
     """Enhanced voter registration with security features"""
@@ -362,6 +367,8 @@ def register_voter(request):
 
     return JsonResponse({'success': False, 'message': 'Invalid request method'})
 
+@rate_limited('login_user')
+@waiting_room
 @csrf_exempt
 def login_user(request):
     """Enhanced voter login with security features"""
@@ -390,27 +397,34 @@ def login_user(request):
                     'message': 'Voter ID and password are required'
                 })
 
+            # Lockout mechanism
+            if LoginLockout.is_locked(voter_id):
+                return JsonResponse({
+                    'success': False,
+                    'message': 'Account is temporarily locked. Please try again later.'
+                })
+
             try:
                 user = CustomUser.objects.get(username=voter_id)
                 print(f"User found: {user.username}")
                 print(f"User is_active: {user.is_active}")
                 print(f"User role: {user.role}")
-                # Lockout mechanism
-                if user.is_locked and user.lock_time and timezone.now() < user.lock_time + timedelta(minutes=15):
+                if LoginLockout.is_locked_in_table(user):
                      return JsonResponse({
                         'success': False,
                         'message': 'Account is temporarily locked. Please try again later.'
                     })
                 
-                password_correct = user.check_password(password)
-                print(f"Password check result: {password_correct}")
+                password_correct = PasswordVerifier.verify(user, password)
+                if password_correct is None:
+                    return JsonResponse({
+                        'success': False,
+                        'message': 'The server is busy. Please try again in a moment.'
+                    }, status=503)
 
-                if user.check_password(password) and user.role == 'voter':
+                if password_correct and user.role == 'voter':
                     print("✅ Password is correct and user is voter")
-                    user.failed_login_attempts = 0
-                    user.is_locked = False
-                    user.last_login_ip = request.META.get('REMOTE_ADDR')
-                    user.save()
+                    LoginLockout.clear_failures(user)
 
                     try:
                         voter = Voter.objects.get(user=user)
@@ -456,6 +470,7 @@ def login_user(request):
                             })
                         elif voter.approval_status == 'approved' and user.is_active:
                             login(request, user)
+                            LoginLockout.record_login(user, request.META.get('REMOTE_ADDR'))
 
                             # Create voter session
                             if not request.session.session_key:
@@ -496,12 +511,8 @@ def login_user(request):
                             'message': 'Voter profile not found'
                         })
                 else:
-                    user.failed_login_attempts += 1
-                    if user.failed_login_attempts >= 5:
-                        user.is_locked = True
-                        user.lock_time = timezone.now()
-                    user.save()
-                    
+                    LoginLockout.record_failure(user)
+
                     logger.warning(f"Invalid credentials for voter: {voter_id}")
                     return JsonResponse({
                         'success': False,
@@ -525,6 +536,7 @@ def login_user(request):
 
     return JsonResponse({'success': False, 'message': 'Invalid request method'})
 
+@rate_limited('verify_otp')
 @csrf_exempt
 def verify_otp(request):
     if request.method == 'POST':
@@ -547,6 +559,7 @@ def verify_otp(request):
            
             if success:
                 login(request, user)
+                LoginLockout.record_login(user, request.META.get('REMOTE_ADDR'))
                
                 # Create voter session
                 if not request.session.session_key:
@@ -641,13 +654,8 @@ def voter_dashboard(request):
 
     try:
         voter = Voter.objects.get(user=request.user)
-        # Calculate counts
-        all_elections = voter.get_eligible_elections()
-        voted_elections = Vote.objects.filter(voter=voter).values_list('election_id', flat=True)
-        active_elections_count = Election.objects.filter(
-            id__in=[e.id for e in all_elections],
-            status='active'
-        ).count()
+        # Calculate counts (the eligibility index only holds active elections)
+        active_elections_count = len(voter.get_eligible_election_ids())
         votes_casted_count = Vote.objects.filter(voter=voter, status='finalized').count()
 
         if voter.approval_status != 'approved':
@@ -667,7 +675,7 @@ def voter_dashboard(request):
         
         if not elections_data:
             eligible_elections = voter.get_eligible_elections()
-            voted_elections = Vote.objects.filter(voter=voter).values_list('election_id', flat=True)
+            voted_elections = set(Vote.objects.filter(voter=voter).values_list('election_id', flat=True))
 
             elections_data = []
             for election in eligible_elections:
@@ -713,17 +721,12 @@ def admin_dashboard(request):
     rejected_candidate_users = CandidateUser.objects.filter(approval_status='rejected').order_by('-updated_at')
     # --- START OF MODIFIED LOGIC ---
     # Calculate vote counts and leading candidate for each election
+    tallies = TallyStore.results_many(
+        election.id for election in elections if election.status in ['active', 'completed']
+    )
     for election in elections:
         if election.status in ['active', 'completed']:
-            # Temporarily removed status='finalized' to show all votes
-            vote_counts = Vote.objects.filter(
-                election=election
-            ).values(
-                'candidate__name', 
-                'candidate__party'
-            ).annotate(
-                vote_count=Count('id')
-            ).order_by('-vote_count')
+            vote_counts = tallies[str(election.id)]
 
             if vote_counts:
                 leading_candidate_data = vote_counts[0]
@@ -787,6 +790,44 @@ def get_candidates(request, election_id):
         logger.error(f"Error getting candidates: {e}")
         return JsonResponse({'success': False, 'message': str(e)})
 
+def record_vote(voter, candidate, election, user, request=None):
+    """Write a ballot with its audit entry and start consensus.
+
+    Returns the Vote, or None if the (voter, election) unique constraint rejected it.
+    """
+    try:
+        with transaction.atomic():
+            vote = Vote.objects.create(
+                voter=voter,
+                candidate=candidate,
+                election=election,
+                status='pending',
+                required_confirmations=3
+            )
+
+            # Create audit log
+            create_audit_log(
+                'vote_cast',
+                user=user,
+                election=election,
+                details={
+                    'voter_id': voter.voter_id,
+                    'candidate_name': candidate.name,
+                    'vote_hash': vote.vote_hash
+                },
+                request=request
+            )
+    except IntegrityError:
+        return None
+
+    logger.info(f"Vote created: {vote.id}")
+
+    # Start consensus process
+    ConsensusBatcher.start([vote.id])
+    return vote
+
+@idempotent  # Replays are served before the limiter charges a token
+@rate_limited('cast_vote')
 @csrf_exempt
 @login_required
 def cast_vote(request):
@@ -795,6 +836,7 @@ def cast_vote(request):
         return JsonResponse({'success': False, 'message': 'Unauthorized'})
 
     if request.method == 'POST':
+        guard_slot = None
         try:
             with transaction.atomic():
                 data = json.loads(request.body)
@@ -811,50 +853,57 @@ def cast_vote(request):
                         'message': 'Election is not currently active'
                     })
                 
-                eligible_elections_ids = [e.id for e in voter.get_eligible_elections()]
-                if election.id not in eligible_elections_ids:
+                if not voter.is_eligible_for(election):
                     return JsonResponse({
                         'success': False,
                         'message': 'You are not eligible to vote in this election'
                     })
 
-                # Check if voter has already voted
-                if Vote.objects.filter(voter=voter, election=election).exists():
+                # Check if voter has already voted: one atomic SETBIT in Redis, falling
+                # back to the database while the election's bitmap is cold
+                first_vote = HasVotedGuard.mark(election.id, voter.id)
+                if first_vote is False or (
+                    first_vote is None and Vote.objects.filter(voter=voter, election=election).exists()
+                ):
                     return JsonResponse({
                         'success': False,
                         'message': 'You have already voted in this election'
                     })
+                if first_vote:
+                    guard_slot = (election.id, voter.id)
 
-                # Create vote
-                vote = Vote.objects.create(
-                    voter=voter,
-                    candidate=candidate,
-                    election=election,
-                    status='pending',
-                    required_confirmations=3
-                )
-
-                logger.info(f"Vote created: {vote.id}")
+                # Write-behind mode: acknowledge now, the flusher inserts the vote
+                if VoteIngestionBuffer.is_enabled():
+                    token = VoteIngestionBuffer.submit(voter, candidate, election, request=request)
+                    if token is None:
+                        return JsonResponse({
+                            'success': False,
+                            'message': 'You have already voted in this election'
+                        })
 
-                # Start consensus process
-                process_vote_consensus.delay(str(vote.id))
+                    logger.info(f"Vote accepted into buffer: {token}")
+                    return JsonResponse({
+                        'success': True,
+                        'message': 'Vote accepted! It will be recorded and verified through our distributed consensus system shortly.',
+                        'vote_id': token,
+                        'queued': True
+                    })
 
-                # Create audit log
-                create_audit_log(
-                    'vote_cast',
-                    user=request.user,
-                    election=election,
-                    details={
-                        'voter_id': voter.voter_id,
-                        'candidate_name': candidate.name,
-                        'vote_hash': vote.vote_hash
-                    },
-                    request=request
-                )
+                # Create vote (unique_together stays the last line of defence)
+                vote = record_vote(voter, candidate, election, request.user, request=request)
+                if vote is None:
+                    guard_slot = None
+                    return JsonResponse({
+                        'success': False,
+                        'message': 'You have already voted in this election'
+                    })
 
+            # The vote is committed: from here on the voter's slot stays taken
+            guard_slot = None
+            try:
                 cache.delete(f"voter_elections_{voter.id}")
                 cache.delete('election_stats')
-                
+
                 # Notify admin dashboard via websockets
                 channel_layer = get_channel_layer()
                 async_to_sync(channel_layer.group_send)(
@@ -866,15 +915,20 @@ def cast_vote(request):
                         }
                     }
                 )
+            except Exception as e:
+                logger.warning(f"Vote {vote.id} recorded, but notifying about it failed: {e}")
 
-                return JsonResponse({
-                    'success': True,
-                    'message': 'Vote cast successfully! Your vote is being verified through our distributed consensus system.',
-                    'vote_id': str(vote.id)
-                })
+            return JsonResponse({
+                'success': True,
+                'message': 'Vote cast successfully! Your vote is being verified through our distributed consensus system.',
+                'vote_id': str(vote.id)
+            })
 
         except Exception as e:
             logger.error(f"Error casting vote: {str(e)}")
+            if guard_slot:
+                # The vote was not recorded, let the voter try again
+                HasVotedGuard.unmark(*guard_slot)
             return JsonResponse({
                 'success': False,
                 'message': f'Error casting vote: {str(e)}'
@@ -882,6 +936,118 @@ def cast_vote(request):
 
     return JsonResponse({'success': False, 'message': 'Invalid request method'})
 
+@idempotent  # Replays are served before the limiter charges a token
+@rate_limited('cast_vote')
+@csrf_exempt
+@login_required
+async def cast_vote_async(request):
+    """Async vote casting for the ASGI stack, with the same validation as cast_vote.
+
+    Reads go through the async ORM, the eligibility index and has-voted guard through
+    async cache/Redis clients, and the dashboard notification is awaited directly.
+    Only the vote + audit insert runs in a thread, since transactions are sync-only.
+    """
+    user = await request.auser()
+    if user.role != 'voter':
+        return JsonResponse({'success': False, 'message': 'Unauthorized'})
+
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'Invalid request method'})
+
+    guard_slot = None
+    try:
+        data = json.loads(request.body)
+        logger.info(f"Vote casting attempt by {user.username}: {data}")
+
+        voter = await aget_object_or_404(Voter, user=user)
+        candidate = await aget_object_or_404(Candidate.objects.select_related('election'), id=data['candidate_id'])
+        election = candidate.election
+
+        # Validate voting eligibility
+        if election.status != 'active':
+            return JsonResponse({
+                'success': False,
+                'message': 'Election is not currently active'
+            })
+
+        if not await EligibilityIndex.ais_eligible(voter.state, voter.city, voter.district, election.id):
+            return JsonResponse({
+                'success': False,
+                'message': 'You are not eligible to vote in this election'
+            })
+
+        # Check if voter has already voted
+        first_vote = await HasVotedGuard.amark(election.id, voter.id)
+        if first_vote is False or (
+            first_vote is None and await Vote.objects.filter(voter=voter, election=election).aexists()
+        ):
+            return JsonResponse({
+                'success': False,
+                'message': 'You have already voted in this election'
+            })
+        if first_vote:
+            guard_slot = (election.id, voter.id)
+
+        # Write-behind mode: acknowledge now, the flusher inserts the vote
+        if await sync_to_async(VoteIngestionBuffer.is_enabled)():
+            token = await sync_to_async(VoteIngestionBuffer.submit)(voter, candidate, election, request=request)
+            if token is None:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'You have already voted in this election'
+                })
+
+            logger.info(f"Vote accepted into buffer: {token}")
+            return JsonResponse({
+                'success': True,
+                'message': 'Vote accepted! It will be recorded and verified through our distributed consensus system shortly.',
+                'vote_id': token,
+                'queued': True
+            })
+
+        # Create vote (unique_together stays the last line of defence)
+        vote = await sync_to_async(record_vote)(voter, candidate, election, user, request=request)
+        # Either way the voter's slot stays taken now: the vote is committed (or already existed)
+        guard_slot = None
+        if vote is None:
+            return JsonResponse({
+                'success': False,
+                'message': 'You have already voted in this election'
+            })
+
+        try:
+            await cache.adelete_many([f"voter_elections_{voter.id}", 'election_stats'])
+
+            # Notify admin dashboard via websockets
+            channel_layer = get_channel_layer()
+            await channel_layer.group_send(
+                "admin_dashboard", {
+                    "type": "send_admin_update",
+                    "data": {
+                        "type": "new_vote",
+                        "message": f"New vote cast in {election.name}"
+                    }
+                }
+            )
+        except Exception as e:
+            logger.warning(f"Vote {vote.id} recorded, but notifying about it failed: {e}")
+
+        return JsonResponse({
+            'success': True,
+            'message': 'Vote cast successfully! Your vote is being verified through our distributed consensus system.',
+            'vote_id': str(vote.id)
+        })
+
+    except Exception as e:
+        logger.error(f"Error casting vote: {str(e)}")
+        if guard_slot:
+            # The vote was not recorded, let the voter try again
+            await HasVotedGuard.aunmark(*guard_slot)
+        return JsonResponse({
+            'success': False,
+            'message': f'Error casting vote: {str(e)}'
+        })
+
 # --- NEW API VIEWS START HERE ---
 
 @require_GET
@@ -895,53 +1061,161 @@ def admin_stats(request):
         'system_health': 99.8,  # Placeholder
         'active_nodes': ElectionNode.objects.filter(status='active').count(),
         'total_nodes': ElectionNode.objects.count(),
+        'otp_email': OTPMailer.stats(),
+        'rate_limits': RateLimiter.stats(),
+        'waiting_room': WaitingRoom.stats(),
     }
     return JsonResponse({'success': True, 'stats': stats})
 
+AUDIT_LOG_PAGE_SIZE = 100
+
 @require_GET
 @login_required
 def get_audit_logs(request):
-    log_type = request.GET.get('type')
-    date = request.GET.get('date')
-    
-    logs = AuditLog.objects.all().order_by('-timestamp')
-    if log_type:
-        logs = logs.filter(log_type=log_type)
-    if date:
-        logs = logs.filter(timestamp__date=date)
-        
+    """Newest audit entries first, one page at a time.
+
+    Pass the previous page's `next_cursor` as `?after=<timestamp,id>` to get the
+    next page. The cursor is a keyset position, so every page costs one index
+    range scan however deep it is.
+    """
+    logs = AuditLog.objects.select_related('user').order_by('-timestamp', '-id')
+    try:
+        logs = filter_audit_logs(request.GET, logs)
+    except (ValueError, ValidationError):
+        return JsonResponse({'success': False, 'message': 'Invalid filter'}, status=400)
+
+    if request.GET.get('after'):
+        cursor_timestamp, _, cursor_id = request.GET['after'].replace(' ', '+').rpartition(',')
+        after = parse_datetime(cursor_timestamp)
+        try:
+            cursor_id = uuid.UUID(cursor_id)
+        except ValueError:
+            after = None
+        if after is None:
+            return JsonResponse({'success': False, 'message': 'Invalid cursor'}, status=400)
+        logs = logs.filter(
+            models.Q(timestamp__lt=after) | models.Q(timestamp=after, id__lt=cursor_id)
+        )
+
+    page = list(logs[:AUDIT_LOG_PAGE_SIZE + 1])
+    next_cursor = None
+    if len(page) > AUDIT_LOG_PAGE_SIZE:
+        page = page[:AUDIT_LOG_PAGE_SIZE]
+        next_cursor = f"{page[-1].timestamp.isoformat()},{page[-1].id}"
+
     data = [{
+        'id': str(log.id),
         'timestamp': log.timestamp,
         'log_type': log.log_type,
         'user': log.user.username if log.user else 'System',
         'details': json.dumps(log.details),
         'ip_address': log.ip_address,
         'hash_chain': log.hash_chain,
-    } for log in logs[:100]] # Limit to 100 most recent
-    
-    return JsonResponse({'success': True, 'logs': data})
+    } for log in page]
+
+    return JsonResponse({'success': True, 'logs': data, 'next_cursor': next_cursor})
 
 @require_GET
 @login_required
 def export_audit_logs(request):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="audit_logs.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['Timestamp', 'Type', 'User', 'Details', 'IP Address', 'Hash'])
-    
-    logs = AuditLog.objects.all().order_by('-timestamp')
-    for log in logs:
-        writer.writerow([
-            log.timestamp,
-            log.log_type,
-            log.user.username if log.user else 'System',
-            json.dumps(log.details),
-            log.ip_address,
-            log.hash_chain
-        ])
-        
-    return response
+    """Stream the (optionally filtered) audit log as CSV; ?compress=gzip for a .csv.gz"""
+    logs = AuditLog.objects.order_by('-timestamp', '-id')
+    try:
+        logs = filter_audit_logs(request.GET, logs)
+    except (ValueError, ValidationError):
+        return JsonResponse({'success': False, 'message': 'Invalid filter'}, status=400)
+
+    compress = CSVExport.wants_gzip(request)
+
+    def log_export(row_count):
+        create_audit_log(
+            'admin_action',
+            user=request.user,
+            details={
+                'action': 'export_audit_logs',
+                'filters': {key: request.GET[key] for key in ('type', 'date', 'election') if request.GET.get(key)},
+                'compressed': compress,
+                'rows_streamed': row_count
+            },
+            request=request
+        )
+
+    return CSVExport.response(
+        audit_log_rows(logs),
+        'audit_logs',
+        preamble=[AUDIT_LOG_HEADER],
+        compress=compress,
+        on_complete=log_export
+    )
+
+@csrf_exempt
+@login_required
+def create_export_job(request):
+    """Queue a background export.
+
+    kind is voters_list, audit_logs, or one of the analytics datasets (votes,
+    voter_demographics); format is csv, xlsx, jsonl, parquet or arrow.
+    """
+    if not (request.user.is_staff or request.user.role == 'admin'):
+        return JsonResponse({'success': False, 'message': 'Unauthorized'})
+
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            kind = data.get('kind')
+            file_format = data.get('format', 'csv')
+            params = data.get('params') or {}
+
+            if kind not in dict(ExportJob.KIND_CHOICES):
+                return JsonResponse({'success': False, 'message': 'Unknown export kind'})
+            if file_format not in dict(ExportJob.FORMAT_CHOICES):
+                return JsonResponse({'success': False, 'message': 'Unknown export format'})
+            if kind == 'voters_list':
+                election = get_object_or_404(Election, id=params.get('election_id'))
+                params = {'election_id': str(election.id), 'statuses': sorted(params.get('statuses') or [])}
+            elif kind in ColumnarExport.DATASETS:
+                params = {key: params[key] for key in ('election', 'pii') if params.get(key)}
+                if params.get('pii', 'exclude') not in ('exclude', 'hash'):
+                    return JsonResponse({'success': False, 'message': 'pii must be exclude or hash'})
+            else:
+                params = {key: params[key] for key in ('type', 'date', 'election') if params.get(key)}
+            if file_format in ColumnarExport.FORMATS and kind not in ColumnarExport.DATASETS:
+                return JsonResponse({'success': False, 'message': 'Parquet/Arrow is only available for votes and voter_demographics'})
+            if file_format in ColumnarExport.FORMATS and not ColumnarExport.is_available():
+                return JsonResponse({'success': False, 'message': 'Parquet/Arrow exports require pyarrow'})
+
+            job, created = BackgroundExport.request(request.user, kind, file_format, params)
+            return JsonResponse({'success': True, 'job': BackgroundExport.as_dict(job), 'deduplicated': not created})
+
+        except (ValueError, ValidationError) as e:
+            return JsonResponse({'success': False, 'message': f'Invalid export request: {e}'})
+        except Exception as e:
+            logger.error(f"Error creating export job: {e}")
+            return JsonResponse({'success': False, 'message': str(e)})
+
+    return JsonResponse({'success': False, 'message': 'Invalid request method'})
+
+@require_GET
+@login_required
+def get_export_job(request, job_id):
+    if not (request.user.is_staff or request.user.role == 'admin'):
+        return JsonResponse({'success': False, 'message': 'Unauthorized'})
+
+    job = get_object_or_404(ExportJob, id=job_id)
+    return JsonResponse({'success': True, 'job': BackgroundExport.as_dict(job)})
+
+@require_GET
+@login_required
+def download_export_job(request, job_id):
+    if not (request.user.is_staff or request.user.role == 'admin'):
+        return JsonResponse({'success': False, 'message': 'Unauthorized'})
+
+    job = get_object_or_404(ExportJob, id=job_id)
+    if job.status != 'completed' or not job.file:
+        return JsonResponse({'success': False, 'message': f'Export is {job.status}'}, status=409)
+
+    filename = f"{job.kind}_{job.created_at.strftime('%Y%m%d_%H%M%S')}.{BackgroundExport.EXTENSIONS[job.file_format]}"
+    return FileResponse(job.file.open('rb'), as_attachment=True, filename=filename)
 
 @require_GET
 @login_required
@@ -1015,26 +1289,29 @@ def get_election_details(request, election_id):
 @login_required
 def get_election_results(request, election_id):
     election = get_object_or_404(Election, id=election_id)
-    vote_counts = Vote.objects.filter(
-        election=election,
-        status='finalized'
-    ).values(
-        'candidate__name',
-        'candidate__party'
-    ).annotate(
-        vote_count=Count('id')
-    ).order_by('-vote_count')
 
-    return JsonResponse({
-        'success': True,
-        'results': [
+    if election.status == 'completed':
+        results = [
+            {
+                'candidate_name': row['name'],
+                'party': row['party'],
+                'vote_count': row['votes']
+            }
+            for row in ElectionResultSnapshot.candidate_rows(ElectionResultSnapshot.get(election))
+        ]
+    else:
+        results = [
             {
                 'candidate_name': r['candidate__name'],
                 'party': r['candidate__party'],
                 'vote_count': r['vote_count']
             }
-            for r in vote_counts
+            for r in TallyStore.results(election.id)
         ]
+
+    return JsonResponse({
+        'success': True,
+        'results': results
     })
 
 
@@ -1042,7 +1319,7 @@ def get_election_results(request, election_id):
 @login_required
 def finalize_election_results(request, election_id):
     election = get_object_or_404(Election, id=election_id)
-    vote_counts = Vote.objects.filter(election=election, status='finalized').values('candidate__name').annotate(vote_count=Count('id')).order_by('-vote_count')
+    vote_counts = TallyStore.results(election.id)
     
     winner = "N/A"
     winning_votes = 0
@@ -1064,30 +1341,6 @@ def verify_candidate(request):
         return JsonResponse({'success': True, 'candidate_name': candidate.name})
     return JsonResponse({'success': False, 'message': 'Invalid request'})
     
-@require_GET
-@login_required
-def download_voters_list(request):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="voters_list.csv"'
-
-    writer = csv.writer(response)
-    writer.writerow(['Voter ID', 'Name', 'Email', 'State', 'City', 'Status'])
-    
-    voters = Voter.objects.all()
-    # Optional filtering can be added here based on GET params
-    
-    for voter in voters:
-        writer.writerow([
-            voter.voter_id,
-            voter.full_name,
-            voter.email,
-            voter.state,
-            voter.city,
-            voter.approval_status
-        ])
-        
-    return response
-
 # Placeholder views for real-time charts, returning random data for now
 def get_vote_queue_status(request):
     import random
@@ -1109,6 +1362,7 @@ def get_consensus_status(request):
     
 # --- END OF NEW API VIEWS ---
 
+@idempotent
 @csrf_exempt
 @login_required
 def approve_voter(request):
@@ -1272,6 +1526,7 @@ def reconsider_voter(request):
             return JsonResponse({'success': False, 'message': str(e)})
     return JsonResponse({'success': False, 'message': 'Invalid request method'})
 
+@idempotent
 @csrf_exempt
 @login_required
 def create_election(request):
@@ -1453,6 +1708,7 @@ def get_available_candidates(request):
     
     return JsonResponse({'success': True, 'candidates': data})
 
+@idempotent
 @csrf_exempt
 @login_required
 def add_candidate(request):
@@ -1556,6 +1812,9 @@ def start_election(request):
             if election.status == 'upcoming':
                 election.status = 'active'
                 election.save()
+                EligibilityIndex.rebuild()
+                HasVotedGuard.rebuild(election.id)
+                TallyStore.rebuild(election.id)
                 
                 # Notify front-end via WebSocket
                 channel_layer = get_channel_layer()
@@ -1590,6 +1849,8 @@ def end_election(request):
             if election.status == 'active':
                 election.status = 'completed'
                 election.save()
+                EligibilityIndex.rebuild()
+                ElectionResultSnapshot.compute(election)
                 
                 # Notify front-end via WebSocket
                 channel_layer = get_channel_layer()
@@ -1633,7 +1894,8 @@ def get_election_status(request, election_id):
         # Get vote statistics
         total_votes = Vote.objects.filter(election=election).count()
         verified_votes = Vote.objects.filter(election=election, status='finalized').count()
-        pending_votes = Vote.objects.filter(election=election, status='pending').count()
+        pending_votes = Vote.objects.filter(election=election, status__in=('pending', 'consensus_pending')).count()
+        turnout = HasVotedGuard.turnout(election.id)
 
         data = {
             'election': {
@@ -1648,7 +1910,8 @@ def get_election_status(request, election_id):
             'votes': {
                 'total': total_votes,
                 'verified': verified_votes,
-                'pending': pending_votes
+                'pending': pending_votes,
+                'turnout': turnout if turnout is not None else total_votes
             }
         }
 
@@ -1661,6 +1924,17 @@ def get_election_status(request, election_id):
 def get_vote_status(request, vote_id):
     """Get real-time vote verification status"""
     try:
+        # Acknowledged by the write-behind buffer but not flushed yet
+        if not Vote.objects.filter(id=vote_id).exists():
+            owner_id = VoteIngestionBuffer.pending_user_id(str(vote_id))
+            if owner_id is not None:
+                if not (request.user.is_staff or request.user.role == 'admin' or owner_id == request.user.id):
+                    return JsonResponse({'success': False, 'message': 'Unauthorized'})
+                return JsonResponse({
+                    'success': True,
+                    'data': {'vote_id': str(vote_id), 'status': 'queued'}
+                })
+
         vote = get_object_or_404(Vote, id=vote_id)
 
         # Check if user is authorized to view this vote
@@ -1700,45 +1974,68 @@ def get_vote_status(request, vote_id):
 @require_GET
 @login_required
 def get_live_election_polls(request):
-    """Get live polling data for active elections"""
+    """Get live polling data for active elections.
+
+    Counts come from the incremental tally, so a poll costs O(candidates) however
+    many votes have been cast. Pass the previous response's `as_of` as `?since=`
+    to receive only elections whose counts changed since then.
+    """
     if not (request.user.is_staff or request.user.role == 'admin'):
         return JsonResponse({'success': False, 'message': 'Unauthorized'})
     
-    active_elections = Election.objects.filter(status='active')
+    since = None
+    if request.GET.get('since'):
+        # A bare '+' in the offset arrives as a space when the client did not urlencode it
+        since = parse_datetime(request.GET['since'].replace(' ', '+'))
+        if since is None:
+            return JsonResponse({'success': False, 'message': 'Invalid since timestamp'}, status=400)
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+    
+    # Taken before reading counts, so nothing that changes during this request is missed next time
+    as_of = timezone.now()
+    
+    active_elections = list(Election.objects.filter(status='active').values('id', 'name', 'state'))
+    active_ids = [str(election['id']) for election in active_elections]
+    
+    polled_elections = active_elections
+    if since is not None:
+        changed = TallyStore.changed_since(active_ids, since)
+        polled_elections = [election for election in active_elections if str(election['id']) in changed]
+    
+    tallies = TallyStore.results_many((election['id'] for election in polled_elections), include_empty=True)
     polls_data = []
     
-    for election in active_elections:
-        # Get vote counts for each candidate
-        candidates_data = []
-        total_votes = Vote.objects.filter(election=election).count()
+    for election in polled_elections:
+        ranking = tallies[str(election['id'])]
+        total_votes = sum(row['vote_count'] for row in ranking)
         
-        for candidate in election.candidates.all():
-            vote_count = Vote.objects.filter(
-                candidate=candidate,
-                election=election
-            ).count()
-            
-            percentage = (vote_count / total_votes * 100) if total_votes > 0 else 0
-            
+        candidates_data = []
+        for rank, row in enumerate(ranking, 1):
+            percentage = (row['vote_count'] / total_votes * 100) if total_votes > 0 else 0
             candidates_data.append({
-                'name': candidate.name,
-                'party': candidate.party,
-                'votes': vote_count,
+                'rank': rank,
+                'candidate_id': str(row['candidate__id']),
+                'name': row['candidate__name'],
+                'party': row['candidate__party'],
+                'votes': row['vote_count'],
                 'percentage': round(percentage, 1)
             })
         
-        # Sort by votes descending
-        candidates_data.sort(key=lambda x: x['votes'], reverse=True)
-        
         polls_data.append({
-            'election_id': str(election.id),
-            'election_name': election.name,
-            'state': election.state,
+            'election_id': str(election['id']),
+            'election_name': election['name'],
+            'state': election['state'],
             'total_votes': total_votes,
-            'candidates': candidates_data[:2]  # Top 2 candidates
+            'candidates': candidates_data
         })
     
-    return JsonResponse({'success': True, 'polls': polls_data})
+    return JsonResponse({
+        'success': True,
+        'polls': polls_data,
+        'active_election_ids': active_ids,
+        'as_of': as_of.isoformat()
+    })
 
 @shared_task
 def sync_election_across_nodes(election_id):
@@ -1777,93 +2074,10 @@ def results_page(request):
         # Get all completed elections ordered by end date (most recent first)
         completed_elections = Election.objects.filter(
             status='completed'
-        ).order_by('-end_date').prefetch_related('candidates')
+        ).order_by('-end_date').select_related('result').prefetch_related('result__candidate_results')
         
-        results_data = []
-        
-        for election in completed_elections:
-            # Get vote counts for each candidate in this election
-            vote_counts = Vote.objects.filter(
-                election=election,
-                status='finalized'
-            ).values(
-                'candidate__id',
-                'candidate__name', 
-                'candidate__party',
-                'candidate__symbol'
-            ).annotate(
-                vote_count=Count('id')
-            ).order_by('-vote_count')
-            
-            # Calculate total votes for this election
-            total_votes = sum(item['vote_count'] for item in vote_counts)
-            
-            # Prepare candidate results with percentages
-            candidates_results = []
-            for item in vote_counts:
-                percentage = (item['vote_count'] / total_votes * 100) if total_votes > 0 else 0
-                candidates_results.append({
-                    'id': item['candidate__id'],
-                    'name': item['candidate__name'],
-                    'party': item['candidate__party'],
-                    'symbol': item['candidate__symbol'],
-                    'votes': item['vote_count'],
-                    'percentage': round(percentage, 2)
-                })
-            
-            # Determine winner (candidate with most votes)
-            winner = None
-            if len(candidates_results) > 1 and candidates_results[0]['votes'] == candidates_results[1]['votes']:
-                winner = None  # Tie between candidates
-            else:
-                winner = candidates_results[0] if candidates_results else None
-
-            # Check if consensus was achieved based on threshold
-            consensus_achieved = False
-            if winner and total_votes > 0:
-                winner_percentage = winner['percentage']
-                consensus_achieved = winner_percentage >= election.consensus_threshold
-
-            # If consensus not achieved and there is a tie, declare no winner
-            if not consensus_achieved and winner is None:
-                winner = None  # Explicitly set winner to None for tie scenario
-            
-            # Get total eligible voters (approved voters in the election's location)
-            if election.election_type == 'General Election':
-                eligible_voters_count = Voter.objects.filter(approval_status='approved').count()
-            elif election.election_type == 'State Assembly':
-                eligible_voters_count = Voter.objects.filter(
-                    approval_status='approved',
-                    state=election.state
-                ).count()
-            elif election.election_type == 'Municipal':
-                eligible_voters_count = Voter.objects.filter(
-                    approval_status='approved',
-                    state=election.state,
-                    city=election.city
-                ).count()
-            elif election.election_type == 'Panchayat':
-                eligible_voters_count = Voter.objects.filter(
-                    approval_status='approved',
-                    state=election.state,
-                    district=election.district
-                ).count()
-            else:
-                eligible_voters_count = Voter.objects.filter(approval_status='approved').count()
-            
-            # Calculate voter turnout
-            voter_turnout = (total_votes / eligible_voters_count * 100) if eligible_voters_count > 0 else 0
-            
-            results_data.append({
-                'election': election,
-                'candidates_results': candidates_results,
-                'total_votes': total_votes,
-                'eligible_voters': eligible_voters_count,
-                'voter_turnout': round(voter_turnout, 2),
-                'winner': winner,
-                'consensus_achieved': consensus_achieved,
-                'consensus_threshold': election.consensus_threshold
-            })
+        # Results are materialized when an election ends
+        results_data = [ElectionResultSnapshot.as_context(election) for election in completed_elections]
         
         context = {
             'results_data': results_data,
@@ -1933,65 +2147,25 @@ def voter_results(request):
         voted_elections = Election.objects.filter(
             id__in=voted_election_ids,
             status='completed'
-        ).order_by('-end_date').prefetch_related('candidates')
+        ).order_by('-end_date').select_related('result').prefetch_related('result__candidate_results')
+        
+        # The candidate this voter voted for in each of those elections
+        voter_votes = {
+            vote.election_id: vote
+            for vote in Vote.objects.filter(
+                voter=voter,
+                election__in=voted_elections,
+                status='finalized'
+            ).select_related('candidate')
+        }
         
         results_data = []
         
         for election in voted_elections:
-            # Get vote counts for each candidate in this election
-            vote_counts = Vote.objects.filter(
-                election=election,
-                status='finalized'
-            ).values(
-                'candidate__id',
-                'candidate__name', 
-                'candidate__party',
-                'candidate__symbol'
-            ).annotate(
-                vote_count=Count('id')
-            ).order_by('-vote_count')
-            
-            # Calculate total votes for this election
-            total_votes = sum(item['vote_count'] for item in vote_counts)
-            
-            # Prepare candidate results with percentages
-            candidates_results = []
-            for item in vote_counts:
-                percentage = (item['vote_count'] / total_votes * 100) if total_votes > 0 else 0
-                candidates_results.append({
-                    'id': item['candidate__id'],
-                    'name': item['candidate__name'],
-                    'party': item['candidate__party'],
-                    'symbol': item['candidate__symbol'],
-                    'votes': item['vote_count'],
-                    'percentage': round(percentage, 2)
-                })
-            
-            # Determine winner (candidate with most votes)
-            winner = None
-            if len(candidates_results) > 1 and candidates_results[0]['votes'] == candidates_results[1]['votes']:
-                winner = None  # Tie between candidates
-            else:
-                winner = candidates_results[0] if candidates_results else None
-
-            # Check if consensus was achieved based on threshold
-            consensus_achieved = False
-            if winner and total_votes > 0:
-                winner_percentage = winner['percentage']
-                consensus_achieved = winner_percentage >= election.consensus_threshold
-
-            # If consensus not achieved and there is a tie, declare no winner
-            if not consensus_achieved and winner is None:
-                winner = None
-            
-            # Get the candidate this voter voted for
-            voter_vote = Vote.objects.filter(
-                voter=voter,
-                election=election,
-                status='finalized'
-            ).select_related('candidate').first()
+            result = ElectionResultSnapshot.as_context(election)
             
             voted_candidate = None
+            voter_vote = voter_votes.get(election.id)
             if voter_vote:
                 voted_candidate = {
                     'name': voter_vote.candidate.name,
@@ -1999,43 +2173,8 @@ def voter_results(request):
                     'symbol': voter_vote.candidate.symbol
                 }
             
-            # Get total eligible voters
-            if election.election_type == 'General Election':
-                eligible_voters_count = Voter.objects.filter(approval_status='approved').count()
-            elif election.election_type == 'State Assembly':
-                eligible_voters_count = Voter.objects.filter(
-                    approval_status='approved',
-                    state=election.state
-                ).count()
-            elif election.election_type == 'Municipal':
-                eligible_voters_count = Voter.objects.filter(
-                    approval_status='approved',
-                    state=election.state,
-                    city=election.city
-                ).count()
-            elif election.election_type == 'Panchayat':
-                eligible_voters_count = Voter.objects.filter(
-                    approval_status='approved',
-                    state=election.state,
-                    district=election.district
-                ).count()
-            else:
-                eligible_voters_count = Voter.objects.filter(approval_status='approved').count()
-            
-            # Calculate voter turnout
-            voter_turnout = (total_votes / eligible_voters_count * 100) if eligible_voters_count > 0 else 0
-            
-            results_data.append({
-                'election': election,
-                'candidates_results': candidates_results,
-                'total_votes': total_votes,
-                'eligible_voters': eligible_voters_count,
-                'voter_turnout': round(voter_turnout, 2),
-                'winner': winner,
-                'consensus_achieved': consensus_achieved,
-                'consensus_threshold': election.consensus_threshold,
-                'voted_candidate': voted_candidate
-            })
+            result['voted_candidate'] = voted_candidate
+            results_data.append(result)
         
         context = {
             'voter': voter,
@@ -2057,6 +2196,8 @@ def voter_results(request):
             'error': str(e)
         })
     
+@rate_limited('send_otp')
+@waiting_room
 def send_otp(request):
     if request.method == 'POST':
         mobile = request.POST.get('mobile')
@@ -2236,100 +2377,37 @@ def download_voters_list(request):
         if include_rejected:
             approval_statuses.append('rejected')
         
-        # Filter voters based on election location
-        voters_query = Voter.objects.filter(state=election.state)
+        # Voters in the election's region (state, plus city/district for local elections);
+        # no status selected means an empty list
+        voters_query = voters_for_election(election, approval_statuses)
         
-        # Further filter by city if it's a Municipal election
-        if election.election_type == 'Municipal' and election.city:
-            voters_query = voters_query.filter(city=election.city)
-        
-        # Further filter by district if it's a Panchayat election
-        if election.election_type == 'Panchayat' and election.district:
-            voters_query = voters_query.filter(district=election.district)
-        
-        # Apply approval status filter
-        if approval_statuses:
-            voters_query = voters_query.filter(approval_status__in=approval_statuses)
-        else:
-            # If no status selected, return empty list
-            voters_query = Voter.objects.none()
-        
-        # Order by name for better readability
-        voters = voters_query.order_by('first_name', 'last_name')
+        if request.GET.get('background') == 'true':
+            # Large lists: generate the file in a Celery task and report progress over the admin socket
+            job, created = BackgroundExport.request(
+                request.user,
+                'voters_list',
+                'xlsx' if file_format == 'excel' else file_format,
+                {'election_id': str(election.id), 'statuses': approval_statuses}
+            )
+            return JsonResponse({'success': True, 'job': BackgroundExport.as_dict(job), 'deduplicated': not created})
         
         # Generate filename
         filename_base = f"voters_{election.state}_{election.name.replace(' ', '_')}"
         
         if file_format == 'excel':
-            # Excel export
+            # Excel export, rows streamed into a write-only workbook
             try:
-                import openpyxl
-                from openpyxl.styles import Font, PatternFill, Alignment
-                from openpyxl.utils import get_column_letter
-                
-                # Create workbook
-                wb = openpyxl.Workbook()
-                ws = wb.active
-                ws.title = "Voters List"
-                
-                # Add header with election info
-                ws.merge_cells('A1:G1')
-                ws['A1'] = f"Voters List for {election.name}"
-                ws['A1'].font = Font(size=14, bold=True)
-                ws['A1'].alignment = Alignment(horizontal='center')
-                
-                ws.merge_cells('A2:G2')
-                ws['A2'] = f"State: {election.state} | Type: {election.election_type} | Date: {timezone.now().strftime('%Y-%m-%d')}"
-                ws['A2'].alignment = Alignment(horizontal='center')
-                
-                # Column headers
-                headers = ['Voter ID', 'Full Name', 'Email', 'Mobile', 'City', 'Pincode', 'Approval Status']
-                header_row = 4
-                
-                for col_num, header in enumerate(headers, 1):
-                    cell = ws.cell(row=header_row, column=col_num)
-                    cell.value = header
-                    cell.font = Font(bold=True)
-                    cell.fill = PatternFill(start_color="138808", end_color="138808", fill_type="solid")
-                    cell.alignment = Alignment(horizontal='center')
-                
-                # Add data
-                for row_num, voter in enumerate(voters, header_row + 1):
-                    ws.cell(row=row_num, column=1).value = voter.voter_id
-                    ws.cell(row=row_num, column=2).value = voter.full_name
-                    ws.cell(row=row_num, column=3).value = voter.email
-                    ws.cell(row=row_num, column=4).value = voter.mobile
-                    ws.cell(row=row_num, column=5).value = voter.city
-                    ws.cell(row=row_num, column=6).value = voter.pincode
-                    ws.cell(row=row_num, column=7).value = voter.approval_status.upper()
-                
-                # Auto-adjust column widths
-                for col in range(1, 8):
-                    column_letter = get_column_letter(col)
-                    max_length = 0
-                    for cell in ws[column_letter]:
-                        try:
-                            if len(str(cell.value)) > max_length:
-                                max_length = len(str(cell.value))
-                        except:
-                            pass
-                    adjusted_width = min(max_length + 2, 50)
-                    ws.column_dimensions[column_letter].width = adjusted_width
-                
-                # Add summary at bottom
-                summary_row = len(voters) + header_row + 2
-                ws.merge_cells(f'A{summary_row}:G{summary_row}')
-                ws[f'A{summary_row}'] = f"Total Voters: {voters.count()}"
-                ws[f'A{summary_row}'].font = Font(bold=True)
-                ws[f'A{summary_row}'].alignment = Alignment(horizontal='center')
-                
-                # Create response
-                response = HttpResponse(
-                    content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+                response, row_count = ExcelExport.response(
+                    VOTER_LIST_HEADER,
+                    voter_list_rows(voters_query),
+                    filename_base,
+                    title_rows=[
+                        f"Voters List for {election.name}",
+                        f"State: {election.state} | Type: {election.election_type} | Date: {timezone.now().strftime('%Y-%m-%d')}"
+                    ],
+                    footer=lambda row_count: [f"Total Voters: {row_count}"],
+                    sheet_title="Voters List"
                 )
-                response['Content-Disposition'] = f'attachment; filename="{filename_base}.xlsx"'
-                
-                wb.save(response)
                 
                 # Log the download
                 create_audit_log(
@@ -2341,7 +2419,7 @@ def download_voters_list(request):
                         'election_name': election.name,
                         'state': election.state,
                         'format': 'excel',
-                        'voter_count': voters.count()
+                        'voter_count': row_count
                     },
                     request=request
                 )
@@ -2354,52 +2432,39 @@ def download_voters_list(request):
                 file_format = 'csv'
         
         if file_format == 'csv':
-            # CSV export
-            response = HttpResponse(content_type='text/csv')
-            response['Content-Disposition'] = f'attachment; filename="{filename_base}.csv"'
-            
-            writer = csv.writer(response)
-            
-            # Write header with election info
-            writer.writerow([f"Voters List for {election.name}"])
-            writer.writerow([f"State: {election.state} | Type: {election.election_type} | Generated: {timezone.now().strftime('%Y-%m-%d %H:%M')}"])
-            writer.writerow([])  # Empty row
-            
-            # Write column headers
-            writer.writerow(['Voter ID', 'Full Name', 'Email', 'Mobile', 'City', 'Pincode', 'Approval Status'])
-            
-            # Write voter data
-            for voter in voters:
-                writer.writerow([
-                    voter.voter_id,
-                    voter.full_name,
-                    voter.email,
-                    voter.mobile,
-                    voter.city,
-                    voter.pincode,
-                    voter.approval_status.upper()
-                ])
-            
-            # Write summary
-            writer.writerow([])  # Empty row
-            writer.writerow([f"Total Voters: {voters.count()}"])
-            
-            # Log the download
-            create_audit_log(
-                'admin_action',
-                user=request.user,
-                election=election,
-                details={
-                    'action': 'download_voters_list',
-                    'election_name': election.name,
-                    'state': election.state,
-                    'format': 'csv',
-                    'voter_count': voters.count()
-                },
-                request=request
+            # CSV export, streamed straight from the database cursor
+            compress = CSVExport.wants_gzip(request)
+
+            def log_download(row_count):
+                create_audit_log(
+                    'admin_action',
+                    user=request.user,
+                    election=election,
+                    details={
+                        'action': 'download_voters_list',
+                        'election_name': election.name,
+                        'state': election.state,
+                        'format': 'csv',
+                        'compressed': compress,
+                        'voter_count': row_count,
+                        'rows_streamed': row_count
+                    },
+                    request=request
+                )
+
+            return CSVExport.response(
+                voter_list_rows(voters_query),
+                filename_base,
+                preamble=[
+                    [f"Voters List for {election.name}"],
+                    [f"State: {election.state} | Type: {election.election_type} | Generated: {timezone.now().strftime('%Y-%m-%d %H:%M')}"],
+                    [],
+                    VOTER_LIST_HEADER
+                ],
+                footer=lambda row_count: [[], [f"Total Voters: {row_count}"]],
+                compress=compress,
+                on_complete=log_download
             )
-            
-            return response
         
     except Election.DoesNotExist:
         return HttpResponse("Election not found", status=404)
@@ -2596,14 +2661,10 @@ def candidate_dashboard(request):
         elections_data = []
         if candidate_user.linked_candidate:
             elections = candidate_user.get_all_elections()
+            tallies = TallyStore.results_many(election.id for election in elections)
             
             for election in elections:
-                vote_counts = Vote.objects.filter(
-                    election=election,
-                    status='finalized'
-                ).values('candidate__id', 'candidate__name', 'candidate__party').annotate(
-                    vote_count=Count('id')
-                ).order_by('-vote_count')
+                vote_counts = tallies[str(election.id)]
                 
                 total_votes = sum(r['vote_count'] for r in vote_counts)
                 
@@ -0,0 +1,322 @@
+import json
+import logging
+import uuid
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+from .models import Vote
+from .redis_utils import get_redis, redis_key
+
+logger = logging.getLogger(__name__)
+
+
+class VoteIngestionBuffer:
+    """Write-behind buffer for ballots.
+
+    Accepted ballots are appended to a Redis list and acknowledged immediately with
+    a token (the id the Vote row will get). A flusher drains the list in micro-batches
+    with bulk_create. Entries are only trimmed from the list after the batch commits,
+    so a crashed flush is retried instead of losing ballots.
+
+    A ballot that cannot be written (while the database itself is reachable) goes
+    back to the front of the queue, and after VOTE_BUFFER_MAX_ATTEMPTS failed
+    flushes onto a dead-letter list for inspection, so one bad entry cannot hold
+    up the ballots behind it.
+    """
+
+    RELEASE_LOCK_SCRIPT = """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('DEL', KEYS[1])
+    end
+    return 0
+    """
+
+    QUEUE_KEY = redis_key('vote_buffer', 'queue')
+    DEAD_LETTER_KEY = redis_key('vote_buffer', 'dead_letter')
+    FLUSH_LOCK_KEY = redis_key('vote_buffer', 'flush_lock')
+    FLUSH_SCHEDULED_KEY = redis_key('vote_buffer', 'flush_scheduled')
+    CLAIM_TTL = 86400  # Keep per-voter claims for a day, well past any flush delay
+    FLUSH_LOCK_TTL = 60
+
+    @staticmethod
+    def is_enabled():
+        """Buffered ingestion is opt-in and requires Redis"""
+        mode = getattr(settings, 'VOTE_INGESTION_MODE', 'direct')
+        return mode == 'buffered' and get_redis() is not None
+
+    @staticmethod
+    def batch_size():
+        return getattr(settings, 'VOTE_BUFFER_BATCH_SIZE', 200)
+
+    @staticmethod
+    def max_wait():
+        return getattr(settings, 'VOTE_BUFFER_MAX_WAIT', 2)
+
+    @staticmethod
+    def max_attempts():
+        return getattr(settings, 'VOTE_BUFFER_MAX_ATTEMPTS', 3)
+
+    @staticmethod
+    def claim_key(election_id, voter_pk):
+        return redis_key('vote_buffer', 'claim', election_id, voter_pk)
+
+    @staticmethod
+    def token_key(token):
+        return redis_key('vote_buffer', 'token', token)
+
+    @classmethod
+    def submit(cls, voter, candidate, election, request=None, schedule_flush=True):
+        """Accept a ballot into the buffer.
+
+        Returns the acknowledgement token, or None if this voter already has a
+        ballot claimed for the election.
+        """
+        r = get_redis()
+        token = str(uuid.uuid4())
+
+        # One claim per (election, voter): the same guarantee as unique_together,
+        # enforced before the ballot is acknowledged.
+        if not r.set(cls.claim_key(election.id, voter.id), token, nx=True, ex=cls.CLAIM_TTL):
+            return None
+
+        entry = {
+            'token': token,
+            'voter_pk': voter.id,
+            'voter_code': voter.voter_id,
+            'user_id': voter.user_id,
+            'candidate_id': str(candidate.id),
+            'candidate_name': candidate.name,
+            'election_id': str(election.id),
+            'nonce': uuid.uuid4().hex[:32],
+            'accepted_at': timezone.now().isoformat(),
+            'ip_address': request.META.get('REMOTE_ADDR') if request else None,
+            'user_agent': request.META.get('HTTP_USER_AGENT', '') if request else '',
+        }
+
+        pipe = r.pipeline()
+        pipe.set(cls.token_key(token), voter.user_id, ex=cls.CLAIM_TTL)
+        pipe.rpush(cls.QUEUE_KEY, json.dumps(entry))
+        queue_length = pipe.execute()[-1]
+
+        if schedule_flush:
+            cls.schedule_flush(queue_length)
+
+        return token
+
+    @classmethod
+    def schedule_flush(cls, queue_length):
+        """Flush now if a full batch is waiting, otherwise at most max_wait seconds from now"""
+        from .tasks import flush_vote_buffer
+
+        r = get_redis()
+        if queue_length >= cls.batch_size():
+            flush_vote_buffer.delay()
+        elif r.set(cls.FLUSH_SCHEDULED_KEY, 1, nx=True, ex=cls.max_wait() + 1):
+            flush_vote_buffer.apply_async(countdown=cls.max_wait())
+
+    @classmethod
+    def pending_user_id(cls, token):
+        """User id owning an acknowledged-but-unflushed token, or None"""
+        r = get_redis()
+        owner = r.get(cls.token_key(token)) if r else None
+        return int(owner) if owner is not None else None
+
+    @classmethod
+    def pending_count(cls):
+        r = get_redis()
+        return r.llen(cls.QUEUE_KEY) if r else 0
+
+    @classmethod
+    def dead_letter_count(cls):
+        r = get_redis()
+        return r.llen(cls.DEAD_LETTER_KEY) if r else 0
+
+    @classmethod
+    def flush(cls, batch_size=None, notify=True):
+        """Write up to batch_size buffered ballots to the Vote table.
+
+        Returns the number of votes inserted, or None without doing anything if
+        another flusher holds the lock.
+        """
+        r = get_redis()
+        batch_size = batch_size or cls.batch_size()
+
+        lock_token = uuid.uuid4().hex
+        if not r.set(cls.FLUSH_LOCK_KEY, lock_token, nx=True, ex=cls.FLUSH_LOCK_TTL):
+            return None
+
+        try:
+            r.delete(cls.FLUSH_SCHEDULED_KEY)
+            raw_entries = r.lrange(cls.QUEUE_KEY, 0, batch_size - 1)
+            if not raw_entries:
+                return 0
+
+            entries, dead = [], []
+            for raw in raw_entries:
+                try:
+                    entries.append(json.loads(raw))
+                except ValueError:
+                    dead.append(raw)
+            votes, failed = cls._write_batch(entries)
+
+            retry = []
+            for entry in failed:
+                entry['attempts'] = entry.get('attempts', 0) + 1
+                (dead if entry['attempts'] >= cls.max_attempts() else retry).append(json.dumps(entry))
+            failed_tokens = {entry.get('token') for entry in failed}
+
+            # Only drop the entries once they are safely committed
+            pipe = r.pipeline()
+            pipe.ltrim(cls.QUEUE_KEY, len(raw_entries), -1)
+            if retry:
+                pipe.lpush(cls.QUEUE_KEY, *reversed(retry))
+            if dead:
+                pipe.rpush(cls.DEAD_LETTER_KEY, *dead)
+            done_tokens = [cls.token_key(entry['token']) for entry in entries if entry.get('token') not in failed_tokens]
+            if done_tokens:
+                pipe.delete(*done_tokens)
+            pipe.execute()
+            if dead:
+                logger.error(f"Moved {len(dead)} buffered votes that could not be written to the dead-letter list")
+        finally:
+            r.register_script(cls.RELEASE_LOCK_SCRIPT)(keys=[cls.FLUSH_LOCK_KEY], args=[lock_token])
+
+        if notify and votes:
+            cls._after_flush(votes, entries)
+
+        return len(votes)
+
+    @classmethod
+    def _write_batch(cls, entries):
+        """Insert a batch of buffered ballots, skipping ones that already exist.
+
+        Returns (votes written, entries that failed to be written).
+        """
+        from .views import create_audit_logs_bulk
+
+        valid, failed = [], []
+        for entry in entries:
+            try:
+                uuid.UUID(str(entry['token']))
+                uuid.UUID(str(entry['election_id']))
+                int(entry['voter_pk'])
+            except (KeyError, TypeError, ValueError):
+                logger.error(f"Malformed buffered vote {entry.get('token')}")
+                failed.append(entry)
+            else:
+                valid.append(entry)
+
+        existing_ids = {
+            str(vote_id)
+            for vote_id in Vote.objects.filter(id__in=[entry['token'] for entry in valid]).values_list('id', flat=True)
+        }
+        existing_pairs = {
+            (voter_pk, str(election_id))
+            for voter_pk, election_id in Vote.objects.filter(
+                voter_id__in={entry['voter_pk'] for entry in valid},
+                election_id__in={entry['election_id'] for entry in valid}
+            ).values_list('voter_id', 'election_id')
+        }
+
+        rows = []
+        for entry in valid:
+            try:
+                pair = (entry['voter_pk'], entry['election_id'])
+                if entry['token'] in existing_ids:
+                    continue  # Already written by an earlier, interrupted flush
+                if pair in existing_pairs:
+                    logger.warning(f"Dropping duplicate buffered vote {entry['token']} for voter {entry['voter_code']}")
+                    continue
+                existing_pairs.add(pair)
+
+                accepted_at = datetime.fromisoformat(entry['accepted_at'])
+                vote = Vote(
+                    id=entry['token'],
+                    voter_id=entry['voter_pk'],
+                    candidate_id=entry['candidate_id'],
+                    election_id=entry['election_id'],
+                    timestamp=accepted_at,  # The time in vote_hash, so the hash can be recomputed from the row
+                    nonce=entry['nonce'],
+                    status='pending',
+                    required_confirmations=3,
+                    vote_hash=Vote.compute_vote_hash(
+                        entry['voter_code'], entry['candidate_id'], entry['election_id'], accepted_at, entry['nonce']
+                    )
+                )
+                audit_entry = {
+                    'log_type': 'vote_cast',
+                    'user_id': entry['user_id'],
+                    'election_id': entry['election_id'],
+                    'details': {
+                        'voter_id': entry['voter_code'],
+                        'candidate_name': entry['candidate_name'],
+                        'vote_hash': vote.vote_hash,
+                        'ingestion': 'buffered'
+                    },
+                    'ip_address': entry['ip_address'],
+                    'user_agent': entry['user_agent'],
+                }
+            except (KeyError, TypeError, ValueError) as e:
+                logger.error(f"Malformed buffered vote {entry.get('token')}: {e}")
+                failed.append(entry)
+                continue
+            rows.append((entry, vote, audit_entry))
+
+        if not rows:
+            return [], failed
+
+        try:
+            with transaction.atomic():
+                Vote.objects.bulk_create([vote for _, vote, _ in rows])
+                create_audit_logs_bulk([audit_entry for _, _, audit_entry in rows])
+            return [vote for _, vote, _ in rows], failed
+        except Exception as e:
+            # A concurrent direct write won the race for some (voter, election) pair, or
+            # some entry cannot be written. Go row by row so the rest of the batch lands.
+            logger.warning(f"Bulk vote insert failed ({e}), retrying batch row by row")
+
+        written = []
+        for entry, vote, audit_entry in rows:
+            try:
+                with transaction.atomic():
+                    Vote.objects.bulk_create([vote])
+                    create_audit_logs_bulk([audit_entry])
+                written.append(vote)
+            except IntegrityError:
+                logger.warning(f"Dropping duplicate buffered vote {vote.id}")
+            except Exception as e:
+                logger.error(f"Failed to write buffered vote {vote.id}: {e}")
+                failed.append(entry)
+
+        if failed and not written:
+            # Nothing went in: if the database itself is down, keep the batch queued as it is
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        return written, failed
+
+    @classmethod
+    def _after_flush(cls, votes, entries):
+        """Start consensus and refresh caches/dashboards once per batch"""
+        from .consensus import ConsensusBatcher
+
+        ConsensusBatcher.start([vote.id for vote in votes])
+
+        cache.delete_many([f"voter_elections_{vote.voter_id}" for vote in votes] + ['election_stats'])
+
+        channel_layer = get_channel_layer()
+        async_to_sync(channel_layer.group_send)(
+            "admin_dashboard", {
+                "type": "send_admin_update",
+                "data": {
+                    "type": "new_vote",
+                    "count": len(votes),
+                    "message": f"{len(votes)} new vote(s) recorded"
+                }
+            }
+        )
@@ -0,0 +1,154 @@
+import logging
+
+from .models import Vote
+from .redis_utils import get_async_redis, get_redis, redis_key
+
+logger = logging.getLogger(__name__)
+
+
+class HasVotedGuard:
+    """Per-election has-voted bitmap in Redis, in front of Vote.unique_together.
+
+    Bit N of the election's bitmap is set once the voter with primary key N has
+    cast a ballot. SETBIT returns the previous bit, so duplicate submissions
+    (double clicks, retries) race on a single atomic Redis command and are
+    rejected before any vote is written.
+
+    A bitmap is only trusted after it has been built from the database for that
+    election (on election start, or with the rebuild_voted_bitmaps command).
+    Until then every method returns None and callers fall back to the database.
+    """
+
+    # KEYS: bitmap, rebuilt bitmap, snapshot taken when the rebuild started, ready flag.
+    # Keeps the bits marked since the snapshot (ballots in flight), then swaps the
+    # rebuilt bitmap in, so bits that no vote backs are cleared.
+    SWAP_SCRIPT = """
+    redis.call('BITOP', 'AND', KEYS[3], KEYS[3], KEYS[1])
+    redis.call('BITOP', 'XOR', KEYS[3], KEYS[3], KEYS[1])
+    redis.call('BITOP', 'OR', KEYS[2], KEYS[2], KEYS[3])
+    if redis.call('EXISTS', KEYS[2]) == 1 then
+        redis.call('RENAME', KEYS[2], KEYS[1])
+    else
+        redis.call('DEL', KEYS[1])
+    end
+    redis.call('DEL', KEYS[3])
+    redis.call('SET', KEYS[4], 1)
+    """
+
+    @staticmethod
+    def bitmap_key(election_id):
+        return redis_key('voted', election_id)
+
+    @staticmethod
+    def ready_key(election_id):
+        return redis_key('voted', election_id, 'ready')
+
+    @classmethod
+    def _client(cls, election_id):
+        """Redis client if the election's bitmap is warm, else None"""
+        r = get_redis()
+        if r is None:
+            return None
+        try:
+            return r if r.exists(cls.ready_key(election_id)) else None
+        except Exception as e:
+            logger.error(f"Has-voted guard unavailable: {e}")
+            return None
+
+    @classmethod
+    def has_voted(cls, election_id, voter_pk):
+        r = cls._client(election_id)
+        if r is None:
+            return None
+        return bool(r.getbit(cls.bitmap_key(election_id), voter_pk))
+
+    @classmethod
+    def mark(cls, election_id, voter_pk):
+        """Atomically record a ballot.
+
+        Returns True if this call claimed the slot, False if the voter had
+        already voted, or None if the guard cannot answer.
+        """
+        r = cls._client(election_id)
+        if r is None:
+            return None
+        return r.setbit(cls.bitmap_key(election_id), voter_pk, 1) == 0
+
+    @classmethod
+    def unmark(cls, election_id, voter_pk):
+        """Release a slot whose vote failed to be written"""
+        r = get_redis()
+        if r is not None:
+            r.setbit(cls.bitmap_key(election_id), voter_pk, 0)
+
+    @classmethod
+    async def _aclient(cls, election_id):
+        r = get_async_redis()
+        if r is None:
+            return None
+        try:
+            return r if await r.exists(cls.ready_key(election_id)) else None
+        except Exception as e:
+            logger.error(f"Has-voted guard unavailable: {e}")
+            return None
+
+    @classmethod
+    async def amark(cls, election_id, voter_pk):
+        """Async variant of mark() for the ASGI vote endpoint"""
+        r = await cls._aclient(election_id)
+        if r is None:
+            return None
+        return await r.setbit(cls.bitmap_key(election_id), voter_pk, 1) == 0
+
+    @classmethod
+    async def aunmark(cls, election_id, voter_pk):
+        r = get_async_redis()
+        if r is not None:
+            await r.setbit(cls.bitmap_key(election_id), voter_pk, 0)
+
+    @classmethod
+    def turnout(cls, election_id):
+        """Number of voters who have cast a ballot (BITCOUNT)"""
+        r = cls._client(election_id)
+        if r is None:
+            return None
+        return r.bitcount(cls.bitmap_key(election_id))
+
+    @classmethod
+    def rebuild(cls, election_id, chunk_size=10000):
+        """Rebuild an election's bitmap from the Vote table.
+
+        The bitmap is built under a temporary key from the stored votes and the
+        ballots still waiting in the ingestion buffer, then renamed over the live
+        one, so concurrent readers never see a half-built bitmap and bits no vote
+        backs are cleared. Bits marked while the rebuild runs are kept. Returns
+        the number of voters marked.
+        """
+        from .vote_buffer import VoteIngestionBuffer
+
+        r = get_redis()
+        if r is None:
+            return None
+
+        key = cls.bitmap_key(election_id)
+        temp_key = f"{key}:rebuild"
+        snapshot_key = f"{key}:snapshot"
+        r.delete(temp_key, snapshot_key)
+        r.bitop('OR', snapshot_key, key)
+
+        votes = Vote.objects.filter(election_id=election_id).values_list('voter_id', flat=True)
+        voter_pks = set(votes.iterator(chunk_size=chunk_size))
+        for claim in r.scan_iter(match=VoteIngestionBuffer.claim_key(election_id, '*'), count=chunk_size):
+            voter_pks.add(int(claim.decode().rsplit(':', 1)[1]))
+
+        pipe = r.pipeline(transaction=False)
+        for marked, voter_pk in enumerate(voter_pks, 1):
+            pipe.setbit(temp_key, voter_pk, 1)
+            if marked % chunk_size == 0:
+                pipe.execute()
+        pipe.execute()
+
+        r.register_script(cls.SWAP_SCRIPT)(keys=[key, temp_key, snapshot_key, cls.ready_key(election_id)])
+
+        logger.info(f"Rebuilt has-voted bitmap for election {election_id}: {len(voter_pks)} voters")
+        return len(voter_pks)
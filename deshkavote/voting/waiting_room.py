@@ -0,0 +1,227 @@
+import logging
+import re
+import time
+import uuid
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+
+from .redis_utils import get_async_redis, get_redis, redis_key
+
+logger = logging.getLogger(__name__)
+
+
+class WaitingRoom:
+    """Election-day admission queue in front of login.
+
+    While WAITING_ROOM_ENABLED is set, a client needs an admission pass to
+    reach login_user or send_otp. Clients are identified by a random position
+    token (cookie). Admission is a token bucket: WAITING_ROOM_ADMIT_RATE
+    clients per second, with bursts up to WAITING_ROOM_BURST, so when there is
+    no rush nobody waits. Otherwise clients join a FIFO queue (a sorted set
+    scored by arrival number) and are admitted from its head; a pass then
+    lasts WAITING_ROOM_PASS_TTL seconds, long enough to finish the login and
+    OTP steps.
+
+    Everything - queue, bucket, heartbeats and passes - lives in Redis, so the
+    database only ever sees admitted clients. Each visit is one Lua script
+    that records the client's heartbeat, admits as many clients from the head
+    as the bucket allows, and returns the client's position. Clients that
+    have stopped checking in for WAITING_ROOM_ABANDON_SECONDS lose their
+    place without using up an admission.
+
+    Queued clients follow their position over the WaitingRoomConsumer
+    websocket, which visits every WAITING_ROOM_PUSH_INTERVAL seconds and
+    tells the client once it is admitted.
+    """
+
+    SCRIPT = """
+    local token, now = ARGV[1], tonumber(ARGV[2])
+    local rate, burst = tonumber(ARGV[3]), tonumber(ARGV[4])
+    local pass_ttl, abandon_after = tonumber(ARGV[5]), tonumber(ARGV[6])
+    local pass_prefix, max_scan = ARGV[7], tonumber(ARGV[8])
+
+    if redis.call('EXISTS', pass_prefix .. token) == 1 then
+        return {0, redis.call('ZCARD', KEYS[1])}
+    end
+
+    if not redis.call('ZSCORE', KEYS[1], token) then
+        redis.call('ZADD', KEYS[1], redis.call('INCR', KEYS[2]), token)
+    end
+    redis.call('HSET', KEYS[4], token, now)
+
+    local bucket = redis.call('HMGET', KEYS[3], 'tokens', 'ts')
+    local level = tonumber(bucket[1]) or burst
+    local ts = tonumber(bucket[2]) or now
+    level = math.min(burst, level + math.max(0, now - ts) * rate)
+
+    local scanned = 0
+    while level >= 1 and scanned < max_scan do
+        local head = redis.call('ZRANGE', KEYS[1], 0, 0)[1]
+        if not head then
+            break
+        end
+        scanned = scanned + 1
+        redis.call('ZREM', KEYS[1], head)
+        local seen = tonumber(redis.call('HGET', KEYS[4], head))
+        redis.call('HDEL', KEYS[4], head)
+        if seen and now - seen <= abandon_after then
+            redis.call('SET', pass_prefix .. head, 1, 'EX', pass_ttl)
+            redis.call('HINCRBY', KEYS[5], 'admitted', 1)
+            level = level - 1
+        else
+            redis.call('HINCRBY', KEYS[5], 'abandoned', 1)
+        end
+    end
+    redis.call('HSET', KEYS[3], 'tokens', level, 'ts', now)
+
+    local waiting = redis.call('ZCARD', KEYS[1])
+    if redis.call('EXISTS', pass_prefix .. token) == 1 then
+        return {0, waiting}
+    end
+    return {redis.call('ZRANK', KEYS[1], token) + 1, waiting}
+    """
+
+    QUEUE_KEY = redis_key('waiting_room', 'queue')
+    SEQUENCE_KEY = redis_key('waiting_room', 'sequence')
+    BUCKET_KEY = redis_key('waiting_room', 'bucket')
+    SEEN_KEY = redis_key('waiting_room', 'seen')
+    STATS_KEY = redis_key('waiting_room', 'stats')
+    PASS_PREFIX = redis_key('waiting_room', 'pass', '')
+    COOKIE = 'waiting_room_token'
+    HEADER = 'X-Waiting-Room-Token'
+    MAX_SCAN = 1000  # Queue entries examined per visit, bounding the script's run time
+    TOKEN_RE = re.compile(r'^[0-9a-f]{32}$')
+
+    @staticmethod
+    def is_enabled():
+        return getattr(settings, 'WAITING_ROOM_ENABLED', False)
+
+    @staticmethod
+    def admit_rate():
+        return getattr(settings, 'WAITING_ROOM_ADMIT_RATE', 50)
+
+    @staticmethod
+    def burst():
+        return getattr(settings, 'WAITING_ROOM_BURST', 100)
+
+    @staticmethod
+    def pass_ttl():
+        return getattr(settings, 'WAITING_ROOM_PASS_TTL', 900)
+
+    @staticmethod
+    def abandon_seconds():
+        return getattr(settings, 'WAITING_ROOM_ABANDON_SECONDS', 30)
+
+    @staticmethod
+    def push_interval():
+        return getattr(settings, 'WAITING_ROOM_PUSH_INTERVAL', 2)
+
+    @classmethod
+    def is_valid_token(cls, token):
+        return bool(token) and bool(cls.TOKEN_RE.match(token))
+
+    @staticmethod
+    def new_token():
+        return uuid.uuid4().hex
+
+    @classmethod
+    def script_args(cls, token):
+        keys = [cls.QUEUE_KEY, cls.SEQUENCE_KEY, cls.BUCKET_KEY, cls.SEEN_KEY, cls.STATS_KEY]
+        args = [
+            token, time.time(), cls.admit_rate(), cls.burst(), cls.pass_ttl(),
+            cls.abandon_seconds(), cls.PASS_PREFIX, cls.MAX_SCAN,
+        ]
+        return keys, args
+
+    @classmethod
+    def visit(cls, token):
+        """(position, waiting) for a token; position 0 means admitted.
+
+        Returns None when the room is off or Redis is unavailable, in which
+        case everyone is let through.
+        """
+        r = get_redis() if cls.is_enabled() else None
+        if r is None:
+            return None
+        keys, args = cls.script_args(token)
+        try:
+            position, waiting = r.register_script(cls.SCRIPT)(keys=keys, args=args)
+        except Exception as e:
+            logger.error(f"Waiting room unavailable, admitting everyone: {e}")
+            return None
+        return int(position), int(waiting)
+
+    @classmethod
+    async def avisit(cls, token):
+        if not cls.is_enabled():
+            return None
+        r = get_async_redis()
+        if r is None:
+            return await sync_to_async(cls.visit)(token)
+        keys, args = cls.script_args(token)
+        try:
+            position, waiting = await r.register_script(cls.SCRIPT)(keys=keys, args=args)
+        except Exception as e:
+            logger.error(f"Waiting room unavailable, admitting everyone: {e}")
+            return None
+        return int(position), int(waiting)
+
+    @classmethod
+    def status(cls, token, position, waiting):
+        return {
+            'token': token,
+            'position': position,
+            'waiting': waiting,
+            'estimated_wait': round(position / cls.admit_rate()) if cls.admit_rate() else None,
+            'websocket': f"/ws/waiting-room/{token}/",
+        }
+
+    @classmethod
+    def stats(cls):
+        r = get_redis()
+        if r is None:
+            return None
+        try:
+            pipe = r.pipeline()
+            pipe.zcard(cls.QUEUE_KEY)
+            pipe.hgetall(cls.STATS_KEY)
+            waiting, counters = pipe.execute()
+        except Exception as e:
+            logger.error(f"Waiting room stats unavailable: {e}")
+            return None
+        stats = {key.decode(): int(value) for key, value in counters.items()}
+        stats.update({'enabled': cls.is_enabled(), 'waiting': waiting})
+        return stats
+
+
+def waiting_room(view_func):
+    """Only let clients holding a waiting room pass into the view"""
+    room = WaitingRoom
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not room.is_enabled():
+            return view_func(request, *args, **kwargs)
+
+        token = request.COOKIES.get(room.COOKIE) or request.headers.get(room.HEADER)
+        if not room.is_valid_token(token):
+            token = room.new_token()
+
+        visit = room.visit(token)
+        if visit is None or visit[0] == 0:
+            response = view_func(request, *args, **kwargs)
+        else:
+            response = JsonResponse({
+                'success': False,
+                'queued': True,
+                'message': 'Many voters are signing in right now. You are in the queue.',
+                'waiting_room': room.status(token, *visit),
+            })
+
+        response.set_cookie(room.COOKIE, token, max_age=room.pass_ttl(), httponly=True, samesite='Lax')
+        return response
+
+    return wrapper